@@ -1,3 +1,5 @@
+import os
+import time
 from threading import Lock
 
 import numpy as np
@@ -5,7 +7,8 @@ import tensorflow as tf
 from network import ACNetwork
 from network_lstm import ACNetworkLSTM
 
-from utils import update_target_graph, discount
+from utils import update_target_graph, returns_and_advantages, RolloutBuffer, WindowedStat, PhaseTimer, StepTracer, \
+    FrameCapture, make_gif, get_summary_writer
 import flags
 
 FLAGS = tf.app.flags.FLAGS
@@ -14,22 +17,26 @@ main_lock = Lock()
 
 
 class Worker():
-    def __init__(self, game, sess, thread_id, nb_actions, optimizer, global_step):
+    # Bytes copied from the global network and environment steps of all workers, written by worker_0 as rates
+    total_synced_bytes = 0
+    total_env_steps = 0
+
+    def __init__(self, game, sess, thread_id, nb_actions, optimizer, global_step, global_version):
         self.name = "worker_" + str(thread_id)
         self.thread_id = thread_id
         self.model_path = FLAGS.checkpoint_dir
         self.trainer = optimizer
         self.global_episode = global_step
         self.increment_global_episode = self.global_episode.assign_add(1)
-        self.episode_rewards = []
-        self.episode_lengths = []
-        self.episode_mean_values = []
+        self.episode_rewards = WindowedStat(FLAGS.summary_interval)
+        self.episode_lengths = WindowedStat(FLAGS.summary_interval)
+        self.episode_mean_values = WindowedStat(FLAGS.summary_interval)
 
         self.sess = sess
         self.graph = sess.graph
         # self.summary_writer = tf.summary.FileWriter(FLAGS.summaries_dir + "/worker_" + str(self.thread_id), self.graph)
-        self.summary_writer = tf.summary.FileWriter(FLAGS.summaries_dir + "/worker_" + str(self.thread_id))
-        self.summary = tf.Summary()
+        self.summary_dir = FLAGS.summaries_dir + "/worker_" + str(self.thread_id)
+        self.summary_writer = get_summary_writer().writer(self.summary_dir)
 
         if FLAGS.lstm:
             self.local_AC = ACNetworkLSTM(self.name, nb_actions, optimizer)
@@ -37,260 +44,384 @@ class Worker():
             self.local_AC = ACNetwork(self.name, nb_actions, optimizer)
 
         self.update_local_ops = update_target_graph('global', self.name)
+        # Number of updates applied to the global network, the local copy is refreshed only when it lags behind
+        # by more than FLAGS.sync_staleness updates
+        self.global_version = global_version
+        self.increment_global_version = self.global_version.assign_add(1)
+        self.local_version = -1
+        self.last_global_version = 0
+        self.sync_nbytes = sum(var.get_shape().num_elements() * var.dtype.base_dtype.size
+                               for var in tf.get_collection(tf.GraphKeys.TRAINABLE_VARIABLES, self.name))
+        self.last_rates_report = (time.time(), 0, 0)
+        self.checkpoint_writer = None
+        # Wall time of the phases of play, written to the worker's summaries every summary_interval episodes
+        self.timer = PhaseTimer()
+        # Only the first worker is traced, concurrent traces would profile each other
+        self.tracer = StepTracer(self.name, self.summary_dir, FLAGS.trace_every if thread_id == 0 else 0,
+                                 FLAGS.trace_dir)
+
+        if FLAGS.grad_accumulation_steps > 1:
+            # Gradients of grad_accumulation_steps rollouts are summed locally and applied as one update
+            self.update_ops = [self.local_AC.accumulate_grads]
+            self.accumulated_rollouts = 0
+        else:
+            self.update_ops = [self.local_AC.apply_grads, self.increment_global_version]
 
         self.actions = np.zeros([nb_actions])
         self.env = game
 
-    def train(self, rollout, bootstrap_value, summaries=False):
-        rollout = np.array(rollout)
-        observations = rollout[:, 0]
-        actions = rollout[:, 1]
-        rewards = rollout[:, 2]
-        next_observations = rollout[:, 3]
-        if FLAGS.meta:
-            prev_rewards = [0] + rewards[:-1].tolist()
-            prev_actions = [0] + actions[:-1].tolist()
-        values = rollout[:, 5]
-
-        # The advantage function uses "Generalized Advantage Estimation"
-        rewards_plus = np.asarray(rewards.tolist() + [bootstrap_value])
-        discounted_rewards = discount(rewards_plus, FLAGS.gamma)[:-1]
-        value_plus = np.asarray(values.tolist() + [bootstrap_value])
-        policy_target = discounted_rewards - value_plus[:-1]
-        if FLAGS.gen_adv:
-            td_residuals = rewards + FLAGS.gamma * value_plus[1:] - value_plus[:-1]
-            advantages = discount(td_residuals, FLAGS.gamma)
-            policy_target = advantages
+    def new_rollout_buffer(self):
+        return RolloutBuffer(FLAGS.max_episode_buffer_size,
+                             {"observations": np.uint8, "actions": np.int32, "rewards": np.float32,
+                              "values": np.float32, "dones": np.bool_, "prev_rewards": np.float32,
+                              "prev_actions": np.int32, "rnn_c": np.float32, "rnn_h": np.float32})
+
+    def process_rollout(self, rollout, bootstrap_value):
+        discounted_rewards, policy_target = returns_and_advantages(rollout["rewards"], rollout["values"],
+                                                                   bootstrap_value, FLAGS.gamma, FLAGS.gen_adv)
+        batch = [rollout["observations"], rollout["actions"], discounted_rewards, policy_target,
+                 rollout["prev_rewards"], rollout["prev_actions"]]
+        if FLAGS.lstm:
+            # The unroll starts from the recurrent state the first transition was acted with
+            batch.append((rollout["rnn_c"][:1], rollout["rnn_h"][:1]))
+        return batch
 
+    def get_train_feed_dict(self, observations, actions, discounted_rewards, policy_target, prev_rewards,
+                            prev_actions, rnn_state=None):
         if FLAGS.lstm:
             if FLAGS.meta:
-                rnn_state = self.local_AC.state_init
                 feed_dict = {self.local_AC.target_v: discounted_rewards,
                              self.local_AC.prev_rewards: np.vstack(prev_rewards),
                              self.local_AC.prev_actions: prev_actions,
                              self.local_AC.actions: actions,
-                             self.local_AC.inputs: np.stack(observations, axis=0),
+                             self.local_AC.inputs: observations,
                              self.local_AC.advantages: policy_target,
                              self.local_AC.state_in[0]: rnn_state[0],
                              self.local_AC.state_in[1]: rnn_state[1]}
             else:
-                rnn_state = self.local_AC.state_init
                 feed_dict = {self.local_AC.target_v: discounted_rewards,
-                             self.local_AC.inputs: np.stack(observations, axis=0),
+                             self.local_AC.inputs: observations,
                              self.local_AC.actions: actions,
                              self.local_AC.advantages: policy_target,
                              self.local_AC.state_in[0]: rnn_state[0],
                              self.local_AC.state_in[1]: rnn_state[1]}
         else:
             feed_dict = {self.local_AC.target_v: discounted_rewards,
-                         self.local_AC.inputs: np.stack(observations, axis=0),
+                         self.local_AC.inputs: observations,
                          self.local_AC.actions: actions,
                          self.local_AC.advantages: policy_target}
+        return feed_dict
+
+    def get_policy_feed_dict(self, s, r, a, rnn_state):
+        if FLAGS.lstm:
+            if FLAGS.meta:
+                feed_dict = {
+                    self.local_AC.prev_rewards: np.vstack(r),
+                    self.local_AC.inputs: s,
+                    self.local_AC.prev_actions: a,
+                    self.local_AC.batch_state_in[0]: rnn_state[0],
+                    self.local_AC.batch_state_in[1]: rnn_state[1]}
+            else:
+                feed_dict = {self.local_AC.inputs: s,
+                             self.local_AC.batch_state_in[0]: rnn_state[0],
+                             self.local_AC.batch_state_in[1]: rnn_state[1]}
+        else:
+            feed_dict = {self.local_AC.inputs: s}
+        return feed_dict
+
+    def train(self, rollouts, bootstrap_values, summaries=False, histograms=False):
+        batches = [self.process_rollout(rollout, bootstrap_value)
+                   for rollout, bootstrap_value in zip(rollouts, bootstrap_values)]
+        return self.train_batches(batches, summaries, histograms)
+
+    def train_batches(self, batches, summaries=False, histograms=False):
+        start_time = time.time()
+        if not FLAGS.lstm and len(batches) > 1:
+            # Without a recurrent core the rollouts of all environments are independent samples of one batch
+            batches = [[np.concatenate(column, axis=0) for column in zip(*batches)]]
+
+        for batch in batches[:-1]:
+            self.after_update(self.sess.run(self.update_ops, feed_dict=self.get_train_feed_dict(*batch)))
+        feed_dict = self.get_train_feed_dict(*batches[-1])
+        nb_samples = len(batches[-1][1])
+
+        # Only the summaries_scope network has histogram and image summaries to fetch
+        histograms = histograms and self.local_AC.merged_summary is not None
         if summaries:
-            l, v_l, p_l, e_l, g_n, v_n, _, ms, img_summ, max_v, min_v, mean_v, max_r, min_r, mean_r = self.sess.run(
-                [self.local_AC.loss,
-                 self.local_AC.value_loss,
-                 self.local_AC.policy_loss,
-                 self.local_AC.entropy,
-                 self.local_AC.grad_norms,
-                 self.local_AC.var_norms,
-                 self.local_AC.apply_grads,
-                 self.local_AC.merged_summary,
-                 self.local_AC.image_summaries,
-                 self.local_AC.max_value,
-                 self.local_AC.min_value,
-                 self.local_AC.mean_value,
-                 self.local_AC.max_reward,
-                 self.local_AC.min_reward,
-                 self.local_AC.mean_reward],
-                feed_dict=feed_dict)
-            return l / len(rollout), v_l / len(rollout), p_l / len(rollout), e_l / len(
-                rollout), g_n, v_n, ms, img_summ, max_v, min_v, mean_v, max_r, min_r, mean_r
+            fetches = [self.local_AC.loss,
+                       self.local_AC.value_loss,
+                       self.local_AC.policy_loss,
+                       self.local_AC.entropy,
+                       self.local_AC.grad_norms,
+                       self.local_AC.var_norms,
+                       self.update_ops,
+                       self.local_AC.max_value,
+                       self.local_AC.min_value,
+                       self.local_AC.mean_value,
+                       self.local_AC.max_reward,
+                       self.local_AC.min_reward,
+                       self.local_AC.mean_reward]
+            if histograms:
+                fetches += [self.local_AC.merged_summary, self.local_AC.image_summaries]
+            results = self.tracer.run('train_summaries', self.sess, fetches, feed_dict=feed_dict)
+            l, v_l, p_l, e_l, g_n, v_n, update_result, max_v, min_v, mean_v, max_r, min_r, mean_r = results[:13]
+            ms, img_summ = results[13:] if histograms else (None, [])
+            self.after_update(update_result)
+            stats = l / nb_samples, v_l / nb_samples, p_l / nb_samples, e_l / nb_samples, \
+                    g_n, v_n, ms, img_summ, max_v, min_v, mean_v, max_r, min_r, mean_r
         else:
-            _ = self.sess.run([self.local_AC.apply_grads], feed_dict=feed_dict)
-            return None
-
-    def play(self, coord, saver):
+            self.after_update(self.tracer.run('train', self.sess, self.update_ops, feed_dict=feed_dict))
+            stats = None
+        self.tracer.count_update()
+        self.timer.lap('Train', start_time)
+        return stats
+
+    def after_update(self, update_result):
+        if FLAGS.grad_accumulation_steps == 1:
+            _, self.last_global_version = update_result
+            return
+        self.accumulated_rollouts += 1
+        if self.accumulated_rollouts == FLAGS.grad_accumulation_steps:
+            _, self.last_global_version = self.sess.run([self.local_AC.apply_accumulated_grads,
+                                                         self.increment_global_version])
+            self.sess.run(self.local_AC.reset_accumulators)
+            self.accumulated_rollouts = 0
+
+    def sync_local_params(self, global_version=None):
+        start_time = time.time()
+        if global_version is None:
+            global_version = self.sess.run(self.global_version)
+        if global_version - self.local_version > FLAGS.sync_staleness:
+            self.sess.run(self.update_local_ops)
+            self.local_version = global_version
+            with main_lock:
+                Worker.total_synced_bytes += self.sync_nbytes
+        self.timer.lap('Sync', start_time)
+
+    def is_summary_episode(self, episode_count):
+        return episode_count % FLAGS.summary_interval == 0 and episode_count != 0
+
+    def is_histogram_episode(self, episode_count):
+        # The histograms and images cost far more to fetch than the scalars, only every histogram_interval-th
+        # summary episode fetches them
+        return self.is_summary_episode(episode_count) and \
+               episode_count % (FLAGS.summary_interval * FLAGS.histogram_interval) == 0
+
+    def capture_frame(self, frame_capture, state):
+        # Only the newest frame of the state is kept, copied out of the environment's ring buffer
+        if frame_capture.wants_frame():
+            frame_capture.add(np.copy(state[-1] if FLAGS.graph_preprocessing else state[:, :, -1]))
+
+    def write_frames(self, frame_capture, episode_count):
+        frames = np.array(frame_capture.frames)
+        if not FLAGS.graph_preprocessing:
+            frames = np.repeat(frames[..., np.newaxis], 3, axis=3)
+        make_gif(frames, os.path.join(FLAGS.frames_dir, "{}_episode_{}.gif".format(self.name, episode_count)),
+                 duration=len(frames) * 0.1, true_image=True)
+
+    def play(self, coord, checkpoint_writer):
         episode_count = self.sess.run(self.global_episode)
         total_steps = 0
+        nb_envs = self.env.nb_envs
 
+        self.checkpoint_writer = checkpoint_writer
         print("Starting worker " + str(self.thread_id))
         with self.sess.as_default(), self.graph.as_default():
+            self.sync_local_params()
+            episode_buffers = [self.new_rollout_buffer() for _ in range(nb_envs)]
+            episode_values = [[] for _ in range(nb_envs)]
+            # Frames are recorded only for every frames_interval-th episode of the frames_workers
+            capture_frames = str(self.thread_id) in FLAGS.frames_workers.split(",")
+            frame_captures = [FrameCapture(FLAGS.frames_interval, FLAGS.max_frames, capture_frames)
+                              for _ in range(nb_envs)]
+            episode_reward = np.zeros(nb_envs)
+            episode_step_count = np.zeros(nb_envs, dtype=np.int32)
+            r = np.zeros(nb_envs)
+            a = np.zeros(nb_envs, dtype=np.int32)
+            rnn_state = None
+            train_stats = None
+            # Environments whose rollout is full but not terminal, they are trained after the next forward pass
+            # which yields the value of their bootstrap state anyway
+            pending_envs = []
+            # A2C: rollouts of the episodes that ended during the round, trained with the rest of the round
+            finished_batches = []
+            round_step = 0
+            summary_episode = None
+
+            s = self.env.get_initial_state()
+            for i in range(nb_envs):
+                frame_captures[i].start_episode(episode_count)
+                self.capture_frame(frame_captures[i], s[i])
+            if FLAGS.lstm:
+                rnn_state = [np.repeat(state, nb_envs, axis=0) for state in self.local_AC.state_init]
+
+            self.timer.reset()
             while not coord.should_stop():
-
-                self.sess.run(self.update_local_ops)
-                episode_buffer = []
-                episode_values = []
-                episode_frames = []
-                episode_reward = 0
-                episode_step_count = 0
-                d = False
-
-                if FLAGS.meta:
-                    r = 0
-                    a = 0
-
-                s = self.env.get_initial_state()
-
-                if FLAGS.verbose and self.name == 'worker_0':
-                    print("Episode {}. Game dynamics - meta_level {}, flip {}".format(episode_count, info["meta_level"],
-                                                                                      info["flip"]))
-
-                episode_frames.append(s)
+                t = time.time()
+                feed_dict = self.get_policy_feed_dict(s, r, a, rnn_state)
+                prev_r, prev_a = r, a
                 if FLAGS.lstm:
-                    rnn_state = self.local_AC.state_init
-
-                while not d:
+                    a, v, rnn_state_new = self.tracer.run(
+                        'inference', self.sess,
+                        [self.local_AC.batch_sampled_action, self.local_AC.value, self.local_AC.batch_state_out],
+                        feed_dict=feed_dict)
+                else:
+                    a, v = self.tracer.run(
+                        'inference', self.sess,
+                        [self.local_AC.sampled_action, self.local_AC.value],
+                        feed_dict=feed_dict)
+                self.timer.lap('Inference', t)
+
+                if FLAGS.a2c and (pending_envs or finished_batches) and round_step == 0:
+                    batches = finished_batches + [self.process_rollout(episode_buffers[i], v[i, 0])
+                                                  for i in pending_envs]
+                    stats = self.train_batches(batches, summaries=summary_episode is not None,
+                                               histograms=summary_episode is not None and
+                                               self.is_histogram_episode(summary_episode))
+                    if summary_episode is not None:
+                        self.write_summaries(summary_episode, stats)
+                        summary_episode = None
+                    finished_batches = []
+                    for i in pending_envs:
+                        episode_buffers[i].clear()
+                    self.sync_local_params(self.last_global_version)
+                elif pending_envs and not FLAGS.a2c:
+                    self.train([episode_buffers[i] for i in pending_envs], v[pending_envs, 0])
+                    for i in pending_envs:
+                        episode_buffers[i].clear()
+                    self.sync_local_params(self.last_global_version)
+
+                preprocess_time = self.env.preprocess_time
+                t = time.time()
+                s1, r, d, infos = self.env.step(a)
+                self.timer.lap('Env step', t)
+                self.timer.move('Env step', 'Preprocessing', self.env.preprocess_time - preprocess_time)
+
+                r = np.clip(r, -1, 1)
+
+                for i in range(nb_envs):
+                    transition = dict(observations=s[i], actions=a[i], rewards=r[i], dones=d[i], values=v[i, 0],
+                                      prev_rewards=prev_r[i], prev_actions=prev_a[i])
+                    if FLAGS.lstm:
+                        transition.update(rnn_c=rnn_state[0][i], rnn_h=rnn_state[1][i])
+                    episode_buffers[i].add(**transition)
+                    episode_values[i].append(v[i, 0])
+                    if not d[i]:
+                        self.capture_frame(frame_captures[i], s1[i])
+                episode_reward += r
+                episode_step_count += 1
+                total_steps += nb_envs
+                self.timer.add_steps(nb_envs)
+                with main_lock:
+                    Worker.total_env_steps += nb_envs
+
+                done_envs = [i for i in range(nb_envs) if d[i]]
+                if FLAGS.a2c:
+                    # Every environment steps max_episode_buffer_size times per round, then all of them are
+                    # trained together after the next forward pass
+                    round_step = (round_step + 1) % FLAGS.max_episode_buffer_size
+                    pending_envs = [i for i in range(nb_envs) if not d[i] and round_step == 0]
+                else:
+                    pending_envs = [i for i in range(nb_envs) if not d[i] and
+                                    len(episode_buffers[i]) == FLAGS.max_episode_buffer_size]
+
+                if done_envs and FLAGS.a2c:
+                    finished_batches += [[np.copy(column) for column in self.process_rollout(episode_buffers[i], 0)]
+                                         for i in done_envs]
+                    for i in done_envs:
+                        episode_buffers[i].clear()
+                elif done_envs:
+                    summaries = any(self.is_summary_episode(episode_count + j) for j in range(len(done_envs)))
+                    histograms = any(self.is_histogram_episode(episode_count + j) for j in range(len(done_envs)))
+                    stats = self.train([episode_buffers[i] for i in done_envs], np.zeros(len(done_envs)),
+                                       summaries=summaries, histograms=histograms)
+                    if summaries:
+                        train_stats = stats
+                    for i in done_envs:
+                        episode_buffers[i].clear()
+                    self.sync_local_params(self.last_global_version)
+
+                s = s1
+                if FLAGS.lstm:
+                    rnn_state = [np.array(state) for state in rnn_state_new]
+
+                for i in done_envs:
+                    if FLAGS.verbose and self.name == 'worker_0':
+                        print("Episode {}. Game dynamics - meta_level {}, flip {}".format(
+                            episode_count, infos[i]["meta_level"], infos[i]["flip"]))
+
+                    self.episode_rewards.add(episode_reward[i])
+                    self.episode_lengths.add(episode_step_count[i])
+                    self.episode_mean_values.add(np.mean(episode_values[i]))
+
+                    if self.is_summary_episode(episode_count) and self.name == 'worker_0' and FLAGS.a2c:
+                        summary_episode = episode_count
+                    elif self.is_summary_episode(episode_count) and self.name == 'worker_0' and \
+                                    train_stats is not None:
+                        self.write_summaries(episode_count, train_stats)
+                    if self.name == 'worker_0' and FLAGS.train:
+                        t = time.time()
+                        checkpoint_writer.maybe_save(self.sess, episode_count)
+                        self.timer.lap('Checkpoint', t)
+                    if frame_captures[i].frames:
+                        t = time.time()
+                        self.write_frames(frame_captures[i], episode_count)
+                        self.timer.lap('Frames', t)
+                    if self.is_summary_episode(episode_count):
+                        self.timer.write_summaries(self.summary_dir, episode_count)
+                    if self.name == 'worker_0':
+                        self.sess.run(self.increment_global_episode)
+                    episode_count += 1
+
+                    episode_values[i] = []
+                    frame_captures[i].start_episode(episode_count)
+                    self.capture_frame(frame_captures[i], s[i])
+                    episode_reward[i] = 0
+                    episode_step_count[i] = 0
+                    r[i] = 0
+                    a[i] = 0
                     if FLAGS.lstm:
-                        if FLAGS.meta:
-                            feed_dict = {
-                                self.local_AC.prev_rewards: [[r]],
-                                self.local_AC.inputs: [s],
-                                self.local_AC.prev_actions: [a],
-                                self.local_AC.state_in[0]: rnn_state[0],
-                                self.local_AC.state_in[1]: rnn_state[1]}
-                        else:
-                            feed_dict = {self.local_AC.inputs: [s],
-                                         self.local_AC.state_in[0]: rnn_state[0],
-                                         self.local_AC.state_in[1]: rnn_state[1]}
-
-                        pi, v, rnn_state = self.sess.run(
-                            [self.local_AC.policy, self.local_AC.value, self.local_AC.state_out],
-                            feed_dict=feed_dict)
-                    else:
-                        feed_dict = {self.local_AC.inputs: [s]}
-
-                        pi, v = self.sess.run(
-                            [self.local_AC.policy, self.local_AC.value],
-                            feed_dict=feed_dict)
-
-                    a = np.random.choice(pi[0], p=pi[0])
-                    a = np.argmax(pi == a)
-
-                    s1, r, d, info = self.env.step(a)
-
-                    r = np.clip(r, -1, 1)
-
-                    if not d:
-                        episode_frames.append(s1)
-                    else:
-                        s1 = s
-
-                    episode_buffer.append([s, a, r, s1, d, v[0, 0]])
-                    episode_values.append(v[0, 0])
-
-                    episode_reward += r
-                    s = s1
-                    total_steps += 1
-                    episode_step_count += 1
-
-                    if len(episode_buffer) == FLAGS.max_episode_buffer_size and not d:
-                        if FLAGS.lstm:
-                            if FLAGS.meta:
-                                feed_dict = {
-                                    self.local_AC.prev_rewards: [[r]],
-                                    self.local_AC.inputs: [s],
-                                    self.local_AC.prev_actions: [a],
-                                    self.local_AC.state_in[0]: rnn_state[0],
-                                    self.local_AC.state_in[1]: rnn_state[1]}
-                            else:
-                                feed_dict = {self.local_AC.inputs: [s],
-                                             self.local_AC.state_in[0]: rnn_state[0],
-                                             self.local_AC.state_in[1]: rnn_state[1]}
-                            v1 = self.sess.run(self.local_AC.value,
-                                               feed_dict=feed_dict)[0, 0]
-                        else:
-                            feed_dict = {self.local_AC.inputs: [s]}
-                            v1 = self.sess.run(self.local_AC.value,
-                                               feed_dict=feed_dict)[0, 0]
-                        if episode_count % FLAGS.summary_interval == 0 and episode_count != 0:
-                            l, v_l, p_l, e_l, g_n, v_n, ms, img_summ, max_v, min_v, mean_v, max_r, min_r, mean_r = self.train(
-                                episode_buffer, v1, summaries=True)
-                        else:
-                            self.train(episode_buffer, v1)
-                        episode_buffer = []
-                        self.sess.run(self.update_local_ops)
-                    if d:
-                        break
-
-                self.episode_rewards.append(episode_reward)
-                self.episode_lengths.append(episode_step_count)
-                self.episode_mean_values.append(np.mean(episode_values))
-
-                if len(episode_buffer) != 0:
-                    if episode_count % FLAGS.summary_interval == 0 and episode_count != 0:
-                        l, v_l, p_l, e_l, g_n, v_n, ms, img_summ, max_v, min_v, mean_v, max_r, min_r, mean_r = self.train(
-                            episode_buffer, 0.0, summaries=True)
-                    else:
-                        self.train(episode_buffer, 0.0)
-
-                if episode_count % FLAGS.summary_interval == 0 and episode_count != 0 and self.name == 'worker_0':
-                    if episode_count % FLAGS.checkpoint_interval == 0 and FLAGS.train == True:
-                        saver.save(self.sess, self.model_path + '/model-' + str(episode_count) + '.cptk',
-                                   global_step=self.global_episode)
-                        print("Saved Model at {}".format(self.model_path + '/model-' + str(episode_count) + '.cptk'))
-
-                    mean_reward = np.mean(self.episode_rewards[-FLAGS.summary_interval:])
-                    mean_length = np.mean(self.episode_lengths[-FLAGS.summary_interval:])
-                    mean_value = np.mean(self.episode_mean_values[-FLAGS.summary_interval:])
-
-                    # if episode_count % FLAGS.test_performance_interval == 0:
-                    #     won_games = self.episode_rewards[-FLAGS.test_performance_interval:].count(1)
-                    #     self.summary.value.add(tag='Perf/Won Games/1000', simple_value=float(won_games))
-
-                    self.summary.value.add(tag='Perf/Reward', simple_value=float(mean_reward))
-                    self.summary.value.add(tag='Perf/Length', simple_value=float(mean_length))
-                    self.summary.value.add(tag='Perf/Value', simple_value=float(mean_value))
-
-                    # if FLAGS.train:
-                    self.summary.value.add(tag='Value/Max', simple_value=float(max_v))
-                    self.summary.value.add(tag='Value/Min', simple_value=float(min_v))
-                    self.summary.value.add(tag='Value/Mean', simple_value=float(mean_v))
-                    self.summary.value.add(tag='Reward/Max', simple_value=float(max_r))
-                    self.summary.value.add(tag='Reward/Min', simple_value=float(min_r))
-                    self.summary.value.add(tag='Reward/Mean', simple_value=float(mean_r))
-
-                    self.summary.value.add(tag='Losses/Total Loss', simple_value=float(l))
-                    self.summary.value.add(tag='Losses/Value Loss', simple_value=float(v_l))
-                    self.summary.value.add(tag='Losses/Policy Loss', simple_value=float(p_l))
-                    self.summary.value.add(tag='Losses/Entropy', simple_value=float(e_l))
-                    self.summary.value.add(tag='Losses/Grad Norm', simple_value=float(g_n))
-                    self.summary.value.add(tag='Losses/Var Norm', simple_value=float(v_n))
-                    # if False:
-                    summaries = tf.Summary().FromString(ms)
-                    sub_summaries_dict = {}
-                    for value in summaries.value:
-                        value_field = value.WhichOneof('value')
-                        value_ifo = sub_summaries_dict.setdefault(value.tag,
-                                                                  {'value_field': None, 'values': []})
-                        if not value_ifo['value_field']:
-                            value_ifo['value_field'] = value_field
-                        else:
-                            assert value_ifo['value_field'] == value_field
-                        value_ifo['values'].append(getattr(value, value_field))
-
-                    for name, value_ifo in sub_summaries_dict.items():
-                        summary_value = self.summary.value.add()
-                        summary_value.tag = name
-                        if value_ifo['value_field'] == 'histo':
-                            values = value_ifo['values']
-                            summary_value.histo.min = min([x.min for x in values])
-                            summary_value.histo.max = max([x.max for x in values])
-                            summary_value.histo.num = sum([x.num for x in values])
-                            summary_value.histo.sum = sum([x.sum for x in values])
-                            summary_value.histo.sum_squares = sum([x.sum_squares for x in values])
-                            for lim in values[0].bucket_limit:
-                                summary_value.histo.bucket_limit.append(lim)
-                            for bucket in values[0].bucket:
-                                summary_value.histo.bucket.append(bucket)
-                        else:
-                            print(
-                                'Warning: could not aggregate summary of type {}'.format(value_ifo['value_field']))
-                    for s in img_summ:
-                        self.summary_writer.add_summary(s, episode_count)
-                    self.summary_writer.add_summary(self.summary, episode_count)
-
-                    self.summary_writer.flush()
-                if self.name == 'worker_0':
-                    self.sess.run(self.increment_global_episode)
-                episode_count += 1
+                        rnn_state[0][i] = 0
+                        rnn_state[1][i] = 0
+
+    def write_summaries(self, episode_count, train_stats):
+        start_time = time.time()
+        l, v_l, p_l, e_l, g_n, v_n, ms, img_summ, max_v, min_v, mean_v, max_r, min_r, mean_r = train_stats
+
+        mean_reward = self.episode_rewards.mean()
+        mean_length = self.episode_lengths.mean()
+        mean_value = self.episode_mean_values.mean()
+
+        # if episode_count % FLAGS.test_performance_interval == 0:
+        #     won_games = self.episode_rewards[-FLAGS.test_performance_interval:].count(1)
+        #     scalars.append(('Perf/Won Games/1000', won_games))
+
+        scalars = [('Perf/Reward', mean_reward),
+                   ('Perf/Length', mean_length),
+                   ('Perf/Value', mean_value)]
+
+        now, total_synced_bytes, total_env_steps = time.time(), Worker.total_synced_bytes, Worker.total_env_steps
+        last_time, last_synced_bytes, last_env_steps = self.last_rates_report
+        scalars.append(('Perf/Synced bytes per second', (total_synced_bytes - last_synced_bytes) / (now - last_time)))
+        scalars.append(('Perf/Steps per second', (total_env_steps - last_env_steps) / (now - last_time)))
+        self.last_rates_report = (now, total_synced_bytes, total_env_steps)
+        if self.checkpoint_writer is not None and self.checkpoint_writer.block_times:
+            scalars.append(('Perf/Checkpoint block ms', 1000 * self.checkpoint_writer.block_times[-1]))
+
+        # if FLAGS.train:
+        scalars += [('Value/Max', max_v),
+                    ('Value/Min', min_v),
+                    ('Value/Mean', mean_v),
+                    ('Reward/Max', max_r),
+                    ('Reward/Min', min_r),
+                    ('Reward/Mean', mean_r)]
+
+        scalars += [('Losses/Total Loss', l),
+                    ('Losses/Value Loss', v_l),
+                    ('Losses/Policy Loss', p_l),
+                    ('Losses/Entropy', e_l),
+                    ('Losses/Grad Norm', g_n),
+                    ('Losses/Var Norm', v_n)]
+        # The histograms are merged and everything is written on the summary thread
+        get_summary_writer().add(self.summary_dir, episode_count, scalars, [ms] if ms is not None else [], img_summ)
+        self.timer.lap('Summaries', start_time)
@@ -1,4 +1,4 @@
-from collections import deque
+import time
 
 import numpy as np
 from skimage.color import rgb2gray
@@ -6,11 +6,15 @@ from skimage.color import rgb2gray
 from PIL import Image
 
 class AtariEnvironment(object):
-    def __init__(self, gym_env, resized_width, resized_height, agent_history_length):
+    def __init__(self, gym_env, resized_width, resized_height, agent_history_length, raw_frames=False):
         self.env = gym_env
         self.resized_width = resized_width
         self.resized_height = resized_height
         self.agent_history_length = agent_history_length
+        # With raw_frames the states are stacks of RGB observations of shape [AGENT_HISTORY_LENGTH, height, width, 3],
+        # only subsampled with integer strides, and the preprocessing is left to the network graph
+        self.raw_frames = raw_frames
+        self.strides = None
 
         self.gym_actions = range(gym_env.action_space.n)
         if (gym_env.spec.id == "Pong-v0" or gym_env.spec.id == "Breakout-v0"):
@@ -20,21 +24,43 @@ class AtariEnvironment(object):
             # pick from a simplified "LEFT", "RIGHT", "NOOP" action space.
             self.gym_actions = [1, 2, 3]
 
-        # Screen buffer of size AGENT_HISTORY_LENGTH to be able
-        # to build state arrays of size [1, AGENT_HISTORY_LENGTH, width, height]
-        self.state_buffer = deque()
+        # Ring buffer of uint8 frames in which every frame is written twice, AGENT_HISTORY_LENGTH channels apart,
+        # so that the last AGENT_HISTORY_LENGTH frames are always one contiguous [height, width, AGENT_HISTORY_LENGTH]
+        # slice starting at buffer_index, ordered from the oldest to the newest frame
+        # (raw frames are ringed along the first axis instead and the buffer is allocated at the first reset)
+        self.state_buffer = np.zeros((resized_height, resized_width, 2 * agent_history_length), dtype=np.uint8)
+        self.buffer_index = 0
+        # Seconds spent preprocessing frames, read by the phase timers of the agents
+        self.preprocess_time = 0.0
 
     def get_initial_state(self):
-        # Clear the state buffer
-        self.state_buffer = deque()
-
         x_t = self.env.reset()
-        x_t = self.get_preprocessed_frame(x_t)
-        s_t = np.stack((x_t, x_t, x_t, x_t), axis=2)
 
-        for i in range(self.agent_history_length - 1):
-            self.state_buffer.append(x_t)
-        return s_t
+        if self.raw_frames:
+            x_t = self.subsample(x_t)
+            if self.state_buffer.shape[1:] != x_t.shape:
+                self.state_buffer = np.zeros((2 * self.agent_history_length,) + x_t.shape, dtype=np.uint8)
+            self.state_buffer[:] = x_t
+        else:
+            x_t = self.get_preprocessed_frame(x_t)
+            self.state_buffer[:] = x_t[:, :, np.newaxis]
+        self.buffer_index = 0
+        return self.get_state()
+
+    def get_state(self):
+        # The returned state is a view into the ring buffer and is only valid until the next step
+        if self.raw_frames:
+            return self.state_buffer[self.buffer_index:self.buffer_index + self.agent_history_length]
+        return self.state_buffer[:, :, self.buffer_index:self.buffer_index + self.agent_history_length]
+
+    def subsample(self, observation):
+        # Every stride-th row and column, with the largest strides that keep the frame at least as large as the
+        # resized one. A 210x160 frame resized to 84x84 is fed as 105x160x3, half of the raw observation but still
+        # about 7 times the uint8 luminance frame
+        if self.strides is None:
+            self.strides = (max(observation.shape[0] // self.resized_height, 1),
+                            max(observation.shape[1] // self.resized_width, 1))
+        return observation[::self.strides[0], ::self.strides[1]]
 
     def get_preprocessed_frame(self, observation):
         # gray = 0.2125 * observation[..., 0]
@@ -44,31 +70,33 @@ class AtariEnvironment(object):
         #
         #     return gray
 
+        start_time = time.time()
         img = Image.fromarray(observation)
         # lum = lum.convert('L')
 
         img = img.resize((self.resized_width, self.resized_height))
-        pix = np.array(img).astype(float)
-        pix = np.dot(pix, [.2126, .7152, .0722])
-        pix = pix.astype(float) / 255
+        pix = np.dot(np.array(img), [.2126, .7152, .0722])
         # return self.color2gray(observation).resize((self.resized_width, self.resized_height))
+        # Rounded, truncating would bias every pixel of the float luminance downwards
+        pix = np.round(pix).astype(np.uint8)
+        self.preprocess_time += time.time() - start_time
         return pix
 
     def step(self, action_index):
         x_t1, r_t, terminal, info = self.env.step(self.gym_actions[action_index])
-        x_t1 = self.get_preprocessed_frame(x_t1)
-
-        previous_frames = np.array(self.state_buffer)
-        previous_frames = np.transpose(previous_frames, axes=(1, 2, 0))
-        s_t1 = np.empty((self.resized_height, self.resized_width, self.agent_history_length))
-        s_t1[:, :, :self.agent_history_length - 1] = previous_frames
-        s_t1[:, :, self.agent_history_length - 1] = x_t1
 
-        # Pop the oldest frame, add the current frame to the queue
-        self.state_buffer.popleft()
-        self.state_buffer.append(x_t1)
+        # Overwrite the oldest frame in both halves of the buffer and move the window one frame forward
+        if self.raw_frames:
+            x_t1 = self.subsample(x_t1)
+            self.state_buffer[self.buffer_index] = x_t1
+            self.state_buffer[self.buffer_index + self.agent_history_length] = x_t1
+        else:
+            x_t1 = self.get_preprocessed_frame(x_t1)
+            self.state_buffer[:, :, self.buffer_index] = x_t1
+            self.state_buffer[:, :, self.buffer_index + self.agent_history_length] = x_t1
+        self.buffer_index = (self.buffer_index + 1) % self.agent_history_length
 
-        return s_t1, r_t, terminal, info
+        return self.get_state(), r_t, terminal, info
 
     # def color2gray(self, rgb):
     #     if rgb.ndim == 2:
@@ -94,4 +122,34 @@ class AtariEnvironment(object):
     #                "got (" + (", ".join(map(str, arr.shape))) + ")")
     #         raise ValueError(msg)
     #
-    #     return arr.astype(float)
\ No newline at end of file
+    #     return arr.astype(float)
+
+
+class BatchedAtariEnvironment(object):
+    """Steps several AtariEnvironments in lockstep so that a worker can run a single batched inference per step.
+    Environments that finish an episode are reset in place, so the returned states are always valid inputs."""
+
+    def __init__(self, envs):
+        self.envs = envs
+        self.nb_envs = len(envs)
+        self.gym_actions = envs[0].gym_actions
+
+    @property
+    def preprocess_time(self):
+        return sum(env.preprocess_time for env in self.envs)
+
+    def get_initial_state(self):
+        return np.stack([env.get_initial_state() for env in self.envs], axis=0)
+
+    def step(self, action_indices):
+        states, rewards, terminals, infos = [], [], [], []
+        for env, action_index in zip(self.envs, action_indices):
+            s_t1, r_t, terminal, info = env.step(action_index)
+            if terminal:
+                s_t1 = env.get_initial_state()
+            states.append(s_t1)
+            rewards.append(r_t)
+            terminals.append(terminal)
+            infos.append(info)
+
+        return np.stack(states, axis=0), np.array(rewards), np.array(terminals), infos
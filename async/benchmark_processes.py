@@ -0,0 +1,68 @@
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+
+try:
+    import gym_fast_envs
+except ImportError:
+    # Offline only the stand-in games of catcher are available
+    pass
+import catcher
+import tensorflow as tf
+from process_actors import Learner
+from run import recreate_directory_structure, nb_game_actions
+import flags
+
+FLAGS = tf.app.flags.FLAGS
+
+
+def run_configuration():
+    # Runs in a process of its own, so the actors are forked before any session or writer thread exists
+    recreate_directory_structure()
+    steps_per_second = Learner(nb_game_actions(), FLAGS.nb_concurrent).run(duration=FLAGS.benchmark_seconds)
+    with open(FLAGS.bench_result, 'w') as f:
+        json.dump({'steps_per_second': steps_per_second}, f)
+
+
+def run():
+    if not tf.gfile.Exists(FLAGS.experiments_dir):
+        tf.gfile.MakeDirs(FLAGS.experiments_dir)
+    nb_cores = multiprocessing.cpu_count()
+    # The learner takes one core, actor counts double up to the remaining ones
+    nb_actors = 1
+    results = []
+    while nb_actors <= max(nb_cores - 1, 1):
+        name = "actors_{}".format(nb_actors)
+        result_file = os.path.join(FLAGS.experiments_dir, name + ".json")
+        subprocess.call([sys.executable, "benchmark_processes.py"] + sys.argv[1:] +
+                        ["--nb_concurrent={}".format(nb_actors),
+                         "--bench_result={}".format(result_file),
+                         "--summaries_dir={}".format(os.path.join(FLAGS.summaries_dir, name)),
+                         "--checkpoint_dir={}".format(os.path.join(FLAGS.checkpoint_dir, name)),
+                         "--experiments_dir={}".format(os.path.join(FLAGS.experiments_dir, name))])
+        if os.path.exists(result_file):
+            with open(result_file) as f:
+                steps_per_second = json.load(f)['steps_per_second']
+            print("{} actors: {:.1f} steps/sec".format(nb_actors, steps_per_second))
+        else:
+            steps_per_second = None
+            print("{} actors failed".format(nb_actors))
+        results.append((nb_actors, steps_per_second))
+        nb_actors *= 2
+
+    print("actors  steps/sec  speedup")
+    baseline = next((steps_per_second for _, steps_per_second in results if steps_per_second), None)
+    for nb_actors, steps_per_second in results:
+        if steps_per_second is None:
+            print("{:6d}  {:>9s}  {:>7s}".format(nb_actors, "failed", "-"))
+        else:
+            print("{:6d}  {:9.1f}  {:7.2f}".format(nb_actors, steps_per_second, steps_per_second / baseline))
+
+
+if __name__ == '__main__':
+    if FLAGS.bench_result:
+        run_configuration()
+    else:
+        run()
@@ -0,0 +1,86 @@
+import gym
+import numpy as np
+from gym import spaces
+from gym.envs.registration import register, registry
+from gym.utils import seeding
+
+
+class Catcher(gym.Env):
+    """Pure numpy stand-in for the PLE Catcher game of CatcherPle-v0. A paddle at the bottom of a 64x64 RGB screen
+    catches fruits falling from random columns, a catch is worth +1, a miss -1 and a life. It needs neither pygame nor
+    gym_fast_envs, so the benchmarks run on an offline machine."""
+    metadata = {'render.modes': ['human', 'rgb_array']}
+
+    def __init__(self, width=64, height=64, lives=3):
+        self.width = width
+        self.height = height
+        self.lives = lives
+        self.paddle_width = int(0.2 * width)
+        self.paddle_height = max(int(0.04 * height), 1)
+        self.paddle_speed = max(int(0.06 * width), 1)
+        self.fruit_size = max(int(0.06 * width), 1)
+        self.fruit_speed = max(int(0.03 * height), 1)
+
+        # Left, right and no-op, the action set of the PLE game
+        self.action_space = spaces.Discrete(3)
+        self.observation_space = spaces.Box(low=0, high=255, shape=(height, width, 3))
+        self.screen = np.zeros((height, width, 3), dtype=np.uint8)
+        self.viewer = None
+        self._seed()
+
+    def _seed(self, seed=None):
+        self.np_random, seed = seeding.np_random(seed)
+        return [seed]
+
+    def _reset(self):
+        self.remaining_lives = self.lives
+        self.paddle_x = (self.width - self.paddle_width) // 2
+        self.new_fruit()
+        return self.draw()
+
+    def _step(self, action):
+        if action == 0:
+            self.paddle_x = max(self.paddle_x - self.paddle_speed, 0)
+        elif action == 1:
+            self.paddle_x = min(self.paddle_x + self.paddle_speed, self.width - self.paddle_width)
+        self.fruit_y += self.fruit_speed
+
+        reward = 0.0
+        if self.fruit_y + self.fruit_size >= self.height - self.paddle_height:
+            if self.paddle_x - self.fruit_size < self.fruit_x < self.paddle_x + self.paddle_width:
+                reward = 1.0
+            else:
+                reward = -1.0
+                self.remaining_lives -= 1
+            self.new_fruit()
+
+        return self.draw(), reward, self.remaining_lives == 0, {}
+
+    def new_fruit(self):
+        self.fruit_x = self.np_random.randint(0, self.width - self.fruit_size + 1)
+        self.fruit_y = 0
+
+    def draw(self):
+        self.screen[:] = 0
+        self.screen[self.fruit_y:self.fruit_y + self.fruit_size, self.fruit_x:self.fruit_x + self.fruit_size] = \
+            (255, 64, 64)
+        self.screen[self.height - self.paddle_height:, self.paddle_x:self.paddle_x + self.paddle_width] = 255
+        # The screen is redrawn in place, callers get their own copy
+        return self.screen.copy()
+
+    def _render(self, mode='human', close=False):
+        if close:
+            if self.viewer is not None:
+                self.viewer.close()
+                self.viewer = None
+            return
+        if mode == 'rgb_array':
+            return self.screen.copy()
+        from gym.envs.classic_control import rendering
+        if self.viewer is None:
+            self.viewer = rendering.SimpleImageViewer()
+        self.viewer.imshow(self.screen)
+
+
+if 'CatcherOffline-v0' not in registry.env_specs:
+    register(id='CatcherOffline-v0', entry_point='catcher:Catcher')
@@ -0,0 +1,51 @@
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+import tensorflow as tf
+import flags
+
+FLAGS = tf.app.flags.FLAGS
+
+
+def read_scalars(summaries_dir, tag):
+    values = []
+    for events_file in tf.gfile.Glob(os.path.join(summaries_dir, "worker_0", "events.out.tfevents.*")):
+        for event in tf.train.summary_iterator(events_file):
+            for value in event.summary.value:
+                if value.tag == tag:
+                    values.append((event.step, value.simple_value))
+    return sorted(values)
+
+
+def run():
+    # Trains once per accumulation setting for benchmark_seconds, each in its own summaries directory so the
+    # learning curves can be overlaid in tensorboard
+    results = []
+    for accumulation_steps in [int(k) for k in FLAGS.compare_accumulation_steps.split(",")]:
+        name = "accumulation_{}".format(accumulation_steps)
+        summaries_dir = os.path.join(FLAGS.summaries_dir, name)
+        process = subprocess.Popen([sys.executable, "run.py"] + sys.argv[1:] +
+                                   ["--grad_accumulation_steps={}".format(accumulation_steps),
+                                    "--summaries_dir={}".format(summaries_dir),
+                                    "--checkpoint_dir={}".format(os.path.join(FLAGS.checkpoint_dir, name)),
+                                    "--experiments_dir={}".format(os.path.join(FLAGS.experiments_dir, name))])
+        time.sleep(FLAGS.benchmark_seconds)
+        process.kill()
+        process.wait()
+
+        steps_per_second = [v for _, v in read_scalars(summaries_dir, 'Perf/Steps per second')]
+        rewards = read_scalars(summaries_dir, 'Perf/Reward')
+        results.append((accumulation_steps, np.mean(steps_per_second) if steps_per_second else float('nan'),
+                        rewards[-1] if rewards else (0, float('nan'))))
+
+    print("accumulation  steps/sec  episodes  last mean reward")
+    for accumulation_steps, steps_per_second, (episode, reward) in results:
+        print("{:12d}  {:9.1f}  {:8d}  {:16.3f}".format(accumulation_steps, steps_per_second, episode, reward))
+    print("Learning curves: tensorboard --logdir={}".format(FLAGS.summaries_dir))
+
+
+if __name__ == '__main__':
+    run()
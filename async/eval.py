@@ -2,6 +2,7 @@ import sys
 import os
 import itertools
 import collections
+import multiprocessing
 import numpy as np
 import tensorflow as tf
 import time
@@ -10,103 +11,231 @@ from gym.wrappers import Monitor
 from atari_environment import AtariEnvironment
 from network import ACNetwork
 from network_lstm import ACNetworkLSTM
-from utils import update_target_graph
+from utils import update_target_graph, InferenceGraph
 import gym
+try:
+    import gym_fast_envs
+except ImportError:
+    # Offline only the stand-in games of catcher are available
+    pass
+# Spawned eval processes only import this module, the games have to be registered here too
+import catcher
 import flags
 
 FLAGS = tf.app.flags.FLAGS
 
 
+def make_eval_env(seed=None):
+    gym_env = gym.make(FLAGS.game)
+    gym_env.seed(seed)
+    return AtariEnvironment(gym_env=gym_env, resized_width=FLAGS.resized_width,
+                            resized_height=FLAGS.resized_height,
+                            agent_history_length=FLAGS.agent_history_length,
+                            raw_frames=FLAGS.graph_preprocessing)
+
+
+def make_eval_envs(nb_envs, seed=None):
+    # Every environment gets a seed of its own, otherwise they would all play the same games
+    return [make_eval_env(None if seed is None else seed + i) for i in range(nb_envs)]
+
+
+def eval_process(path, nb_episodes, nb_envs, seed):
+    """Plays nb_episodes episodes of the policy exported at path on nb_envs environments of its own, the target of
+    the processes of PolicyMonitor.eval_in_processes."""
+    envs = make_eval_envs(nb_envs, seed)
+    inference_graph = InferenceGraph(path)
+    pe = PolicyMonitor(envs[0], len(envs[0].gym_actions), inference_graph=inference_graph, extra_games=envs[1:],
+                       summaries=False)
+    results = pe.eval_episodes(None, nb_episodes)
+    inference_graph.close()
+    return results
+
+
 class PolicyMonitor(object):
-    def __init__(self, game, nb_actions, optimizer, global_step):
+    """Evaluates the global network through a policy_eval copy in the training graph, or the policy of an
+    InferenceGraph, which needs neither the training graph nor a session to be passed. The extra_games are played
+    together with game by eval_episodes, with one batched inference per step."""
+
+    def __init__(self, game, nb_actions, optimizer=None, global_step=None, inference_graph=None, extra_games=(),
+                 summaries=True):
         self.name = "policy_eval"
-        if FLAGS.lstm:
-            self.local_AC = ACNetworkLSTM(self.name, nb_actions, optimizer)
-        else:
-            self.local_AC = ACNetwork(self.name, nb_actions, optimizer)
-        self.update_local_ops = update_target_graph('global', self.name)
-        self.summary_writer = tf.summary.FileWriter(FLAGS.summaries_dir + "/policy_eval")
+        self.inference_graph = inference_graph
+        if inference_graph is None:
+            if FLAGS.lstm:
+                self.local_AC = ACNetworkLSTM(self.name, nb_actions, optimizer)
+            else:
+                self.local_AC = ACNetwork(self.name, nb_actions, optimizer)
+            self.signature = self.local_AC.inference_signature()
+            self.update_local_ops = update_target_graph('global', self.name)
+        self.summary_writer = None
+        if summaries:
+            self.summary_writer = tf.summary.FileWriter(FLAGS.summaries_dir + "/policy_eval")
         self.env = game
+        self.envs = [game] + list(extra_games)
         self.actions = np.zeros([nb_actions])
         self.global_episode = global_step
 
-    def eval_1000(self, sess):
-        rewards = []
-        for i in range(1000):
-            episode_reward, _ = self.eval_once(sess, False)
-            rewards.append(episode_reward)
-        episode_count = sess.run(self.global_episode)
+    def episode_count(self, sess):
+        if self.inference_graph is not None:
+            return self.inference_graph.episode_count
+        return sess.run(self.global_episode)
+
+    def run_policy(self, sess, outputs, inputs):
+        if self.inference_graph is not None:
+            return self.inference_graph.run(outputs, inputs)
+        return sess.run([self.signature['outputs'][name] for name in outputs],
+                        feed_dict={self.signature['inputs'][name]: value for name, value in inputs.items()})
+
+    def initial_rnn_state(self):
+        if self.inference_graph is not None:
+            return [self.inference_graph.zero_state('state_in_c'), self.inference_graph.zero_state('state_in_h')]
+        return self.local_AC.state_init
+
+    def eval_episodes(self, sess, nb_episodes):
+        """Plays nb_episodes episodes on all the environments at once, an environment that finishes an episode only
+        starts a new one while fewer than nb_episodes were started, so long episodes are not cut short. Returns the
+        total reward and the length of every episode."""
+        if self.inference_graph is None:
+            sess.run(self.update_local_ops)
+
+        nb_envs = min(len(self.envs), nb_episodes)
+        rewards = [0.0] * nb_episodes
+        lengths = [0] * nb_episodes
+        episodes = list(range(nb_envs))
+        next_episode = nb_envs
+        s = [env.get_initial_state() for env in self.envs[:nb_envs]]
+        r = np.zeros(nb_envs, dtype=np.float32)
+        a = np.zeros(nb_envs, dtype=np.int32)
+        if FLAGS.lstm:
+            # The batch tensors advance every row by a single step with a recurrent state of its own
+            rnn_state = [np.repeat(state, nb_envs, axis=0) for state in self.initial_rnn_state()]
+
+        active = list(range(nb_envs))
+        while active:
+            inputs = {'inputs': np.stack([s[i] for i in active], axis=0)}
+            if FLAGS.lstm:
+                if FLAGS.meta:
+                    inputs.update(prev_rewards=np.vstack(r[active]), prev_actions=a[active])
+                inputs.update(batch_state_in_c=rnn_state[0][active], batch_state_in_h=rnn_state[1][active])
+                actions, c, h = self.run_policy(
+                    sess, ['batch_sampled_action', 'batch_state_out_c', 'batch_state_out_h'], inputs)
+                rnn_state[0][active], rnn_state[1][active] = c, h
+            else:
+                actions, = self.run_policy(sess, ['sampled_action'], inputs)
+
+            still_active = []
+            for i, action in zip(active, actions):
+                s[i], r[i], d, _ = self.envs[i].step(action)
+                a[i] = action
+                rewards[episodes[i]] += r[i]
+                lengths[episodes[i]] += 1
+                if not d:
+                    still_active.append(i)
+                elif next_episode < nb_episodes:
+                    episodes[i] = next_episode
+                    next_episode += 1
+                    s[i] = self.envs[i].get_initial_state()
+                    r[i] = 0
+                    a[i] = 0
+                    if FLAGS.lstm:
+                        rnn_state[0][i] = 0
+                        rnn_state[1][i] = 0
+                    still_active.append(i)
+            active = still_active
+
+        return rewards, lengths
+
+    def eval_in_processes(self, nb_episodes, nb_processes):
+        """Splits nb_episodes episodes of the inference graph over nb_processes processes, each one plays as many
+        environments as this monitor."""
+        shares = [nb_episodes // nb_processes + (1 if i < nb_episodes % nb_processes else 0)
+                  for i in range(nb_processes)]
+        # Spawned, a forked child would inherit the TensorFlow runtime of this process
+        with multiprocessing.get_context('spawn').Pool(nb_processes) as pool:
+            results = pool.starmap(eval_process, [
+                (self.inference_graph.path, share, len(self.envs),
+                 None if FLAGS.seed is None else FLAGS.seed + i * len(self.envs))
+                for i, share in enumerate(shares) if share > 0])
+        return [reward for rewards, _ in results for reward in rewards]
+
+    def eval_1000(self, sess=None):
+        # Only an exported inference graph can be loaded by other processes
+        if self.inference_graph is not None and FLAGS.eval_processes > 1:
+            rewards = self.eval_in_processes(1000, FLAGS.eval_processes)
+        else:
+            rewards, _ = self.eval_episodes(sess, 1000)
+        episode_count = self.episode_count(sess)
         print("Rewards 1000 : {}".format(rewards))
         print(
             "Total eval results won games with 1 {}/1000, games with -1 {}/1000, games with 0 {}/1000 after {} of training".format(
                 rewards.count(1), rewards.count(-1), rewards.count(0), episode_count))
+        return rewards
+
+    def eval_inference_graph(self, inference_graph, nb_episodes):
+        """Evaluates the policy of inference_graph over nb_episodes episodes, the means are written to the eval
+        summaries at the episode count of its checkpoint."""
+        self.inference_graph = inference_graph
+        rewards, lengths = self.eval_episodes(None, nb_episodes)
+        episode_summary = tf.Summary()
+        episode_summary.value.add(simple_value=np.mean(rewards), tag="eval/mean_total_reward")
+        episode_summary.value.add(simple_value=np.mean(lengths), tag="eval/mean_episode_length")
+        self.summary_writer.add_summary(episode_summary, inference_graph.episode_count)
+        self.summary_writer.flush()
+        return np.mean(rewards), np.mean(lengths)
+
+    def eval_once(self, sess=None, summaries=True):
+        if self.inference_graph is None:
+            with sess.as_default(), sess.graph.as_default():
+                # Copy params to local model
+                sess.run(self.update_local_ops)
+        episode_count = self.episode_count(sess)
+
+        # Run an episode
+        d = False
+        s = self.env.get_initial_state()
+        if FLAGS.verbose:
+            print("Episode {}. Game dynamics - meta_level {}, flip {}".format(episode_count, info["meta_level"],
+                                                                              info["flip"]))
+        if FLAGS.meta:
+            r = 0
+            a = 0
+        total_reward = 0.0
+        episode_length = 0
 
-    def eval_once(self, sess, summaries=True):
-        with sess.as_default(), sess.graph.as_default():
-            # Copy params to local model
-            episode_count = sess.run(self.global_episode)
-            sess.run(self.update_local_ops)
-
-            # Run an episode
-            d = False
-            s = self.env.get_initial_state()
-            if FLAGS.verbose:
-                print("Episode {}. Game dynamics - meta_level {}, flip {}".format(episode_count, info["meta_level"],
-                                                                                  info["flip"]))
-            if FLAGS.meta:
-                r = 0
-                a = 0
-            total_reward = 0.0
-            episode_length = 0
+        if FLAGS.lstm:
+            rnn_state = self.initial_rnn_state()
 
+        while not d:
+            inputs = {'inputs': [s]}
             if FLAGS.lstm:
-                rnn_state = self.local_AC.state_init
-
-            while not d:
-                if FLAGS.lstm:
-                    if FLAGS.meta:
-                        feed_dict = {
-                            self.local_AC.prev_rewards: [[r]],
-                            self.local_AC.inputs: [s],
-                            self.local_AC.prev_actions: [a],
-                            self.local_AC.state_in[0]: rnn_state[0],
-                            self.local_AC.state_in[1]: rnn_state[1]}
-                    else:
-                        feed_dict = {self.local_AC.inputs: [s],
-                                     self.local_AC.state_in[0]: rnn_state[0],
-                                     self.local_AC.state_in[1]: rnn_state[1]}
-
-                    pi, v, rnn_state = sess.run(
-                        [self.local_AC.policy, self.local_AC.value, self.local_AC.state_out],
-                        feed_dict=feed_dict)
-                else:
-                    feed_dict = {self.local_AC.inputs: [s]}
-                    pi, v = sess.run(
-                        [self.local_AC.policy, self.local_AC.value],
-                        feed_dict=feed_dict)
-
-                a = np.random.choice(pi[0], p=pi[0])
-                a = np.argmax(pi == a)
-
-                s1, r, d, info = self.env.step(a)
-
-                total_reward += r
-                episode_length += 1
-                s = s1
-
-            if summaries:
-                # Add summaries
-                episode_summary = tf.Summary()
-                episode_summary.value.add(simple_value=total_reward, tag="eval/total_reward")
-                episode_summary.value.add(simple_value=episode_length, tag="eval/episode_length")
-                self.summary_writer.add_summary(episode_summary, episode_count)
-                self.summary_writer.flush()
-
-                tf.logging.info(
-                    "Eval results at step {}: total_reward {}, episode_length {}".format(episode_count, total_reward,
-                                                                                         episode_length))
-
-            return total_reward, episode_length
+                if FLAGS.meta:
+                    inputs.update(prev_rewards=[[r]], prev_actions=[a])
+                inputs.update(state_in_c=rnn_state[0], state_in_h=rnn_state[1])
+                a, v, c, h = self.run_policy(sess, ['sampled_action', 'value', 'state_out_c', 'state_out_h'], inputs)
+                rnn_state = [c, h]
+            else:
+                a, v = self.run_policy(sess, ['sampled_action', 'value'], inputs)
+            a = a[0]
+
+            s1, r, d, info = self.env.step(a)
+
+            total_reward += r
+            episode_length += 1
+            s = s1
+
+        if summaries:
+            # Add summaries
+            episode_summary = tf.Summary()
+            episode_summary.value.add(simple_value=total_reward, tag="eval/total_reward")
+            episode_summary.value.add(simple_value=episode_length, tag="eval/episode_length")
+            self.summary_writer.add_summary(episode_summary, episode_count)
+            self.summary_writer.flush()
+
+            tf.logging.info(
+                "Eval results at step {}: total_reward {}, episode_length {}".format(episode_count, total_reward,
+                                                                                     episode_length))
+
+        return total_reward, episode_length
 
     def continuous_eval(self, eval_every, sess, coord):
         """
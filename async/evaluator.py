@@ -0,0 +1,46 @@
+import time
+
+try:
+    import gym_fast_envs
+except ImportError:
+    # Offline only the stand-in games of catcher are available
+    pass
+import catcher
+import tensorflow as tf
+from eval import PolicyMonitor, make_eval_envs
+from utils import load_inference_graph
+import flags
+
+FLAGS = tf.app.flags.FLAGS
+
+
+def run():
+    """Evaluates every new checkpoint of checkpoint_dir from its inference graph, in a process of its own so it shares
+    neither the GIL nor the session with the training workers. The eval summaries go to summaries_dir/policy_eval."""
+    envs = make_eval_envs(FLAGS.eval_envs, FLAGS.seed)
+    pe = None
+    last_path = None
+    while True:
+        ckpt = tf.train.get_checkpoint_state(FLAGS.checkpoint_dir)
+        # The latest checkpoint wins when several were written since the last evaluation, its export is picked up
+        # once the signature is written
+        inference_graph = None
+        if ckpt is not None and ckpt.model_checkpoint_path + '.inference' != last_path:
+            inference_graph = load_inference_graph(FLAGS.checkpoint_dir)
+        if inference_graph is None:
+            time.sleep(FLAGS.eval_every)
+            continue
+
+        if pe is None:
+            pe = PolicyMonitor(game=envs[0], nb_actions=len(envs[0].gym_actions), inference_graph=inference_graph,
+                               extra_games=envs[1:])
+        last_path = inference_graph.path
+        start_time = time.time()
+        mean_reward, mean_length = pe.eval_inference_graph(inference_graph, FLAGS.eval_episodes)
+        inference_graph.close()
+        print("Evaluated {} after {} episodes of training in {:.1f} sec: mean reward {:.2f}, mean length {:.1f}".format(
+            last_path, inference_graph.episode_count, time.time() - start_time, mean_reward, mean_length))
+
+
+if __name__ == '__main__':
+    run()
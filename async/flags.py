@@ -9,21 +9,57 @@ tf.app.flags.DEFINE_boolean('train', True,
                             """Whether to train or test""")
 tf.app.flags.DEFINE_boolean('show_training', False,
                             """Show windows with workers training""")
+tf.app.flags.DEFINE_integer('render_fps', 30, """Frames per second at which show_training renders the environments""")
+tf.app.flags.DEFINE_integer('report_secs', 60, """Seconds between steps per second reports, 0 to disable""")
+tf.app.flags.DEFINE_integer('trace_every', 0,
+                            """Trace an inference and a train run of the first worker every N updates, 0 to disable""")
+tf.app.flags.DEFINE_string('trace_dir', './traces', """Directory where to write the Chrome traces""")
+tf.app.flags.DEFINE_integer('max_steps', 0, """Stop training after this many environment steps, 0 to disable""")
+tf.app.flags.DEFINE_string('bench_result', '',
+                           """File where to write the steps and updates per second of the run as json""")
 tf.app.flags.DEFINE_string('checkpoint_dir', './models',
                            """Directory where to save model checkpoints.""")
 tf.app.flags.DEFINE_string('summaries_dir', './summaries',
                            """Directory where to write event logs""")
+tf.app.flags.DEFINE_string('frames_dir', './frames',
+                           """Directory where to write the gifs of the captured episodes""")
+tf.app.flags.DEFINE_integer('frames_interval', 0,
+                            """Number of episodes between captured episodes, 0 to disable frame capture""")
+tf.app.flags.DEFINE_string('frames_workers', '0', """Comma separated ids of the workers whose episodes are captured""")
+tf.app.flags.DEFINE_integer('max_frames', 1000, """Maximum number of frames captured per episode""")
 tf.app.flags.DEFINE_string('experiments_dir', './experiments',
                            """Directory where to write event experiments""")
 tf.app.flags.DEFINE_integer('summary_interval', 100, """Number of episodes of interval between summary saves""")
+tf.app.flags.DEFINE_integer('histogram_interval', 10,
+                            """Number of summary saves between fetches of the histogram and image summaries""")
+tf.app.flags.DEFINE_string('summaries_scope', 'worker_0',
+                           """Scope of the only network that builds histogram and image summaries""")
 tf.app.flags.DEFINE_integer('test_performance_interval', 100,
                             """Number of episodes of interval between testing reward performance""")
 tf.app.flags.DEFINE_integer('checkpoint_interval', 100, """Number of episodes of interval between checkpoint saves""")
+tf.app.flags.DEFINE_integer('checkpoint_secs', 0,
+                            """Seconds between checkpoint saves, in addition to checkpoint_interval, 0 to disable""")
 tf.app.flags.DEFINE_integer('nb_concurrent', 4, """Number of concurrent threads""")
+tf.app.flags.DEFINE_integer('env_threads', 8,
+                            """Threads creating the environments at startup, 1 creates them one after another""")
+tf.app.flags.DEFINE_integer('nb_envs_per_worker', 1,
+                            """Number of environments each worker steps in lockstep with one batched inference""")
+tf.app.flags.DEFINE_boolean('a2c', False,
+                            """Synchronous mode, one update per round from the rollouts of all environments""")
+tf.app.flags.DEFINE_boolean('actor_processes', False,
+                            """Run nb_concurrent actors as processes that send gradients to a single learner""")
+tf.app.flags.DEFINE_integer('sync_staleness', 0,
+                            """Number of global updates a worker may lag behind before copying the global parameters""")
+tf.app.flags.DEFINE_integer('grad_accumulation_steps', 1,
+                            """Number of rollouts whose gradients a worker sums before one update of the global network""")
+tf.app.flags.DEFINE_string('compare_accumulation_steps', '1,4',
+                           """Comma separated grad_accumulation_steps values run by compare_accumulation.py""")
 tf.app.flags.DEFINE_integer('max_episode_buffer_size', 5, """Buffer size between train updates""")
 tf.app.flags.DEFINE_integer('agent_history_length', 4, """Number of frames that makes every state""")
 tf.app.flags.DEFINE_integer('resized_width', 84, """Resized width of each frame""")
 tf.app.flags.DEFINE_integer('resized_height', 84, """Resized height of each frame""")
+tf.app.flags.DEFINE_boolean('graph_preprocessing', False,
+                            """Feed subsampled RGB frames, larger than the luminance ones, and preprocess them in the graph""")
 tf.app.flags.DEFINE_float('gamma', 0.99, """Gamma value""")
 tf.app.flags.DEFINE_float('lr', 0.0007, """Learning rate""")
 tf.app.flags.DEFINE_float('beta_v', 0.25, """Coefficient of value function loss""")
@@ -45,8 +81,23 @@ tf.app.flags.DEFINE_boolean('lstm', False,
                             """Whether to use lstm or not""")
 tf.app.flags.DEFINE_boolean('gen_adv', True,
                             """Whether to use generalized advantage estimator or not""")
-tf.flags.DEFINE_integer("eval_every", 100, "Evaluate the policy every N seconds")
+tf.flags.DEFINE_integer("eval_every", 100, "Seconds between the checks of the evaluator for a new checkpoint")
+tf.app.flags.DEFINE_boolean('evaluator', False,
+                            """Evaluate every new checkpoint in an evaluator.py process started next to training""")
+tf.app.flags.DEFINE_integer('eval_episodes', 10, """Episodes the evaluator plays for every checkpoint""")
+tf.app.flags.DEFINE_integer('eval_envs', 8, """Environments the evaluation plays at once with batched inference""")
+tf.app.flags.DEFINE_integer('eval_processes', 1,
+                            """Processes the test episodes are split over, only when evaluating an inference graph""")
+tf.app.flags.DEFINE_boolean('inference_graph', True,
+                            """Evaluate the inference graph exported with the latest checkpoint instead of the training graph""")
 tf.app.flags.DEFINE_boolean('meta', False,
                             """Whether to use meta-learning or not""")
 tf.app.flags.DEFINE_boolean('verbose', False,
                             """Whether to display information about game dynamics""")
+tf.app.flags.DEFINE_integer('benchmark_seconds', 60, """Seconds each configuration runs in the benchmark scripts""")
+tf.app.flags.DEFINE_string('microbench_baseline', './microbench_baseline.json',
+                           """File where the micro-benchmark baseline timings are saved""")
+tf.app.flags.DEFINE_boolean('save_baseline', False, """Save the micro-benchmark timings as the new baseline""")
+tf.app.flags.DEFINE_boolean('compare_baseline', False, """Compare the micro-benchmark timings to the saved baseline""")
+tf.app.flags.DEFINE_float('regression_tolerance', 0.1,
+                          """Relative slowdown over the baseline reported as a regression""")
@@ -0,0 +1,97 @@
+import itertools
+import sys
+
+import gym
+import numpy as np
+import tensorflow as tf
+import catcher
+from atari_environment import AtariEnvironment
+from network import ACNetwork
+from utils import discount, run_microbenchmarks
+import flags
+
+FLAGS = tf.app.flags.FLAGS
+
+
+def make_env():
+    # The offline stand-in keeps the timings independent of the installed games
+    return AtariEnvironment(gym_env=gym.make('CatcherOffline-v0'), resized_width=FLAGS.resized_width,
+                            resized_height=FLAGS.resized_height,
+                            agent_history_length=FLAGS.agent_history_length,
+                            raw_frames=FLAGS.graph_preprocessing)
+
+
+def discount_kernels():
+    rollout_rewards = np.random.randn(FLAGS.max_episode_buffer_size + 1)
+    episode_rewards = np.random.randn(1000)
+    return [("discount_rollout", lambda: discount(rollout_rewards, FLAGS.gamma), 10000),
+            ("discount_episode", lambda: discount(episode_rewards, FLAGS.gamma), 1000)]
+
+
+def env_kernels():
+    env = make_env()
+    frame = env.env.reset()
+    env.get_initial_state()
+    actions = itertools.cycle(range(len(env.gym_actions)))
+
+    def step():
+        _, _, d, _ = env.step(next(actions))
+        if d:
+            env.get_initial_state()
+
+    return [("get_preprocessed_frame", lambda: env.get_preprocessed_frame(frame), 1000),
+            ("atari_environment_step", step, 1000)]
+
+
+def summary_kernels(sess):
+    # The histogram summaries of every weight and gradient merged on a summary episode of the agents
+    env = make_env()
+    nb_actions = len(env.gym_actions)
+    optimizer = tf.train.RMSPropOptimizer(FLAGS.lr, 0.99, 0.0, 1e-6)
+    ACNetwork('global', nb_actions, None)
+    # Only the summaries_scope network builds the histograms and images
+    local_AC = ACNetwork(FLAGS.summaries_scope, nb_actions, optimizer)
+    sess.run(tf.global_variables_initializer())
+
+    s = env.get_initial_state()
+    observations = []
+    for t in range(FLAGS.max_episode_buffer_size):
+        observations.append(np.copy(s))
+        s, _, _, _ = env.step(t % nb_actions)
+    feed_dict = {local_AC.target_v: np.random.randn(len(observations)),
+                 local_AC.inputs: np.stack(observations, axis=0),
+                 local_AC.actions: np.arange(len(observations)) % nb_actions,
+                 local_AC.advantages: np.random.randn(len(observations))}
+    return [("merged_summary", lambda: sess.run(local_AC.merged_summary, feed_dict=feed_dict), 20)]
+
+
+def graph_kernels():
+    # The graph of a run with nb_concurrent workers, only the summaries_scope worker has summary ops
+    nb_actions = len(make_env().gym_actions)
+
+    def build():
+        with tf.Graph().as_default() as graph, tf.device("/cpu:0"):
+            optimizer = tf.train.RMSPropOptimizer(FLAGS.lr, 0.99, 0.0, 1e-6)
+            ACNetwork('global', nb_actions, None)
+            for i in range(FLAGS.nb_concurrent):
+                ACNetwork("worker_" + str(i), nb_actions, optimizer)
+        return graph
+
+    graph_def = build().as_graph_def()
+    print("Graph of {} workers: {} nodes, {:.1f} MB".format(FLAGS.nb_concurrent, len(graph_def.node),
+                                                           graph_def.ByteSize() / 2.0 ** 20))
+    return [("build_worker_graphs", build, 1)]
+
+
+def run():
+    with tf.Graph().as_default(), tf.device("/cpu:0"), tf.Session() as sess:
+        kernels = discount_kernels() + env_kernels() + summary_kernels(sess) + graph_kernels()
+        regressions = run_microbenchmarks(kernels, FLAGS.microbench_baseline, FLAGS.save_baseline,
+                                          FLAGS.compare_baseline, FLAGS.regression_tolerance)
+    if regressions:
+        print("Regressions: {}".format(", ".join(regressions)))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    run()
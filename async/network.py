@@ -3,32 +3,44 @@ from math import sqrt
 
 import numpy as np
 import tensorflow as tf
+from utils import preprocess_frames, gradient_accumulation_ops
 
 FLAGS = tf.app.flags.FLAGS
 
 
 class ACNetwork:
     def __init__(self, scope, nb_actions, trainer):
+        # Only the summaries_scope network writes histograms and images, the other scopes skip building their ops
+        self.build_summaries = scope == FLAGS.summaries_scope
         with tf.variable_scope(scope):
 
-            self.inputs = tf.placeholder(
-                shape=[None, FLAGS.resized_height, FLAGS.resized_width, FLAGS.agent_history_length], dtype=tf.float32,
-                name="Input")
+            if FLAGS.graph_preprocessing:
+                # Raw RGB frame stacks are fed, grayscale, resize and scaling run in the graph over the whole batch
+                self.inputs = tf.placeholder(
+                    shape=[None, FLAGS.agent_history_length, None, None, 3], dtype=tf.uint8, name="Input")
+                self.scaled_inputs = preprocess_frames(self.inputs, FLAGS.resized_height, FLAGS.resized_width)
+            else:
+                self.inputs = tf.placeholder(
+                    shape=[None, FLAGS.resized_height, FLAGS.resized_width, FLAGS.agent_history_length],
+                    dtype=tf.uint8, name="Input")
+                # Frames are stored and fed as uint8 luminance, the scaling to [0, 1] is done in the graph
+                self.scaled_inputs = tf.to_float(self.inputs) / 255.0
 
             self.image_summaries = []
-            with tf.variable_scope('inputs'):
-                tf.get_variable_scope().reuse_variables()
-                for i in range(FLAGS.agent_history_length):
-                    self.image_summaries.append(
-                        tf.summary.image('inputs/frames/{}'.format(i), tf.expand_dims(self.inputs[:, :, :, i], axis=3),
-                                         max_outputs=1))
+            if self.build_summaries:
+                with tf.variable_scope('inputs'):
+                    tf.get_variable_scope().reuse_variables()
+                    for i in range(FLAGS.agent_history_length):
+                        self.image_summaries.append(
+                            tf.summary.image('inputs/frames/{}'.format(i),
+                                             tf.expand_dims(self.scaled_inputs[:, :, :, i], axis=3), max_outputs=1))
 
             fan_in = 4 * FLAGS.conv1_kernel_size * FLAGS.conv1_kernel_size
             fan_out = FLAGS.conv1_kernel_size * FLAGS.conv1_kernel_size * FLAGS.conv1_nb_kernels
             w_bound = np.sqrt(6. / (fan_in + fan_out))
 
             conv1 = tf.contrib.layers.conv2d(
-                self.inputs, FLAGS.conv1_nb_kernels, FLAGS.conv1_kernel_size, FLAGS.conv1_stride,
+                self.scaled_inputs, FLAGS.conv1_nb_kernels, FLAGS.conv1_kernel_size, FLAGS.conv1_stride,
                 activation_fn=tf.nn.elu, padding=FLAGS.conv1_padding,
                 weights_initializer=tf.random_uniform_initializer(-w_bound, w_bound),
                 biases_initializer=tf.constant_initializer(0.0),
@@ -64,18 +76,19 @@ class ACNetwork:
                 outputs_collections=("activations_" + scope),
                 scope="fc1")
 
-            with tf.variable_scope('conv1'):
-                tf.get_variable_scope().reuse_variables()
-                weights = tf.get_variable('weights')
-                grid = self.put_kernels_on_grid(weights)
-                for i in range(FLAGS.agent_history_length):
-                    self.image_summaries.append(
-                        tf.summary.image('conv1/features/{}'.format(i), tf.expand_dims(grid[:, :, :, i], axis=3),
-                                         max_outputs=1))
-                for i in range(FLAGS.conv1_nb_kernels):
-                    self.image_summaries.append(
-                        tf.summary.image('conv1/activation/{}'.format(i), tf.expand_dims(conv1[:, :, :, i], axis=3),
-                                         max_outputs=1))
+            if self.build_summaries:
+                with tf.variable_scope('conv1'):
+                    tf.get_variable_scope().reuse_variables()
+                    weights = tf.get_variable('weights')
+                    grid = self.put_kernels_on_grid(weights)
+                    for i in range(FLAGS.agent_history_length):
+                        self.image_summaries.append(
+                            tf.summary.image('conv1/features/{}'.format(i), tf.expand_dims(grid[:, :, :, i], axis=3),
+                                             max_outputs=1))
+                    for i in range(FLAGS.conv1_nb_kernels):
+                        self.image_summaries.append(
+                            tf.summary.image('conv1/activation/{}'.format(i),
+                                             tf.expand_dims(conv1[:, :, :, i], axis=3), max_outputs=1))
 
             self.policy = tf.contrib.layers.fully_connected(hidden, nb_actions,
                                                             weights_initializer=self.normalized_columns_initializer(0.01),
@@ -86,6 +99,8 @@ class ACNetwork:
                                                             activation_fn=tf.nn.softmax,
                                                             scope="policy_fc")
             self.policy = tf.add(self.policy, tf.constant(1e-30), name='policy')
+            # Actions are sampled in the graph, fetched in the same run as the policy
+            self.sampled_action = tf.squeeze(tf.multinomial(tf.log(self.policy), 1), [1], name="sampled_action")
 
             self.value = tf.contrib.layers.fully_connected(
                 inputs=hidden,
@@ -125,21 +140,36 @@ class ACNetwork:
                 self.var_norms = tf.global_norm(local_vars)
                 grads, self.grad_norms = tf.clip_by_global_norm(self.gradients, FLAGS.gradient_clip_value)
 
-                self.worker_summaries = []
-                self.worker_summaries.append(
-                    tf.contrib.layers.summarize_collection("variables_" + scope, summarizer=tf.contrib.layers.summarize_tensor))
-                self.worker_summaries.append(tf.contrib.layers.summarize_collection("activations_" + scope,
-                                                                             summarizer=tf.contrib.layers.summarize_activation))
+                self.merged_summary = None
+                if self.build_summaries:
+                    self.worker_summaries = []
+                    self.worker_summaries.append(
+                        tf.contrib.layers.summarize_collection("variables_" + scope, summarizer=tf.contrib.layers.summarize_tensor))
+                    self.worker_summaries.append(tf.contrib.layers.summarize_collection("activations_" + scope,
+                                                                                 summarizer=tf.contrib.layers.summarize_activation))
 
-                for grad, weight in zip(grads, local_vars):
-                    self.worker_summaries.append(tf.summary.histogram(weight.name + '_grad', grad))
-                    # self.worker_summaries.append(tf.summary.histogram(weight.name, weight))
+                    for grad, weight in zip(grads, local_vars):
+                        self.worker_summaries.append(tf.summary.histogram(weight.name + '_grad', grad))
+                        # self.worker_summaries.append(tf.summary.histogram(weight.name, weight))
 
-                self.merged_summary = tf.summary.merge(self.worker_summaries)
+                    self.merged_summary = tf.summary.merge(self.worker_summaries)
 
                 global_vars = tf.get_collection(tf.GraphKeys.TRAINABLE_VARIABLES, 'global')
-                self.apply_grads = trainer.apply_gradients(zip(grads, global_vars),
-                                                           global_step=tf.contrib.framework.get_global_step())
+                self.clipped_gradients = grads
+                # Process actors only compute gradients, the learner owns the optimizer and the global variables
+                if trainer is not None:
+                    self.apply_grads = trainer.apply_gradients(zip(grads, global_vars),
+                                                               global_step=tf.contrib.framework.get_global_step())
+                if trainer is not None and FLAGS.grad_accumulation_steps > 1:
+                    self.accumulate_grads, self.apply_accumulated_grads, self.reset_accumulators = \
+                        gradient_accumulation_ops(trainer, self.gradients, local_vars, global_vars,
+                                                  FLAGS.gradient_clip_value,
+                                                  global_step=tf.contrib.framework.get_global_step())
+
+    def inference_signature(self):
+        # What evaluation feeds and fetches, exported with the checkpoints of the global network
+        return {'inputs': {'inputs': self.inputs},
+                'outputs': {'policy': self.policy, 'sampled_action': self.sampled_action, 'value': self.value}}
 
     def put_kernels_on_grid(self, kernel, pad=1):
 
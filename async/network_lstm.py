@@ -4,13 +4,16 @@ import numpy as np
 import tensorflow as tf
 from tensorflow.python.framework import dtypes
 from tensorflow.python.ops import random_ops
-from utils import normalized_columns_initializer
+from utils import normalized_columns_initializer, preprocess_frames, gradient_accumulation_ops
 
 FLAGS = tf.app.flags.FLAGS
 
 
 class ACNetworkLSTM:
     def __init__(self, scope, nb_actions, trainer):
+        # Only the summaries_scope network writes histograms and images, the other scopes skip building their ops
+        self.build_summaries = scope == FLAGS.summaries_scope
+        self.image_summaries = []
         with tf.variable_scope(scope):
             if FLAGS.meta:
                 self.prev_rewards = tf.placeholder(shape=[None, 1], dtype=tf.float32, name="Prev_Rewards")
@@ -18,12 +21,20 @@ class ACNetworkLSTM:
                 self.prev_actions_onehot = tf.one_hot(self.prev_actions, nb_actions, dtype=tf.float32,
                                                       name="Prev_Actions_OneHot")
 
-            self.inputs = tf.placeholder(
-                shape=[None, FLAGS.resized_height, FLAGS.resized_width, FLAGS.agent_history_length], dtype=tf.float32,
-                name="Input")
+            if FLAGS.graph_preprocessing:
+                # Raw RGB frame stacks are fed, grayscale, resize and scaling run in the graph over the whole batch
+                self.inputs = tf.placeholder(
+                    shape=[None, FLAGS.agent_history_length, None, None, 3], dtype=tf.uint8, name="Input")
+                self.scaled_inputs = preprocess_frames(self.inputs, FLAGS.resized_height, FLAGS.resized_width)
+            else:
+                self.inputs = tf.placeholder(
+                    shape=[None, FLAGS.resized_height, FLAGS.resized_width, FLAGS.agent_history_length],
+                    dtype=tf.uint8, name="Input")
+                # Frames are stored and fed as uint8 luminance, the scaling to [0, 1] is done in the graph
+                self.scaled_inputs = tf.to_float(self.inputs) / 255.0
 
             conv1 = tf.contrib.layers.conv2d(
-                self.inputs, 32, 5, 2, activation_fn=tf.nn.relu, scope="conv1")
+                self.scaled_inputs, 32, 5, 2, activation_fn=tf.nn.relu, scope="conv1")
             conv2 = tf.contrib.layers.conv2d(
                 conv1, 32, 5, 2, padding="VALID", activation_fn=tf.nn.relu, scope="conv2")
 
@@ -37,9 +48,11 @@ class ACNetworkLSTM:
                 hidden = tf.concat([self.prev_rewards, self.prev_actions_onehot, hidden], 1,
                                    name="Concatenated_input")
 
-            summary_conv1_act = tf.contrib.layers.summarize_activation(conv1)
-            summary_conv2_act = tf.contrib.layers.summarize_activation(conv2)
-            summary_linear_act = tf.contrib.layers.summarize_activation(hidden)
+            activation_summaries = []
+            if self.build_summaries:
+                activation_summaries += [tf.contrib.layers.summarize_activation(conv1),
+                                         tf.contrib.layers.summarize_activation(conv2),
+                                         tf.contrib.layers.summarize_activation(hidden)]
 
             lstm_cell = tf.contrib.rnn.BasicLSTMCell(32, state_is_tuple=True)
             c_init = np.zeros((1, lstm_cell.state_size.c), np.float32)
@@ -63,15 +76,35 @@ class ACNetworkLSTM:
 
             self.policy = tf.contrib.layers.fully_connected(rnn_out, nb_actions, activation_fn=None, scope="policy")
             self.policy = tf.nn.softmax(self.policy, name="policy") + 1e-8
-
-            summary_policy_act = tf.contrib.layers.summarize_activation(self.policy)
+            # Actions are sampled in the graph, fetched in the same run as the policy
+            self.sampled_action = tf.squeeze(tf.multinomial(tf.log(self.policy), 1), [1], name="sampled_action")
+
+            if self.build_summaries:
+                activation_summaries.append(tf.contrib.layers.summarize_activation(self.policy))
+
+            # Acting graph: every row of the batch is a different environment advanced by a single step,
+            # so the recurrent state is fed and returned per row instead of unrolling the batch as time.
+            batch_c_in = tf.placeholder(tf.float32, [None, lstm_cell.state_size.c], name="batch_c_in")
+            batch_h_in = tf.placeholder(tf.float32, [None, lstm_cell.state_size.h], name="batch_h_in")
+            self.batch_state_in = (batch_c_in, batch_h_in)
+            with tf.variable_scope(tf.get_variable_scope(), reuse=True):
+                batch_lstm_outputs, batch_lstm_state = tf.nn.dynamic_rnn(
+                    lstm_cell, tf.expand_dims(hidden, [1], name="batch_RNN_input"),
+                    initial_state=tf.contrib.rnn.LSTMStateTuple(batch_c_in, batch_h_in), time_major=False)
+                batch_policy = tf.contrib.layers.fully_connected(tf.reshape(batch_lstm_outputs, [-1, 32]),
+                                                                 nb_actions, activation_fn=None, scope="policy",
+                                                                 reuse=True)
+            self.batch_state_out = (batch_lstm_state.c, batch_lstm_state.h)
+            self.batch_policy = tf.nn.softmax(batch_policy, name="batch_policy") + 1e-8
+            self.batch_sampled_action = tf.squeeze(tf.multinomial(batch_policy, 1), [1], name="batch_sampled_action")
 
             self.value = tf.contrib.layers.fully_connected(
                 inputs=hidden,
                 num_outputs=1,
                 activation_fn=None, scope="value")
 
-            summary_value_act = tf.contrib.layers.summarize_activation(self.value)
+            if self.build_summaries:
+                activation_summaries.append(tf.contrib.layers.summarize_activation(self.value))
 
             if scope != 'global':
                 self.actions = tf.placeholder(shape=[None], dtype=tf.int32, name="Actions")
@@ -100,17 +133,36 @@ class ACNetworkLSTM:
                 self.var_norms = tf.global_norm(local_vars)
                 grads, self.grad_norms = tf.clip_by_global_norm(self.gradients, FLAGS.gradient_clip_value)
 
-                self.worker_summaries = [summary_conv1_act, summary_conv2_act, summary_linear_act, summary_policy_act,
-                                         summary_value_act]
-                for grad, weight in zip(grads, local_vars):
-                    self.worker_summaries.append(tf.summary.histogram(weight.name + '_grad', grad))
-                    self.worker_summaries.append(tf.summary.histogram(weight.name, weight))
+                self.merged_summary = None
+                if self.build_summaries:
+                    self.worker_summaries = activation_summaries
+                    for grad, weight in zip(grads, local_vars):
+                        self.worker_summaries.append(tf.summary.histogram(weight.name + '_grad', grad))
+                        self.worker_summaries.append(tf.summary.histogram(weight.name, weight))
 
-                self.merged_summary = tf.summary.merge(self.worker_summaries)
+                    self.merged_summary = tf.summary.merge(self.worker_summaries)
 
                 global_vars = tf.get_collection(tf.GraphKeys.TRAINABLE_VARIABLES, 'global')
-                self.apply_grads = trainer.apply_gradients(zip(grads, global_vars))
-
+                self.clipped_gradients = grads
+                if trainer is not None:
+                    self.apply_grads = trainer.apply_gradients(zip(grads, global_vars))
+                if trainer is not None and FLAGS.grad_accumulation_steps > 1:
+                    self.accumulate_grads, self.apply_accumulated_grads, self.reset_accumulators = \
+                        gradient_accumulation_ops(trainer, self.gradients, local_vars, global_vars,
+                                                  FLAGS.gradient_clip_value)
+
+
+    def inference_signature(self):
+        # What evaluation feeds and fetches, exported with the checkpoints of the global network
+        inputs = {'inputs': self.inputs, 'state_in_c': self.state_in[0], 'state_in_h': self.state_in[1],
+                  'batch_state_in_c': self.batch_state_in[0], 'batch_state_in_h': self.batch_state_in[1]}
+        if FLAGS.meta:
+            inputs.update(prev_rewards=self.prev_rewards, prev_actions=self.prev_actions)
+        return {'inputs': inputs,
+                'outputs': {'policy': self.policy, 'sampled_action': self.sampled_action, 'value': self.value,
+                            'state_out_c': self.state_out[0], 'state_out_h': self.state_out[1],
+                            'batch_sampled_action': self.batch_sampled_action,
+                            'batch_state_out_c': self.batch_state_out[0], 'batch_state_out_h': self.batch_state_out[1]}}
 
     def xavier_initializer(self, uniform=True, seed=None, dtype=dtypes.float32):
         return self.variance_scaling_initializer(factor=1.0, mode='FAN_AVG',
@@ -0,0 +1,271 @@
+import multiprocessing
+import queue
+import time
+
+import gym
+try:
+    import gym_fast_envs
+except ImportError:
+    # Offline only the stand-in games of catcher are available
+    pass
+import catcher
+import numpy as np
+import tensorflow as tf
+from atari_environment import AtariEnvironment
+from network import ACNetwork
+from utils import returns_and_advantages, CheckpointWriter, WindowedStat, get_summary_writer, checkpoint_variables, \
+    restore_checkpoint
+import flags
+
+FLAGS = tf.app.flags.FLAGS
+
+
+def make_env(index):
+    gym_env = gym.make(FLAGS.game)
+    if FLAGS.seed:
+        gym_env.seed(FLAGS.seed + index)
+    return AtariEnvironment(gym_env=gym_env, resized_width=FLAGS.resized_width,
+                            resized_height=FLAGS.resized_height,
+                            agent_history_length=FLAGS.agent_history_length,
+                            raw_frames=FLAGS.graph_preprocessing)
+
+
+class SharedParameters():
+    """Flat float32 copy of the global trainable variables in shared memory. The version is the number of global
+    updates the snapshot holds plus one, 0 until the first publish, so actors only copy the snapshot when it changed."""
+
+    def __init__(self, shapes):
+        self.shapes = shapes
+        self.sizes = [int(np.prod(shape)) for shape in shapes]
+        self.buffer = multiprocessing.RawArray('f', sum(self.sizes))
+        self.version = multiprocessing.Value('l', 0)
+
+    def publish(self, values, version):
+        with self.version.get_lock():
+            flat = np.frombuffer(self.buffer, dtype=np.float32)
+            offset = 0
+            for value, size in zip(values, self.sizes):
+                flat[offset:offset + size] = value.ravel()
+                offset += size
+            self.version.value = version
+
+    def read(self):
+        with self.version.get_lock():
+            flat = np.frombuffer(self.buffer, dtype=np.float32).copy()
+            version = self.version.value
+        values = []
+        offset = 0
+        for shape, size in zip(self.shapes, self.sizes):
+            values.append(flat[offset:offset + size].reshape(shape))
+            offset += size
+        return version, values
+
+
+class ActorProcess(multiprocessing.Process):
+    def __init__(self, actor_id, nb_actions, shared_params, gradient_q, episode_q, exit_flag):
+        super(ActorProcess, self).__init__()
+        self.actor_id = actor_id
+        self.name = "actor_" + str(actor_id)
+        self.nb_actions = nb_actions
+        self.shared_params = shared_params
+        self.gradient_q = gradient_q
+        self.episode_q = episode_q
+        self.exit_flag = exit_flag
+
+    def run(self):
+        env = make_env(self.actor_id)
+        # The graph is built after the fork, every actor owns a private graph and a single threaded session
+        with tf.Graph().as_default(), tf.device("/cpu:0"):
+            local_AC = ACNetwork(self.name, self.nb_actions, None)
+            local_vars = tf.get_collection(tf.GraphKeys.TRAINABLE_VARIABLES, self.name)
+            params = [tf.placeholder(tf.float32, var.get_shape()) for var in local_vars]
+            load_params = [var.assign(param) for var, param in zip(local_vars, params)]
+            sess = tf.Session(config=tf.ConfigProto(intra_op_parallelism_threads=1,
+                                                    inter_op_parallelism_threads=1))
+            sess.run(tf.global_variables_initializer())
+
+        while self.shared_params.version.value == 0 and not self.exit_flag.value:
+            time.sleep(0.01)
+
+        version = 0
+        episode_buffer = []
+        episode_reward = 0
+        episode_step_count = 0
+        s = np.copy(env.get_initial_state())
+        pending = False
+
+        while not self.exit_flag.value:
+            if self.shared_params.version.value - version > FLAGS.sync_staleness:
+                version, values = self.shared_params.read()
+                sess.run(load_params, feed_dict=dict(zip(params, values)))
+
+            a, v = sess.run([local_AC.sampled_action, local_AC.value], feed_dict={local_AC.inputs: [s]})
+            if pending:
+                # A full rollout bootstraps from the value of the state this step acts on
+                self.send_gradients(sess, local_AC, episode_buffer, v[0, 0], version)
+                episode_buffer = []
+                pending = False
+            a = a[0]
+
+            s1, r, d, _ = env.step(a)
+            s1 = np.copy(s1)
+            r = np.clip(r, -1, 1)
+
+            episode_buffer.append([s, a, r, v[0, 0]])
+            episode_reward += r
+            episode_step_count += 1
+            s = s1
+
+            if d:
+                self.send_gradients(sess, local_AC, episode_buffer, 0, version)
+                episode_buffer = []
+                self.put(self.episode_q, (episode_reward, episode_step_count))
+                episode_reward = 0
+                episode_step_count = 0
+                s = np.copy(env.get_initial_state())
+            elif len(episode_buffer) == FLAGS.max_episode_buffer_size:
+                pending = True
+
+    def send_gradients(self, sess, local_AC, episode_buffer, bootstrap_value, version):
+        observations, actions, rewards, values = zip(*episode_buffer)
+        discounted_rewards, policy_target = returns_and_advantages(rewards, values, bootstrap_value,
+                                                                   FLAGS.gamma, FLAGS.gen_adv)
+        feed_dict = {local_AC.target_v: discounted_rewards,
+                     local_AC.inputs: np.stack(observations, axis=0),
+                     local_AC.actions: actions,
+                     local_AC.advantages: policy_target}
+        gradients = sess.run(local_AC.clipped_gradients, feed_dict=feed_dict)
+        self.put(self.gradient_q, (version, len(episode_buffer), gradients))
+
+    def put(self, q, item):
+        while not self.exit_flag.value:
+            try:
+                q.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+
+class Learner():
+    """Holds the global network and applies the gradients computed by the actor processes. Actors run their own
+    interpreter, so acting and gradient computation are not serialized by the GIL."""
+
+    def __init__(self, nb_actions, nb_actors):
+        if FLAGS.lstm or FLAGS.meta:
+            raise ValueError("Process actors only support the feed-forward network without meta inputs")
+        if FLAGS.a2c:
+            raise ValueError("Process actors apply the gradients of every actor as they arrive, A2C mode needs the "
+                             "thread workers")
+
+        self.nb_actions = nb_actions
+        self.nb_actors = nb_actors
+        self.model_path = FLAGS.checkpoint_dir
+
+        tf.reset_default_graph()
+        with tf.device("/cpu:0"):
+            self.global_episode = tf.Variable(0, dtype=tf.int32, name='global_episodes', trainable=False)
+            self.increment_global_episode = self.global_episode.assign_add(1)
+            optimizer = tf.train.RMSPropOptimizer(FLAGS.lr, 0.99, 0.0, 1e-6)
+            global_network = ACNetwork('global', nb_actions, None)
+            self.global_vars = tf.get_collection(tf.GraphKeys.TRAINABLE_VARIABLES, 'global')
+            self.gradients = [tf.placeholder(tf.float32, var.get_shape()) for var in self.global_vars]
+            self.apply_grads = optimizer.apply_gradients(zip(self.gradients, self.global_vars))
+            # The actors build their networks in graphs of their own, the learner graph has no local copies
+            checkpoint_vars = checkpoint_variables([])
+            self.saver = tf.train.Saver(checkpoint_vars, max_to_keep=5)
+            self.checkpoint_writer = CheckpointWriter(self.model_path, FLAGS.checkpoint_interval, FLAGS.checkpoint_secs,
+                                                      var_list=checkpoint_vars,
+                                                      inference_signature=global_network.inference_signature())
+
+        self.shared_params = SharedParameters([var.get_shape().as_list() for var in self.global_vars])
+        self.gradient_q = multiprocessing.Queue(maxsize=2 * nb_actors)
+        self.episode_q = multiprocessing.Queue()
+        self.exit_flag = multiprocessing.Value('i', 0)
+        self.actors = [ActorProcess(i, nb_actions, self.shared_params, self.gradient_q, self.episode_q,
+                                    self.exit_flag) for i in range(nb_actors)]
+
+        # The summary thread is started on the first summary, after the actors are forked
+        self.summary_dir = FLAGS.summaries_dir + "/learner"
+        self.episode_rewards = WindowedStat(50)
+        self.episode_lengths = WindowedStat(50)
+
+    def publish(self):
+        self.shared_params.publish(self.sess.run(self.global_vars), self.nb_updates + 1)
+        self.published_updates = self.nb_updates
+
+    def maybe_publish(self):
+        # Actors only copy a snapshot more than sync_staleness updates newer than theirs, publishing the updates in
+        # between would take the lock and copy every parameter for nothing
+        if self.nb_updates - self.published_updates > FLAGS.sync_staleness:
+            self.publish()
+
+    def run(self, duration=None):
+        # Actors have to be forked before the session exists
+        for actor in self.actors:
+            actor.start()
+
+        self.sess = tf.Session()
+        if FLAGS.resume:
+            restore_checkpoint(self.sess, self.saver, FLAGS.checkpoint_dir, [])
+        else:
+            self.sess.run(tf.global_variables_initializer())
+        self.nb_updates = 0
+        self.publish()
+        self.checkpoint_writer.start()
+
+        episode_count = self.sess.run(self.global_episode)
+        total_steps = 0
+        start_time = time.time()
+        try:
+            while duration is None or time.time() - start_time < duration:
+                try:
+                    version, nb_steps, gradients = self.gradient_q.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                self.sess.run(self.apply_grads, feed_dict=dict(zip(self.gradients, gradients)))
+                self.nb_updates += 1
+                self.maybe_publish()
+                total_steps += nb_steps
+
+                while True:
+                    try:
+                        episode_reward, episode_length = self.episode_q.get_nowait()
+                    except queue.Empty:
+                        break
+                    self.episode_rewards.add(episode_reward)
+                    self.episode_lengths.add(episode_length)
+                    self.sess.run(self.increment_global_episode)
+                    episode_count += 1
+                    if FLAGS.train:
+                        self.checkpoint_writer.maybe_save(self.sess, episode_count)
+                    if episode_count % FLAGS.summary_interval == 0:
+                        self.write_summaries(episode_count, total_steps / (time.time() - start_time))
+        finally:
+            self.stop()
+
+        return total_steps / (time.time() - start_time)
+
+    def write_summaries(self, episode_count, steps_per_second):
+        get_summary_writer().add(self.summary_dir, episode_count,
+                                 [('Perf/Reward', self.episode_rewards.mean()),
+                                  ('Perf/Length', self.episode_lengths.mean()),
+                                  ('Perf/Steps per second', steps_per_second)])
+
+    def stop(self):
+        self.exit_flag.value = 1
+        # Drain the queues so no actor stays blocked on a full pipe while joining
+        while any(actor.is_alive() for actor in self.actors):
+            for q in (self.gradient_q, self.episode_q):
+                try:
+                    while True:
+                        q.get_nowait()
+                except queue.Empty:
+                    pass
+            for actor in self.actors:
+                actor.join(0.1)
+        if FLAGS.train:
+            # One last checkpoint of the final parameters, written before the daemon writer thread dies with us
+            self.checkpoint_writer.wait()
+            self.checkpoint_writer.save(self.sess, self.sess.run(self.global_episode))
+            self.checkpoint_writer.wait()
+        get_summary_writer().flush()
@@ -1,16 +1,27 @@
+import json
+import subprocess
+import sys
+import time
 import threading
 import multiprocessing
 from threading import Lock
 import gym
 from gym import wrappers
-import gym_fast_envs
+try:
+    import gym_fast_envs
+except ImportError:
+    # Offline only the stand-in games of catcher are available
+    pass
+import catcher
 # import gym_ple
 import tensorflow as tf
 from agent import Worker
-from atari_environment import AtariEnvironment
+from atari_environment import AtariEnvironment, BatchedAtariEnvironment
 from network import ACNetwork
 from network_lstm import ACNetworkLSTM
 from eval import PolicyMonitor
+from process_actors import Learner
+from utils import CheckpointWriter, TrainingSupervisor, checkpoint_variables, restore_checkpoint, start_env_creation
 from tensorflow.python import debug as tf_debug
 import flags
 
@@ -41,8 +52,67 @@ def recreate_directory_structure():
             tf.gfile.DeleteRecursively(FLAGS.summaries_dir)
             tf.gfile.MakeDirs(FLAGS.summaries_dir)
 
+    if FLAGS.frames_interval > 0 and not tf.gfile.Exists(FLAGS.frames_dir):
+        tf.gfile.MakeDirs(FLAGS.frames_dir)
+
+
+def make_env(i):
+    gym_env = gym.make(FLAGS.game)
+    if FLAGS.seed:
+        gym_env.seed(FLAGS.seed)
+
+    if FLAGS.monitor:
+        gym_env = gym.wrappers.Monitor(gym_env, FLAGS.experiments_dir + '/worker_{}'.format(i))
+    return AtariEnvironment(gym_env=gym_env, resized_width=FLAGS.resized_width,
+                            resized_height=FLAGS.resized_height,
+                            agent_history_length=FLAGS.agent_history_length,
+                            raw_frames=FLAGS.graph_preprocessing)
+
+
+def nb_game_actions():
+    # Read from the action space of a bare gym environment, neither wrapped nor reset, so the graph is built without
+    # waiting for the environments of the workers. Pong and Breakout are played with 3 actions, see AtariEnvironment
+    if FLAGS.game in ("Pong-v0", "Breakout-v0"):
+        return 3
+    gym_env = gym.spec(FLAGS.game).make()
+    nb_actions = gym_env.action_space.n
+    gym_env.close()
+    return nb_actions
+
+
+def render_envs(envs):
+    def render():
+        for env in envs:
+            env.env.render()
+
+    return render
+
+
+def start_evaluator():
+    # The evaluator gets the flags of the training run, the checkpoint, summary and game ones in particular
+    if not FLAGS.evaluator:
+        return None
+    return subprocess.Popen([sys.executable, "evaluator.py"] + sys.argv[1:])
+
+
+def stop_evaluator(evaluator):
+    if evaluator is not None:
+        evaluator.terminate()
+        evaluator.wait()
+
+
+def run_processes():
+    recreate_directory_structure()
+    nb_actions = nb_game_actions()
+    evaluator = start_evaluator()
+    try:
+        Learner(nb_actions, FLAGS.nb_concurrent).run()
+    finally:
+        stop_evaluator(evaluator)
+
 
 def run():
+    start_time = time.time()
     recreate_directory_structure()
     tf.reset_default_graph()
 
@@ -52,27 +122,27 @@ def run():
     with sess:
         with tf.device("/cpu:0"):
             global_step = tf.Variable(0, dtype=tf.int32, name='global_episodes', trainable=False)
+            global_version = tf.Variable(0, dtype=tf.int64, name='global_version', trainable=False)
             # optimizer = tf.train.AdamOptimizer(learning_rate=FLAGS.lr)
             optimizer = tf.train.RMSPropOptimizer(FLAGS.lr, 0.99, 0.0, 1e-6)
 
             num_workers = FLAGS.nb_concurrent
             #num_workers = multiprocessing.cpu_count() - 1
+            nb_envs_per_worker = FLAGS.nb_envs_per_worker
+            if FLAGS.a2c:
+                if FLAGS.lstm:
+                    raise ValueError("A2C mode only supports the feed-forward network")
+                # A single worker steps the environments of all workers and applies one update per round
+                nb_envs_per_worker = num_workers * FLAGS.nb_envs_per_worker
+                num_workers = 1
+                print("A2C mode: 1 worker stepping {} environments instead of {} workers".format(
+                    nb_envs_per_worker, FLAGS.nb_concurrent))
             workers = []
-            envs = []
 
-            for i in range(num_workers):
-                gym_env = gym.make(FLAGS.game)
-                if FLAGS.seed:
-                    gym_env.seed(FLAGS.seed)
-
-                if FLAGS.monitor:
-                    gym_env = gym.wrappers.Monitor(gym_env, FLAGS.experiments_dir + '/worker_{}'.format(i))
-                this_env = AtariEnvironment(gym_env=gym_env, resized_width=FLAGS.resized_width,
-                                            resized_height=FLAGS.resized_height,
-                                            agent_history_length=FLAGS.agent_history_length)
-
-                envs.append(this_env)
-            nb_actions = len(envs[0].gym_actions)
+            # The environments are created on a thread pool while the graph is built, every worker waits only for
+            # its own ones
+            env_futures = start_env_creation(make_env, num_workers * nb_envs_per_worker, FLAGS.env_threads)
+            nb_actions = nb_game_actions()
 
             if FLAGS.lstm:
                 global_network = ACNetworkLSTM('global', nb_actions, None)
@@ -80,49 +150,49 @@ def run():
                 global_network = ACNetwork('global', nb_actions, None)
 
             for i in range(num_workers):
-                workers.append(Worker(envs[i], sess, i, nb_actions, optimizer, global_step))
-            saver = tf.train.Saver(max_to_keep=5)
-
-            # gym_env_monitor = gym.make(FLAGS.game)
-            # gym_env_monitor.seed(FLAGS.seed)
-            # gym_env_monitor_wrapper = AtariEnvironment(gym_env=gym_env_monitor, resized_width=FLAGS.resized_width,
-            #                                            resized_height=FLAGS.resized_height,
-            #                                            agent_history_length=FLAGS.agent_history_length)
-            # nb_actions = len(gym_env_monitor_wrapper.gym_actions)
-            # pe = PolicyMonitor(
-            #     game=gym_env_monitor_wrapper,
-            #     nb_actions=nb_actions,
-            #     optimizer=optimizer,
-            #     global_step=global_step
-            # )
+                worker_envs = [future.result() for future in
+                               env_futures[i * nb_envs_per_worker:(i + 1) * nb_envs_per_worker]]
+                workers.append(
+                    Worker(BatchedAtariEnvironment(worker_envs), sess, i, nb_actions, optimizer, global_step,
+                           global_version))
+            envs = [future.result() for future in env_futures]
+            # Checkpoints hold the global network only, the worker copies are rebuilt from it on restore
+            checkpoint_vars = checkpoint_variables([worker.name for worker in workers])
+            saver = tf.train.Saver(checkpoint_vars, max_to_keep=5)
+            checkpoint_writer = CheckpointWriter(FLAGS.checkpoint_dir, FLAGS.checkpoint_interval, FLAGS.checkpoint_secs,
+                                                 var_list=checkpoint_vars,
+                                                 inference_signature=global_network.inference_signature())
 
         coord = tf.train.Coordinator()
         if FLAGS.resume:
-            ckpt = tf.train.get_checkpoint_state(FLAGS.checkpoint_dir)
-            print("Loading Model from {}".format(ckpt.model_checkpoint_path))
-            saver.restore(sess, ckpt.model_checkpoint_path)
+            restore_checkpoint(sess, saver, FLAGS.checkpoint_dir, [worker.update_local_ops for worker in workers])
         else:
             sess.run(tf.global_variables_initializer())
-
-        worker_threads = []
+        checkpoint_writer.start()
+        startup_seconds = time.time() - start_time
+        print("Started {} workers in {:.1f} seconds".format(len(workers), startup_seconds))
+
+        supervisor = TrainingSupervisor(sess, coord, checkpoint_writer, global_step, lambda: Worker.total_env_steps,
+                                        render=render_envs(envs) if FLAGS.show_training else None,
+                                        render_fps=FLAGS.render_fps, report_secs=FLAGS.report_secs,
+                                        total_updates=lambda: sess.run(global_version), max_steps=FLAGS.max_steps)
         for worker in workers:
-            t = threading.Thread(target=(lambda: worker.play(coord, saver)))
-            t.start()
-            worker_threads.append(t)
+            supervisor.start_thread(worker.name, worker.play, coord, checkpoint_writer)
 
-        # Start a thread for policy eval task
-        # monitor_thread = threading.Thread(target=lambda: pe.continuous_eval(FLAGS.eval_every, sess, coord))
-        # monitor_thread.start()
-        import time
-        while True:
-            if FLAGS.show_training:
-                for env in envs:
-                    # time.sleep(1)
-                    # with main_lock:
-                    env.env.render()
-
-        coord.join(worker_threads)
+        # Checkpoints are evaluated in a process of its own, not by a thread competing with the workers
+        evaluator = start_evaluator()
+        try:
+            throughput = supervisor.run(save_checkpoint=FLAGS.train)
+        finally:
+            stop_evaluator(evaluator)
+        throughput['startup_seconds'] = startup_seconds
 
+    if FLAGS.bench_result:
+        with open(FLAGS.bench_result, 'w') as f:
+            json.dump(throughput, f)
 
 if __name__ == '__main__':
-    run()
+    if FLAGS.actor_processes:
+        run_processes()
+    else:
+        run()
@@ -3,14 +3,20 @@ import multiprocessing
 from threading import Lock
 import gym
 from gym import wrappers
-import gym_fast_envs
+try:
+    import gym_fast_envs
+except ImportError:
+    # Offline only the stand-in games of catcher are available
+    pass
+import catcher
 #import gym_ple
 import tensorflow as tf
 from agent import Worker
 from atari_environment import AtariEnvironment
 from network import ACNetwork
 from network_lstm import ACNetworkLSTM
-from eval import PolicyMonitor
+from eval import PolicyMonitor, make_eval_envs
+from utils import load_inference_graph
 import flags
 
 FLAGS = tf.app.flags.FLAGS
@@ -18,6 +24,16 @@ FLAGS = tf.app.flags.FLAGS
 main_lock = Lock()
 
 def run():
+    if FLAGS.resume and FLAGS.inference_graph:
+        inference_graph = load_inference_graph(FLAGS.checkpoint_dir)
+        if inference_graph is not None:
+            # Only the exported policy is imported, the training graph is not built
+            print("Loading inference graph from {}".format(inference_graph.path))
+            envs = make_eval_envs(FLAGS.eval_envs, FLAGS.seed)
+            pe = PolicyMonitor(game=envs[0], nb_actions=len(envs[0].gym_actions), inference_graph=inference_graph,
+                               extra_games=envs[1:])
+            pe.eval_1000()
+            return
 
     tf.reset_default_graph()
 
@@ -26,12 +42,8 @@ def run():
             global_step = tf.Variable(0, dtype=tf.int32, name='global_episodes', trainable=False)
             # optimizer = tf.train.AdamOptimizer(learning_rate=FLAGS.lr)
             optimizer = tf.train.RMSPropOptimizer(FLAGS.lr, 0.99, 0.0, 1e-6)
-            gym_env_monitor = gym.make(FLAGS.game)
-            gym_env_monitor.seed(FLAGS.seed)
-            gym_env_monitor_wrapper = AtariEnvironment(gym_env=gym_env_monitor, resized_width=FLAGS.resized_width,
-                                                       resized_height=FLAGS.resized_height,
-                                                       agent_history_length=FLAGS.agent_history_length)
-            nb_actions = len(gym_env_monitor_wrapper.gym_actions)
+            envs = make_eval_envs(FLAGS.eval_envs, FLAGS.seed)
+            nb_actions = len(envs[0].gym_actions)
 
             if FLAGS.lstm:
                 global_network = ACNetworkLSTM('global', nb_actions, None)
@@ -49,10 +61,11 @@ def run():
             sess.run(tf.global_variables_initializer())
 
         pe = PolicyMonitor(
-            game=gym_env_monitor_wrapper,
+            game=envs[0],
             nb_actions=nb_actions,
             optimizer=optimizer,
-            global_step=global_step
+            global_step=global_step,
+            extra_games=envs[1:]
         )
         pe.eval_1000(sess)
 
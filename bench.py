@@ -0,0 +1,96 @@
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+
+import tensorflow as tf
+
+tf.app.flags.DEFINE_string('packages', 'async',
+                           """Comma separated packages to benchmark, fun and ga3c can be added once they train""")
+tf.app.flags.DEFINE_string('game', 'CatcherOffline-v0', """Game every package trains on""")
+tf.app.flags.DEFINE_integer('steps', 20000, """Environment steps every run trains for""")
+tf.app.flags.DEFINE_integer('max_concurrent', 0, """Largest nb_concurrent to benchmark, 0 for the number of cores""")
+tf.app.flags.DEFINE_integer('timeout_secs', 1800, """Seconds after which a run is killed and reported as failed""")
+tf.app.flags.DEFINE_string('bench_dir', './bench', """Directory where to write the logs and results of the runs""")
+
+FLAGS = tf.app.flags.FLAGS
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def concurrency_levels(max_concurrent):
+    levels = []
+    nb_concurrent = 1
+    while nb_concurrent < max_concurrent:
+        levels.append(nb_concurrent)
+        nb_concurrent *= 2
+    return levels + [max_concurrent]
+
+
+def run_package(package, nb_concurrent):
+    # Every run trains in its own process and directories, the package reports its throughput as json
+    run_dir = os.path.abspath(os.path.join(FLAGS.bench_dir, "{}_{}".format(package, nb_concurrent)))
+    if tf.gfile.Exists(run_dir):
+        tf.gfile.DeleteRecursively(run_dir)
+    tf.gfile.MakeDirs(run_dir)
+    result_file = os.path.join(run_dir, "result.json")
+    log_file = os.path.join(run_dir, "log.txt")
+
+    with open(log_file, 'w') as log:
+        process = subprocess.Popen([sys.executable, "run.py",
+                                    "--game={}".format(FLAGS.game),
+                                    "--nb_concurrent={}".format(nb_concurrent),
+                                    "--max_steps={}".format(FLAGS.steps),
+                                    "--bench_result={}".format(result_file),
+                                    "--summaries_dir={}".format(os.path.join(run_dir, "summaries")),
+                                    "--checkpoint_dir={}".format(os.path.join(run_dir, "models")),
+                                    "--experiments_dir={}".format(os.path.join(run_dir, "experiments"))],
+                                   cwd=os.path.join(ROOT, package), stdout=log, stderr=subprocess.STDOUT)
+        try:
+            process.wait(timeout=FLAGS.timeout_secs)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+    if not os.path.exists(result_file):
+        print("{} with nb_concurrent={} failed, see {}".format(package, nb_concurrent, log_file))
+        return None
+    with open(result_file) as f:
+        return json.load(f)
+
+
+def run():
+    max_concurrent = FLAGS.max_concurrent or multiprocessing.cpu_count()
+    results = {}
+    for package in FLAGS.packages.split(","):
+        results[package] = []
+        for nb_concurrent in concurrency_levels(max_concurrent):
+            throughput = run_package(package, nb_concurrent)
+            results[package].append((nb_concurrent, throughput))
+            if throughput is not None:
+                print("{} with nb_concurrent={}: started in {:.1f} sec, {:.1f} steps/sec, {:.1f} updates/sec".format(
+                    package, nb_concurrent, throughput.get('startup_seconds', float('nan')),
+                    throughput['steps_per_second'], throughput['updates_per_second']))
+
+    print("package  concurrent  startup sec  steps/sec  updates/sec  speedup")
+    for package, package_results in results.items():
+        baseline = next((throughput['steps_per_second'] for _, throughput in package_results
+                         if throughput is not None), None)
+        for nb_concurrent, throughput in package_results:
+            if throughput is None:
+                print("{:7s}  {:10d}  {:>11s}  {:>9s}  {:>11s}  {:>7s}".format(package, nb_concurrent, "-", "failed",
+                                                                               "-", "-"))
+            else:
+                # ga3c does not report its startup time
+                print("{:7s}  {:10d}  {:11.1f}  {:9.1f}  {:11.1f}  {:7.2f}".format(
+                    package, nb_concurrent, throughput.get('startup_seconds', float('nan')),
+                    throughput['steps_per_second'], throughput['updates_per_second'],
+                    throughput['steps_per_second'] / baseline))
+
+    with open(os.path.join(FLAGS.bench_dir, "results.json"), 'w') as f:
+        json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    run()
@@ -1,10 +1,12 @@
+import time
+
 import numpy as np
 import tensorflow as tf
 from network import FUNNetwork
-from utils import update_target_graph, discount, set_image_bandit, set_image_bandit_11_arms, make_gif
+from utils import update_target_graph, discount, RolloutBuffer, WindowedStat, PhaseTimer, StepTracer, set_image_bandit, set_image_bandit_11_arms, make_gif, \
+    get_summary_writer
 import os
 import flags
-import copy
 import scipy
 
 FLAGS = tf.app.flags.FLAGS
@@ -18,41 +20,54 @@ class Agent():
         self.optimizer = optimizer
         self.global_episode = global_step
         self.increment_global_episode = self.global_episode.assign_add(1)
-        self.episode_rewards = []
-
-        self.episode_lengths = []
-        self.episode_mean_w_values = []
-        self.episode_mean_m_values = []
-        self.summary_writer = tf.summary.FileWriter(
-            os.path.join(FLAGS.summaries_dir, FLAGS.model_name) + "/agent_" + str(self.thread_id))
-        self.summary = tf.Summary()
+        self.total_steps = 0
+        self.total_updates = 0
+        # Wall time of the phases of play, written to the agent's summaries every summary_interval episodes
+        self.timer = PhaseTimer()
+        self.episode_rewards = WindowedStat(FLAGS.summary_interval)
+
+        self.episode_lengths = WindowedStat(FLAGS.summary_interval)
+        self.episode_mean_w_values = WindowedStat(FLAGS.summary_interval)
+        self.episode_mean_m_values = WindowedStat(FLAGS.summary_interval)
+        self.summary_dir = os.path.join(FLAGS.summaries_dir, FLAGS.model_name) + "/agent_" + str(self.thread_id)
+        self.summary_writer = get_summary_writer().writer(self.summary_dir)
+        # Only the first agent is traced, concurrent traces would profile each other
+        self.tracer = StepTracer(self.name, self.summary_dir, FLAGS.trace_every if thread_id == 0 else 0,
+                                 FLAGS.trace_dir)
 
         self.local_AC = FUNNetwork(self.name, optimizer, self.global_episode)
 
         self.update_local_vars = update_target_graph('global', self.name)
         self.env = game
-
-    def train(self, rollout, sess, bootstrap_value_w, bootstrap_value_m, summaries=False):
-        rollout = np.array(rollout)
-        observations = rollout[:, 0]
-        actions = rollout[:, 1]
-        rewards = rollout[:, 2]
-        timesteps = rollout[:, 3]
-        w_values = rollout[:, 5]
-        m_values = rollout[:, 6]
-        sum_of_prev_goals = rollout[:, 7]
-        intr_rewards = rollout[:, 8]
-        goals = rollout[:, 9]
+        observations_dtype = np.float32 if FLAGS.game in flags.SUPPORTED_ENVS else np.uint8
+        self.episode_buffer = RolloutBuffer(FLAGS.BTT_length,
+                                            {"observations": observations_dtype, "actions": np.int32,
+                                             "rewards": np.float32, "timesteps": np.float32, "dones": np.bool_,
+                                             "w_values": np.float32, "m_values": np.float32,
+                                             "sum_of_prev_goals": np.float32, "intr_rewards": np.float32,
+                                             "goals": np.float32})
+
+    def train(self, rollout, sess, bootstrap_value_w, bootstrap_value_m, summaries=False, histograms=False):
+        start_time = time.time()
+        observations = rollout["observations"]
+        actions = rollout["actions"]
+        rewards = rollout["rewards"]
+        timesteps = rollout["timesteps"]
+        w_values = rollout["w_values"]
+        m_values = rollout["m_values"]
+        sum_of_prev_goals = rollout["sum_of_prev_goals"]
+        intr_rewards = rollout["intr_rewards"]
+        goals = rollout["goals"]
 
         # if FLAGS.meta:
-        prev_rewards = [0] + rewards[:-1].tolist()
-        prev_actions = [0] + actions[:-1].tolist()
-        prev_goals = [np.random.normal(size=(FLAGS.hidden_dim,))] + goals[:-1].tolist()
+        prev_rewards = np.append(0, rewards[:-1])
+        prev_actions = np.append(0, actions[:-1])
+        prev_goals = np.concatenate([np.random.normal(size=(1, FLAGS.hidden_dim)), goals[:-1]], axis=0)
 
         # The advantage function uses "Generalized Advantage Estimation"
-        rewards_plus_w = np.asarray(rewards.tolist() + [bootstrap_value_w])
-        rewards_plus_m = np.asarray(rewards.tolist() + [bootstrap_value_m])
-        intr_rewards_plus = np.asarray(intr_rewards.tolist() + [bootstrap_value_w])
+        rewards_plus_w = np.append(rewards, bootstrap_value_w)
+        rewards_plus_m = np.append(rewards, bootstrap_value_m)
+        intr_rewards_plus = np.append(intr_rewards, bootstrap_value_w)
         w_discounted_rewards = discount(rewards_plus_w, FLAGS.w_gamma)[:-1]
         m_discounted_rewards = discount(rewards_plus_m, FLAGS.m_gamma)[:-1]
         w_discounted_intr_rewards = discount(intr_rewards_plus, FLAGS.w_gamma)[:-1]
@@ -63,11 +78,11 @@ class Agent():
         m_rnn_state = self.local_AC.m_state_init
         feed_dict = {self.local_AC.w_extrinsic_return: w_discounted_rewards,
                      self.local_AC.m_extrinsic_return: m_discounted_rewards,
-                     self.local_AC.inputs: np.stack(observations, axis=0),
+                     self.local_AC.inputs: observations,
                      self.local_AC.prev_rewards: prev_rewards,
                      self.local_AC.prev_actions: prev_actions,
                      self.local_AC.prev_goal: prev_goals,
-                     self.local_AC.sum_prev_goals: np.stack(sum_of_prev_goals, axis=0),
+                     self.local_AC.sum_prev_goals: sum_of_prev_goals,
                      self.local_AC.w_intrinsic_return: w_discounted_intr_rewards,
                      self.local_AC.actions: actions,
                      self.local_AC.w_state_in[0]: w_rnn_state[0],
@@ -76,48 +91,61 @@ class Agent():
                      self.local_AC.m_state_in[1]: m_rnn_state[1]
                      }
 
+        # Only the summaries_scope network has histogram and image summaries to fetch
+        histograms = histograms and self.local_AC.merged_summary is not None
         if summaries:
-            l, w_v_l, m_v_l, p_l, g_l, e_l, g_n, v_n, _, ms, img_summ, cos_sim_state_diff = sess.run(
-                [self.local_AC.loss,
-                 self.local_AC.w_value_loss,
-                 self.local_AC.m_value_loss,
-                 self.local_AC.w_policy_loss,
-                 self.local_AC.goals_loss,
-                 self.local_AC.entropy,
-                 self.local_AC.grad_norms,
-                 self.local_AC.var_norms,
-                 self.local_AC.apply_grads,
-                 self.local_AC.merged_summary,
-                 self.local_AC.image_summaries,
-                 self.local_AC.cos_sim_state_diff,
-                 ],
-                feed_dict=feed_dict)
-            return l / len(rollout), w_v_l / len(rollout), m_v_l / len(rollout), \
-                   p_l / len(rollout), g_l / len(rollout), \
-                   e_l / len(
-                       rollout), g_n, v_n, ms, img_summ, m_discounted_rewards, w_discounted_rewards, w_discounted_intr_rewards, cos_sim_state_diff
+            fetches = [self.local_AC.loss,
+                       self.local_AC.w_value_loss,
+                       self.local_AC.m_value_loss,
+                       self.local_AC.w_policy_loss,
+                       self.local_AC.goals_loss,
+                       self.local_AC.entropy,
+                       self.local_AC.grad_norms,
+                       self.local_AC.var_norms,
+                       self.local_AC.apply_grads,
+                       self.local_AC.cos_sim_state_diff]
+            if histograms:
+                fetches += [self.local_AC.merged_summary, self.local_AC.image_summaries]
+            results = self.tracer.run('train_summaries', sess, fetches, feed_dict=feed_dict)
+            l, w_v_l, m_v_l, p_l, g_l, e_l, g_n, v_n, _, cos_sim_state_diff = results[:10]
+            ms, img_summ = results[10:] if histograms else (None, [])
+            stats = l / len(rollout), w_v_l / len(rollout), m_v_l / len(rollout), \
+                    p_l / len(rollout), g_l / len(rollout), \
+                    e_l / len(
+                        rollout), g_n, v_n, ms, img_summ, m_discounted_rewards, w_discounted_rewards, w_discounted_intr_rewards, cos_sim_state_diff
         else:
-            _ = sess.run([self.local_AC.apply_grads], feed_dict=feed_dict)
-            return None
-
-    def play(self, sess, coord, saver):
+            _ = self.tracer.run('train', sess, [self.local_AC.apply_grads], feed_dict=feed_dict)
+            stats = None
+        self.tracer.count_update()
+        self.total_updates += 1
+        self.timer.lap('Train', start_time)
+        return stats
+
+    def is_histogram_episode(self, episode_count):
+        # The histograms and images cost far more to fetch than the scalars, only every histogram_interval-th
+        # summary episode fetches them
+        return episode_count % (FLAGS.summary_interval * FLAGS.histogram_interval) == 0
+
+    def play(self, sess, coord, checkpoint_writer):
         episode_count = sess.run(self.global_episode)
 
         if not FLAGS.train:
             test_episode_count = 0
 
-        total_steps = 0
-
         print("Starting agent thread " + str(self.thread_id))
         with sess.as_default(), sess.graph.as_default():
+            self.timer.reset()
             while not coord.should_stop():
                 if FLAGS.train and episode_count > FLAGS.max_nb_episodes_train:
                     return 0
 
+                phase_start = time.time()
                 sess.run(self.update_local_vars)
+                self.timer.lap('Sync', phase_start)
                 sess.run(self.local_AC.decrease_prob_of_random_goal)
 
-                episode_buffer = []
+                episode_buffer = self.episode_buffer
+                episode_buffer.clear()
 
                 episode_w_values = []
                 episode_intr_reward = []
@@ -134,14 +162,16 @@ class Agent():
                 prev_goal = np.random.normal(size=(FLAGS.hidden_dim,))
 
                 if FLAGS.game not in flags.SUPPORTED_ENVS:
-                    s = self.env.get_initial_state()
+                    # AtariEnvironment hands out views into its frame ring buffer, keep a copy for the episode buffer
+                    s = np.copy(self.env.get_initial_state())
                 else:
                     s, _, _, _ = self.env.reset()
                 m_rnn_state = self.local_AC.m_state_init
                 w_rnn_state = self.local_AC.w_state_init
+                bootstrap_pending = False
 
                 while not d:
-
+                    phase_start = time.time()
                     feed_dict_m = {
                         self.local_AC.inputs: [s],
                         self.local_AC.prev_rewards: [r],
@@ -150,9 +180,10 @@ class Agent():
                         self.local_AC.m_state_in[1]: m_rnn_state[1]
                     }
 
-                    m_v, m_rnn_state_new, goals, m_s = sess.run(
-                        [self.local_AC.m_value, self.local_AC.m_state_out, self.local_AC.randomized_goals,
+                    m_v, m_rnn_state_new, goals, m_s = self.tracer.run(
+                        'manager_inference', sess, [self.local_AC.m_value, self.local_AC.m_state_out, self.local_AC.randomized_goals,
                          self.local_AC.f_Mspace], feed_dict=feed_dict_m)
+                    self.timer.lap('Inference', phase_start)
                     # prev_goal = goals[0]
                     episode_goals.append(goals[0])
                     episode_manager_states.append(m_s[0])
@@ -192,6 +223,7 @@ class Agent():
                     prev_goal = sum_of_prev_goals
                     episode_sum_of_prev_goals.append(sum_of_prev_goals)
 
+                    phase_start = time.time()
                     feed_dict_w = {
                         self.local_AC.inputs: [s],
                         self.local_AC.prev_rewards: [r],
@@ -203,26 +235,44 @@ class Agent():
                         self.local_AC.m_state_in[1]: m_rnn_state[1]
                     }
 
-                    pi, w_v, w_rnn_state_new = sess.run(
-                        [self.local_AC.w_policy, self.local_AC.w_value, self.local_AC.w_state_out],
+                    a, w_v, w_rnn_state_new = self.tracer.run(
+                        'worker_inference', sess, [self.local_AC.sampled_action, self.local_AC.w_value, self.local_AC.w_state_out],
                         feed_dict=feed_dict_w)
-                    a = np.random.choice(pi[0], p=pi[0])
-                    a = np.argmax(pi == a)
+                    self.timer.lap('Inference', phase_start)
+
+                    if bootstrap_pending:
+                        # Past the BTT boundary the rollout bootstraps from the values of the current step
+                        if episode_count % FLAGS.summary_interval == 0 and episode_count != 0:
+                            l, w_v_l, m_v_l, p_l, g_l, e_l, g_n, v_n, ms, img_sum, m_return, w_return, w_i_return, cos_sim_state_diff = self.train(
+                                episode_buffer, sess, w_v[0, 0], m_v[0, 0], summaries=True,
+                                histograms=self.is_histogram_episode(episode_count))
+                        else:
+                            self.train(episode_buffer, sess, w_v[0, 0], m_v[0, 0])
+                        bootstrap_pending = False
+                    a = a[0]
 
                     w_rnn_state = w_rnn_state_new
                     m_rnn_state = m_rnn_state_new
 
+                    preprocess_time = getattr(self.env, 'preprocess_time', 0.0)
+                    phase_start = time.time()
                     s1, r, d, _ = self.env.step(a)
+                    self.timer.lap('Env step', phase_start)
+                    self.timer.move('Env step', 'Preprocessing',
+                                    getattr(self.env, 'preprocess_time', 0.0) - preprocess_time)
                     if FLAGS.game not in flags.SUPPORTED_ENVS:
+                        s1 = np.copy(s1)
                         r = np.clip(r, -1, 1)
 
-                    episode_buffer.append(
-                        [s, a, r, t, d, w_v[0, 0], m_v[0, 0], sum_of_prev_goals, intr_reward, prev_goal])
+                    episode_buffer.add(observations=s, actions=a, rewards=r, timesteps=t, dones=d, w_values=w_v[0, 0],
+                                       m_values=m_v[0, 0], sum_of_prev_goals=sum_of_prev_goals,
+                                       intr_rewards=intr_reward, goals=prev_goal)
                     episode_goals.append(goals[0])
                     episode_w_values.append(w_v[0, 0])
                     episode_m_values.append(m_v[0, 0])
                     episode_reward += r
-                    total_steps += 1
+                    self.total_steps += 1
+                    self.timer.add_steps(1)
                     t += 1
                     episode_step_count += 1
 
@@ -231,141 +281,68 @@ class Agent():
                     # print(t)
                     if t >= FLAGS.BTT_length and FLAGS.game in flags.SUPPORTED_ENVS:
                         d = True
-                    elif t >= FLAGS.BTT_length and not d:
-                        feed_dict_m = {
-                            self.local_AC.inputs: [s],
-                            self.local_AC.prev_rewards: [r],
-                            self.local_AC.prev_goal: [prev_goal],
-                            self.local_AC.m_state_in[0]: m_rnn_state[0],
-                            self.local_AC.m_state_in[1]: m_rnn_state[1]
-                        }
-
-                        m_v, goals, m_s = sess.run(
-                            [self.local_AC.m_value, self.local_AC.randomized_goals,
-                             self.local_AC.f_Mspace], feed_dict=feed_dict_m)
-                        episode_goals_copy = copy.deepcopy(episode_goals)
-                        episode_goals_copy.append(goals[0])
-                        episode_manager_states_copy = copy.deepcopy(episode_manager_states)
-                        episode_manager_states_copy.append(m_s[0])
-
-                        intr_reward = intr_reward_gather_horiz()
-                        episode_intr_reward_copy = copy.deepcopy(episode_intr_reward)
-                        episode_intr_reward_copy.append(intr_reward)
-
-                        sum_of_prev_goals = prev_goals_gather_horiz()
-
-                        feed_dict = {
-                            self.local_AC.inputs: [s],
-                            self.local_AC.prev_rewards: [r],
-                            self.local_AC.prev_actions: [a],
-                            self.local_AC.sum_prev_goals: [sum_of_prev_goals],
-                            self.local_AC.w_state_in[0]: w_rnn_state[0],
-                            self.local_AC.w_state_in[1]: w_rnn_state[1],
-                            self.local_AC.m_state_in[0]: m_rnn_state[0],
-                            self.local_AC.m_state_in[1]: m_rnn_state[1]
-                        }
-
-                        w_v = sess.run(self.local_AC.w_value,
-                                           feed_dict=feed_dict)
-                        m_v, w_v = m_v[0, 0], w_v[0, 0]
-
-                        if len(episode_buffer) != 0 and FLAGS.train == True:
-                            if episode_count % FLAGS.summary_interval == 0 and episode_count != 0:
-                                l, w_v_l, m_v_l, p_l, g_l, e_l, g_n, v_n, ms, img_sum, m_return, w_return, w_i_return, cos_sim_state_diff = self.train(
-                                    episode_buffer, sess, m_v, w_v, summaries=True)
-                            else:
-                                self.train(episode_buffer, sess, m_v, w_v)
-
+                    elif t >= FLAGS.BTT_length and not d and len(episode_buffer) != 0 and FLAGS.train == True:
+                        bootstrap_pending = True
                     elif d:
                         break
 
-                self.episode_rewards.append(episode_reward)
-                self.episode_lengths.append(episode_step_count)
-                self.episode_mean_w_values.append(np.mean(episode_w_values))
-                self.episode_mean_m_values.append(np.mean(episode_m_values))
+                self.episode_rewards.add(episode_reward)
+                self.episode_lengths.add(episode_step_count)
+                self.episode_mean_w_values.add(np.mean(episode_w_values))
+                self.episode_mean_m_values.add(np.mean(episode_m_values))
 
                 if len(episode_buffer) != 0 and FLAGS.train == True:
                     if episode_count % FLAGS.summary_interval == 0 and episode_count != 0:
                         l, w_v_l, m_v_l, p_l, g_l, e_l, g_n, v_n, ms, img_sum, m_return, w_return, w_i_return, cos_sim_state_diff = self.train(
-                            episode_buffer, sess, 0.0, 0.0, summaries=True)
+                            episode_buffer, sess, 0.0, 0.0, summaries=True,
+                            histograms=self.is_histogram_episode(episode_count))
                     else:
                         self.train(episode_buffer, sess, 0.0)
 
                 if not FLAGS.train and test_episode_count == FLAGS.nb_test_episodes - 1:
-                    print("Mean reward for the model is {}".format(np.mean(self.episode_rewards)))
+                    print("Mean reward for the model is {}".format(self.episode_rewards.total_mean))
                     return 1
 
+                if FLAGS.train and self.name == 'agent_0':
+                    phase_start = time.time()
+                    checkpoint_writer.maybe_save(sess, episode_count)
+                    self.timer.lap('Checkpoint', phase_start)
+
                 if FLAGS.train and episode_count % FLAGS.summary_interval == 0 and episode_count != 0 and \
                                 self.name == 'agent_0':
-                    if episode_count % FLAGS.checkpoint_interval == 0 and self.name == 'agent_0' and FLAGS.train == True:
-                        saver.save(sess, self.model_path + '/model-' + str(episode_count) + '.cptk',
-                                   global_step=self.global_episode)
-                        print("Saved Model at {}".format(self.model_path + '/model-' + str(episode_count) + '.cptk'))
-
-                    mean_reward = np.mean(self.episode_rewards[-FLAGS.summary_interval:])
-                    mean_length = np.mean(self.episode_lengths[-FLAGS.summary_interval:])
-                    mean_w_value = np.mean(self.episode_mean_w_values[-FLAGS.summary_interval:])
-                    mean_m_value = np.mean(self.episode_mean_m_values[-FLAGS.summary_interval:])
+                    phase_start = time.time()
 
-                    self.summary.value.add(tag='Perf/Reward', simple_value=float(mean_reward))
+                    mean_reward = self.episode_rewards.mean()
+                    mean_length = self.episode_lengths.mean()
+                    mean_w_value = self.episode_mean_w_values.mean()
+                    mean_m_value = self.episode_mean_m_values.mean()
 
-                    self.summary.value.add(tag='Perf/Length', simple_value=float(mean_length))
-                    self.summary.value.add(tag='Perf/W_Value', simple_value=float(mean_w_value))
-                    self.summary.value.add(tag='Perf/M_Value', simple_value=float(mean_m_value))
+                    scalars = [('Perf/Reward', mean_reward),
+                               ('Perf/Length', mean_length),
+                               ('Perf/W_Value', mean_w_value),
+                               ('Perf/M_Value', mean_m_value)]
+                    summaries = []
 
                     if FLAGS.train:
-                        mean_m_return = np.mean(m_return)
-                        self.summary.value.add(tag='Returns/Mean M_Return', simple_value=float(mean_m_return))
-                        mean_w_return = np.mean(w_return)
-                        self.summary.value.add(tag='Returns/Mean W_Return', simple_value=float(mean_w_return))
-                        mean_intrinsic_return = np.mean(w_i_return)
-                        self.summary.value.add(tag='Returns/Mean Intrinsic_Return',
-                                               simple_value=float(mean_intrinsic_return))
-                        mean_cos_sim_state_diff = np.mean(cos_sim_state_diff)
-                        self.summary.value.add(tag='Statistics/Mean Cos Sim',
-                                               simple_value=float(mean_cos_sim_state_diff))
-                        self.summary.value.add(tag='Losses/Total Loss', simple_value=float(l))
-                        self.summary.value.add(tag='Losses/W_Value Loss', simple_value=float(w_v_l))
-                        self.summary.value.add(tag='Losses/M_Value Loss', simple_value=float(m_v_l))
-                        self.summary.value.add(tag='Losses/Policy Loss', simple_value=float(p_l))
-                        self.summary.value.add(tag='Losses/Goal Loss', simple_value=float(g_l))
-                        self.summary.value.add(tag='Losses/Entropy', simple_value=float(e_l))
-                        self.summary.value.add(tag='Losses/Grad Norm', simple_value=float(g_n))
-                        self.summary.value.add(tag='Losses/Var Norm', simple_value=float(v_n))
-                        summaries = tf.Summary().FromString(ms)
-                        sub_summaries_dict = {}
-                        for value in summaries.value:
-                            value_field = value.WhichOneof('value')
-                            value_ifo = sub_summaries_dict.setdefault(value.tag,
-                                                                      {'value_field': None, 'values': []})
-                            if not value_ifo['value_field']:
-                                value_ifo['value_field'] = value_field
-                            else:
-                                assert value_ifo['value_field'] == value_field
-                            value_ifo['values'].append(getattr(value, value_field))
-
-                        for name, value_ifo in sub_summaries_dict.items():
-                            summary_value = self.summary.value.add()
-                            summary_value.tag = name
-                            if value_ifo['value_field'] == 'histo':
-                                values = value_ifo['values']
-                                summary_value.histo.min = min([x.min for x in values])
-                                summary_value.histo.max = max([x.max for x in values])
-                                summary_value.histo.num = sum([x.num for x in values])
-                                summary_value.histo.sum = sum([x.sum for x in values])
-                                summary_value.histo.sum_squares = sum([x.sum_squares for x in values])
-                                for lim in values[0].bucket_limit:
-                                    summary_value.histo.bucket_limit.append(lim)
-                                for bucket in values[0].bucket:
-                                    summary_value.histo.bucket.append(bucket)
-                            else:
-                                print(
-                                    'Warning: could not aggregate summary of type {}'.format(value_ifo['value_field']))
-                    for s in img_sum:
-                        self.summary_writer.add_summary(s, episode_count)
-                    self.summary_writer.add_summary(self.summary, episode_count)
-
-                    self.summary_writer.flush()
+                        scalars += [('Returns/Mean M_Return', np.mean(m_return)),
+                                    ('Returns/Mean W_Return', np.mean(w_return)),
+                                    ('Returns/Mean Intrinsic_Return', np.mean(w_i_return)),
+                                    ('Statistics/Mean Cos Sim', np.mean(cos_sim_state_diff)),
+                                    ('Losses/Total Loss', l),
+                                    ('Losses/W_Value Loss', w_v_l),
+                                    ('Losses/M_Value Loss', m_v_l),
+                                    ('Losses/Policy Loss', p_l),
+                                    ('Losses/Goal Loss', g_l),
+                                    ('Losses/Entropy', e_l),
+                                    ('Losses/Grad Norm', g_n),
+                                    ('Losses/Var Norm', v_n)]
+                        if ms is not None:
+                            summaries.append(ms)
+                    # The histograms are merged and everything is written on the summary thread
+                    get_summary_writer().add(self.summary_dir, episode_count, scalars, summaries, img_sum)
+                    self.timer.lap('Summaries', phase_start)
+                if episode_count % FLAGS.summary_interval == 0 and episode_count != 0:
+                    self.timer.write_summaries(self.summary_dir, episode_count)
                 if self.name == 'agent_0':
                     sess.run(self.increment_global_episode)
                 if not FLAGS.train:
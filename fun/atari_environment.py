@@ -1,4 +1,4 @@
-from collections import deque
+import time
 
 import numpy as np
 from skimage.color import rgb2gray
@@ -20,21 +20,25 @@ class AtariEnvironment(object):
             # pick from a simplified "LEFT", "RIGHT", "NOOP" action space.
             self.gym_actions = [1, 2, 3]
 
-        # Screen buffer of size AGENT_HISTORY_LENGTH to be able
-        # to build state arrays of size [1, AGENT_HISTORY_LENGTH, width, height]
-        self.state_buffer = deque()
+        # Ring buffer of uint8 frames in which every frame is written twice, AGENT_HISTORY_LENGTH channels apart,
+        # so that the last AGENT_HISTORY_LENGTH frames are always one contiguous [height, width, AGENT_HISTORY_LENGTH]
+        # slice starting at buffer_index, ordered from the oldest to the newest frame
+        self.state_buffer = np.zeros((resized_height, resized_width, 2 * agent_history_length), dtype=np.uint8)
+        self.buffer_index = 0
+        # Seconds spent preprocessing frames, read by the phase timers of the agents
+        self.preprocess_time = 0.0
 
     def get_initial_state(self):
-        # Clear the state buffer
-        self.state_buffer = deque()
-
         x_t = self.env.reset()
         x_t = self.get_preprocessed_frame(x_t)
-        # s_t = np.stack((x_t, x_t, x_t, x_t), axis=2)
-        #
-        # for i in range(self.agent_history_length - 1):
-        #     self.state_buffer.append(x_t)
-        return x_t
+
+        self.state_buffer[:] = x_t[:, :, np.newaxis]
+        self.buffer_index = 0
+        return self.get_state()
+
+    def get_state(self):
+        # The returned state is a view into the ring buffer and is only valid until the next step
+        return self.state_buffer[:, :, self.buffer_index:self.buffer_index + self.agent_history_length]
 
     def get_preprocessed_frame(self, observation):
         # gray = 0.2125 * observation[..., 0]
@@ -44,31 +48,28 @@ class AtariEnvironment(object):
         #
         #     return gray
 
+        start_time = time.time()
         img = Image.fromarray(observation, 'RGB')
         # lum = lum.convert('L')
 
-        img = img.resize((self.resized_width, self.resized_height, 3))
-        pix = np.array(img).astype(float)
-        pix = np.dot(pix, [.2126, .7152, .0722])
-        pix = pix.astype(float) / 255
+        img = img.resize((self.resized_width, self.resized_height))
+        pix = np.dot(np.array(img), [.2126, .7152, .0722])
         # return self.color2gray(observation).resize((self.resized_width, self.resized_height))
+        # Rounded, truncating would bias every pixel of the float luminance downwards
+        pix = np.round(pix).astype(np.uint8)
+        self.preprocess_time += time.time() - start_time
         return pix
 
     def step(self, action_index):
         x_t1, r_t, terminal, info = self.env.step(self.gym_actions[action_index])
         x_t1 = self.get_preprocessed_frame(x_t1)
 
-        # previous_frames = np.array(self.state_buffer)
-        # previous_frames = np.transpose(previous_frames, axes=(1, 2, 0))
-        # s_t1 = np.empty((self.resized_height, self.resized_width, self.agent_history_length))
-        # s_t1[:, :, :self.agent_history_length - 1] = previous_frames
-        # s_t1[:, :, self.agent_history_length - 1] = x_t1
-        #
-        # # Pop the oldest frame, add the current frame to the queue
-        # self.state_buffer.popleft()
-        # self.state_buffer.append(x_t1)
+        # Overwrite the oldest frame in both halves of the buffer and move the window one frame forward
+        self.state_buffer[:, :, self.buffer_index] = x_t1
+        self.state_buffer[:, :, self.buffer_index + self.agent_history_length] = x_t1
+        self.buffer_index = (self.buffer_index + 1) % self.agent_history_length
 
-        return x_t1, r_t, terminal, info
+        return self.get_state(), r_t, terminal, info
 
     # def color2gray(self, rgb):
     #     if rgb.ndim == 2:
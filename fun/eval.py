@@ -18,17 +18,38 @@ FLAGS = tf.app.flags.FLAGS
 
 
 class PolicyMonitor(object):
-    def __init__(self, game, optimizer, global_step):
+    """Evaluates the global network through a policy_eval copy in the training graph, or the policy of an
+    InferenceGraph, then sess is the session of the inference graph."""
+
+    def __init__(self, game, optimizer=None, global_step=None, inference_graph=None):
         self.name = "policy_eval"
         self.global_episode = global_step
-        self.local_AC = FUNNetwork(self.name, optimizer, self.global_episode)
-
-        self.update_local_ops = update_target_graph('global', self.name)
+        self.inference_graph = inference_graph
+        if inference_graph is None:
+            self.local_AC = FUNNetwork(self.name, optimizer, self.global_episode)
+            self.signature = self.local_AC.inference_signature()
+            self.update_local_ops = update_target_graph('global', self.name)
         self.summary_writer = tf.summary.FileWriter(FLAGS.summaries_dir + "/policy_eval")
         self.env = game
         # self.actions = np.zeros([nb_actions])
 
 
+    def episode_count(self, sess):
+        if self.inference_graph is not None:
+            return self.inference_graph.episode_count
+        return sess.run(self.global_episode)
+
+    def zero_state(self, name):
+        if self.inference_graph is not None:
+            return [self.inference_graph.zero_state(name + '_in_c'), self.inference_graph.zero_state(name + '_in_h')]
+        return getattr(self.local_AC, name + '_init')
+
+    def run_policy(self, sess, outputs, inputs):
+        if self.inference_graph is not None:
+            return self.inference_graph.run(outputs, inputs)
+        return sess.run([self.signature['outputs'][name] for name in outputs],
+                        feed_dict={self.signature['inputs'][name]: value for name, value in inputs.items()})
+
     def eval_nb_test_episodes(self, sess):
         rewards = []
         for i in range(FLAGS.nb_test_episodes):
@@ -38,12 +59,14 @@ class PolicyMonitor(object):
 
     def eval_once(self, sess, summaries=True):
         with sess.as_default(), sess.graph.as_default():
-            # Copy params to local model
-            episode_count = sess.run(self.global_episode)
-            sess.run(self.update_local_ops)
-            sess.run([(tf.get_collection(tf.GraphKeys.GLOBAL_VARIABLES, "policy_eval/prob_of_random_goal")[0].assign(
-                tf.get_collection(tf.GraphKeys.GLOBAL_VARIABLES, "global/prob_of_random_goal")[0]))])
-            sess.run(self.local_AC.decrease_prob_of_random_goal)
+            episode_count = self.episode_count(sess)
+            # The inference graph samples goals with the prob_of_random_goal of its checkpoint
+            if self.inference_graph is None:
+                # Copy params to local model
+                sess.run(self.update_local_ops)
+                sess.run([(tf.get_collection(tf.GraphKeys.GLOBAL_VARIABLES, "policy_eval/prob_of_random_goal")[0].assign(
+                    tf.get_collection(tf.GraphKeys.GLOBAL_VARIABLES, "global/prob_of_random_goal")[0]))])
+                sess.run(self.local_AC.decrease_prob_of_random_goal)
 
 
             # Run an episode
@@ -53,8 +76,8 @@ class PolicyMonitor(object):
             r = 0
             a = 0
             prev_goal = np.random.normal(size=(FLAGS.hidden_dim,))
-            m_rnn_state = self.local_AC.m_state_init
-            w_rnn_state = self.local_AC.w_state_init
+            m_rnn_state = self.zero_state('m_state')
+            w_rnn_state = self.zero_state('w_state')
 
             total_reward = 0.0
             episode_length = 0
@@ -73,17 +96,17 @@ class PolicyMonitor(object):
             episode_maximums = []
 
             while not d:
-                feed_dict_m = {
-                    self.local_AC.inputs: [s],
-                    self.local_AC.prev_rewards: [r],
-                    self.local_AC.prev_goal: [prev_goal],
-                    self.local_AC.m_state_in[0]: m_rnn_state[0],
-                    self.local_AC.m_state_in[1]: m_rnn_state[1]
+                inputs_m = {
+                    'inputs': [s],
+                    'prev_rewards': [r],
+                    'prev_goal': [prev_goal],
+                    'm_state_in_c': m_rnn_state[0],
+                    'm_state_in_h': m_rnn_state[1]
                 }
 
-                m_v, m_rnn_state_new, goals, m_s = sess.run(
-                    [self.local_AC.m_value, self.local_AC.m_state_out, self.local_AC.randomized_goals,
-                     self.local_AC.f_Mspace], feed_dict=feed_dict_m)
+                m_v, m_c, m_h, goals, m_s = self.run_policy(
+                    sess, ['m_value', 'm_state_out_c', 'm_state_out_h', 'randomized_goals', 'f_Mspace'], inputs_m)
+                m_rnn_state_new = (m_c, m_h)
 
                 episode_goals.append(goals[0])
                 episode_manager_states.append(m_s[0])
@@ -138,21 +161,21 @@ class PolicyMonitor(object):
                 episode_sum_of_prev_goals.append(sum_of_prev_goals)
 
 
-                feed_dict_w = {
-                    self.local_AC.inputs: [s],
-                    self.local_AC.prev_rewards: [r],
-                    self.local_AC.prev_actions: [a],
-                    self.local_AC.sum_prev_goals: [sum_of_prev_goals],
-                    self.local_AC.w_state_in[0]: w_rnn_state[0],
-                    self.local_AC.w_state_in[1]: w_rnn_state[1],
-                    self.local_AC.m_state_in[0]: m_rnn_state[0],
-                    self.local_AC.m_state_in[1]: m_rnn_state[1]
+                inputs_w = {
+                    'inputs': [s],
+                    'prev_rewards': [r],
+                    'prev_actions': [a],
+                    'sum_prev_goals': [sum_of_prev_goals],
+                    'w_state_in_c': w_rnn_state[0],
+                    'w_state_in_h': w_rnn_state[1],
+                    'm_state_in_c': m_rnn_state[0],
+                    'm_state_in_h': m_rnn_state[1]
                 }
 
-                pi, w_v, w_rnn_state_new = sess.run(
-                    [self.local_AC.w_policy, self.local_AC.w_value, self.local_AC.w_state_out], feed_dict=feed_dict_w)
-                a = np.random.choice(pi[0], p=pi[0])
-                a = np.argmax(pi == a)
+                a, w_v, w_c, w_h = self.run_policy(
+                    sess, ['sampled_action', 'w_value', 'w_state_out_c', 'w_state_out_h'], inputs_w)
+                w_rnn_state_new = (w_c, w_h)
+                a = a[0]
 
                 w_rnn_state = w_rnn_state_new
                 m_rnn_state = m_rnn_state_new
@@ -13,6 +13,7 @@ import multiprocessing
 import os
 FLAGS = tf.app.flags.FLAGS
 from eval import PolicyMonitor
+from utils import load_inference_graph
 
 
 
@@ -20,6 +21,15 @@ from eval import PolicyMonitor
 #     FLAGS.lr = 10 ** np.random.uniform(np.log10(10**(-2)), np.log10((10**(-4))))
 #     FLAGS.gamma = np.random.uniform(0.8, 1.0)
 
+def make_monitor_env():
+    gym_env_monitor = gym.make(FLAGS.game)
+    if FLAGS.monitor:
+        gym_env_monitor = gym.wrappers.Monitor(gym_env_monitor,
+                                               os.path.join(FLAGS.test_experiments_dir, FLAGS.model_name),
+                                               force=True)
+    return gym_env_monitor
+
+
 def run():
     if not tf.gfile.Exists(os.path.join(FLAGS.frames_dir, FLAGS.model_name)):
         tf.gfile.MakeDirs(os.path.join(FLAGS.frames_dir, FLAGS.model_name))
@@ -27,6 +37,14 @@ def run():
         tf.gfile.DeleteRecursively(os.path.join(FLAGS.frames_dir, FLAGS.model_name))
         tf.gfile.MakeDirs(os.path.join(FLAGS.frames_dir, FLAGS.model_name))
 
+    if FLAGS.inference_graph:
+        inference_graph = load_inference_graph(os.path.join(FLAGS.checkpoint_dir, FLAGS.model_name))
+        if inference_graph is not None:
+            # Only the exported policy is imported, the training graph is not built
+            print("Loading inference graph from {}".format(inference_graph.path))
+            pe = PolicyMonitor(game=make_monitor_env(), inference_graph=inference_graph)
+            pe.eval_nb_test_episodes(inference_graph.sess)
+            return
 
     tf.reset_default_graph()
 
@@ -43,14 +61,8 @@ def run():
             print("Loading Model from {}".format(ckpt.model_checkpoint_path))
             saver.restore(sess, ckpt.model_checkpoint_path)
             sess.run(tf.local_variables_initializer())
-            gym_env_monitor = gym.make(FLAGS.game)
-            if FLAGS.monitor:
-                gym_env_monitor = gym.wrappers.Monitor(gym_env_monitor,
-                                                       os.path.join(FLAGS.test_experiments_dir, FLAGS.model_name),
-                                                       force=True)
-
             pe = PolicyMonitor(
-                game=gym_env_monitor,
+                game=make_monitor_env(),
                 optimizer=optimizer,
                 global_step=global_step
             )
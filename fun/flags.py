@@ -18,6 +18,14 @@ tf.app.flags.DEFINE_boolean('train', True,
                             """Whether to train or test""")
 tf.app.flags.DEFINE_boolean('show_training', False,
                             """Show windows with workers training""")
+tf.app.flags.DEFINE_integer('render_fps', 30, """Frames per second at which show_training renders the environments""")
+tf.app.flags.DEFINE_integer('report_secs', 60, """Seconds between steps per second reports, 0 to disable""")
+tf.app.flags.DEFINE_integer('trace_every', 0,
+                            """Trace an inference and a train run of the first worker every N updates, 0 to disable""")
+tf.app.flags.DEFINE_string('trace_dir', './traces', """Directory where to write the Chrome traces""")
+tf.app.flags.DEFINE_integer('max_steps', 0, """Stop training after this many environment steps, 0 to disable""")
+tf.app.flags.DEFINE_string('bench_result', '',
+                           """File where to write the steps and updates per second of the run as json""")
 tf.app.flags.DEFINE_string('checkpoint_dir', './models',
                            """Directory where to save model checkpoints.""")
 tf.app.flags.DEFINE_string('summaries_dir', './summaries',
@@ -31,9 +39,17 @@ tf.app.flags.DEFINE_string('frames_dir', './frames',
 tf.app.flags.DEFINE_boolean('monitor', False,
                             """Monitor test with gym monitor""")
 tf.app.flags.DEFINE_integer('summary_interval', 1000, """Number of episodes of interval between summary saves""")
+tf.app.flags.DEFINE_integer('histogram_interval', 10,
+                            """Number of summary saves between fetches of the histogram and image summaries""")
+tf.app.flags.DEFINE_string('summaries_scope', 'agent_0',
+                           """Scope of the only network that builds histogram and image summaries""")
 tf.app.flags.DEFINE_integer('checkpoint_interval', 1000, """Number of episodes of interval between checkpoint saves""")
+tf.app.flags.DEFINE_integer('checkpoint_secs', 0,
+                            """Seconds between checkpoint saves, in addition to checkpoint_interval, 0 to disable""")
 tf.app.flags.DEFINE_integer('nb_actions', 4, """Number of actions to take""")
 tf.app.flags.DEFINE_integer('nb_concurrent', 4, """Number of concurrent threads""")
+tf.app.flags.DEFINE_integer('env_threads', 8,
+                            """Threads creating the environments at startup, 1 creates them one after another""")
 tf.app.flags.DEFINE_integer('explore_steps', 900000, """Number of exploration steps""")
 tf.app.flags.DEFINE_float('initial_random_goal_prob', 0.1, """Initial probability of exploration""")
 tf.app.flags.DEFINE_float('final_random_goal_prob', 0, """final_random_goal_prob""")
@@ -46,9 +62,17 @@ tf.app.flags.DEFINE_float('beta_e', 1e-4, """Coefficient of entropy loss""")
 tf.app.flags.DEFINE_integer('max_nb_episodes_train', 900000, """Max number of episodes of training time""")
 tf.app.flags.DEFINE_float('gradient_clip_value', 50.0, """Gradient clip value for norm""")
 tf.app.flags.DEFINE_integer('nb_test_episodes', 1, """Nb of test episodes""")
+tf.app.flags.DEFINE_boolean('inference_graph', True,
+                            """Evaluate the inference graph exported with the latest checkpoint instead of the training graph""")
 tf.app.flags.DEFINE_integer('BTT_length', 400, 'BTT length')
 tf.app.flags.DEFINE_integer('hidden_dim', 256, 'The size of all the hidden layers')
 tf.app.flags.DEFINE_integer('manager_horizon', 10, """The manager_horizon = r = c""")
 tf.app.flags.DEFINE_integer('goal_embedding_size', 16, """The goal embedding size for the worker""")
 tf.app.flags.DEFINE_integer('alpha', 0.5, """Alpha value to regulate the influence of the intrinsic reward
                             on the workers total reward""")
+tf.app.flags.DEFINE_string('microbench_baseline', './microbench_baseline.json',
+                           """File where the micro-benchmark baseline timings are saved""")
+tf.app.flags.DEFINE_boolean('save_baseline', False, """Save the micro-benchmark timings as the new baseline""")
+tf.app.flags.DEFINE_boolean('compare_baseline', False, """Compare the micro-benchmark timings to the saved baseline""")
+tf.app.flags.DEFINE_float('regression_tolerance', 0.1,
+                          """Relative slowdown over the baseline reported as a regression""")
@@ -0,0 +1,54 @@
+import sys
+
+import numpy as np
+import tensorflow as tf
+from network import FUNNetwork
+from utils import discount, run_microbenchmarks
+import flags
+
+FLAGS = tf.app.flags.FLAGS
+
+
+def discount_kernels():
+    rollout_rewards = np.random.randn(FLAGS.BTT_length + 1)
+    return [("discount_rollout", lambda: discount(rollout_rewards, FLAGS.w_gamma), 10000)]
+
+
+def dlstm_kernels(sess):
+    h_size = FLAGS.hidden_dim * FLAGS.manager_horizon
+    s_t = tf.placeholder(tf.float32, [1, None, FLAGS.hidden_dim], name="s_t")
+    c_in = tf.placeholder(tf.float32, [1, h_size], name="c_in")
+    h_in = tf.placeholder(tf.float32, [1, h_size], name="h_in")
+    with tf.variable_scope("microbench"):
+        # Only the dilated LSTM of the manager is built, fast_dlstm uses nothing else of the network
+        dlstm = FUNNetwork.__new__(FUNNetwork)
+        lstm_cell = tf.contrib.rnn.LayerNormBasicLSTMCell(FLAGS.hidden_dim)
+        outputs, state = dlstm.fast_dlstm(s_t, tf.contrib.rnn.LSTMStateTuple(c_in, h_in), lstm_cell,
+                                          FLAGS.manager_horizon, h_size)
+        gradients = tf.gradients(tf.reduce_sum(outputs), tf.trainable_variables())
+    sess.run(tf.global_variables_initializer())
+
+    def feed_dict(nb_steps):
+        return {s_t: np.random.randn(1, nb_steps, FLAGS.hidden_dim),
+                c_in: np.zeros((1, h_size), np.float32),
+                h_in: np.zeros((1, h_size), np.float32)}
+
+    # A single step is the manager inference of every agent step, a BTT_length unroll is its training pass
+    step_feed_dict, unroll_feed_dict = feed_dict(1), feed_dict(FLAGS.BTT_length)
+    return [("fast_dlstm_step", lambda: sess.run([outputs, state], feed_dict=step_feed_dict), 200),
+            ("fast_dlstm_unroll", lambda: sess.run([outputs, state], feed_dict=unroll_feed_dict), 5),
+            ("fast_dlstm_unroll_gradients", lambda: sess.run(gradients, feed_dict=unroll_feed_dict), 5)]
+
+
+def run():
+    with tf.Graph().as_default(), tf.device("/cpu:0"), tf.Session() as sess:
+        kernels = discount_kernels() + dlstm_kernels(sess)
+        regressions = run_microbenchmarks(kernels, FLAGS.microbench_baseline, FLAGS.save_baseline,
+                                          FLAGS.compare_baseline, FLAGS.regression_tolerance)
+    if regressions:
+        print("Regressions: {}".format(", ".join(regressions)))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    run()
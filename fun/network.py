@@ -12,11 +12,23 @@ FLAGS = tf.app.flags.FLAGS
 
 class FUNNetwork():
     def __init__(self, scope, trainer, global_step=None):
+        # Only the summaries_scope network writes histograms and images, the other scopes skip building their ops
+        self.build_summaries = scope == FLAGS.summaries_scope
+        self.activation_summaries = []
         with tf.variable_scope(scope):
             self.prob_of_random_goal = tf.Variable(FLAGS.initial_random_goal_prob, trainable=False,
                                                    name="prob_of_random_goal", dtype=tf.float32)
-            self.inputs = tf.placeholder(shape=[None, FLAGS.resized_height, FLAGS.resized_width, FLAGS.agent_history_length],
-                                         dtype=tf.float32, name="Inputs")
+            if FLAGS.game not in flags.SUPPORTED_ENVS:
+                # Atari frames are fed as uint8 luminance and scaled to [0, 1] in the graph
+                self.inputs = tf.placeholder(
+                    shape=[None, FLAGS.resized_height, FLAGS.resized_width, FLAGS.agent_history_length],
+                    dtype=tf.uint8, name="Inputs")
+                self.scaled_inputs = tf.to_float(self.inputs) / 255.0
+            else:
+                self.inputs = tf.placeholder(
+                    shape=[None, FLAGS.resized_height, FLAGS.resized_width, FLAGS.agent_history_length],
+                    dtype=tf.float32, name="Inputs")
+                self.scaled_inputs = self.inputs
 
             self.prev_rewards = tf.placeholder(shape=[None], dtype=tf.float32, name="Prev_Rewards")
 
@@ -37,29 +49,32 @@ class FUNNetwork():
 
             if FLAGS.game not in flags.SUPPORTED_ENVS:
                 self.conv0 = tf.contrib.layers.conv2d(
-                    self.inputs, 16, 8, 4, activation_fn=tf.nn.elu, scope="conv0")
-                with tf.variable_scope('conv0'):
-                    tf.get_variable_scope().reuse_variables()
-                    weights = tf.get_variable('weights')
-                    grid = self.put_kernels_on_grid(weights)
-                    self.image_summaries.append(
-                        tf.summary.image('kernels', grid, max_outputs=1))
+                    self.scaled_inputs, 16, 8, 4, activation_fn=tf.nn.elu, scope="conv0")
+                if self.build_summaries:
+                    with tf.variable_scope('conv0'):
+                        tf.get_variable_scope().reuse_variables()
+                        weights = tf.get_variable('weights')
+                        grid = self.put_kernels_on_grid(weights)
+                        self.image_summaries.append(
+                            tf.summary.image('kernels', grid, max_outputs=1))
                 self.conv = tf.contrib.layers.conv2d(
                     self.conv0, 32, 4, 2, activation_fn=tf.nn.elu, scope="conv1")
             else:
                 self.conv = tf.contrib.layers.conv2d(
-                    self.inputs, 32, 5, 2, activation_fn=tf.nn.elu, scope="conv1")
-                with tf.variable_scope('conv1'):
+                    self.scaled_inputs, 32, 5, 2, activation_fn=tf.nn.elu, scope="conv1")
+                if self.build_summaries:
+                    with tf.variable_scope('conv1'):
+                        tf.get_variable_scope().reuse_variables()
+                        weights = tf.get_variable('weights')
+                        grid = self.put_kernels_on_grid(weights)
+                        self.image_summaries.append(
+                            tf.summary.image('kernels', grid, max_outputs=1))
+
+            if self.build_summaries:
+                with tf.variable_scope('inputs'):
                     tf.get_variable_scope().reuse_variables()
-                    weights = tf.get_variable('weights')
-                    grid = self.put_kernels_on_grid(weights)
                     self.image_summaries.append(
-                        tf.summary.image('kernels', grid, max_outputs=1))
-
-            with tf.variable_scope('inputs'):
-                tf.get_variable_scope().reuse_variables()
-                self.image_summaries.append(
-                    tf.summary.image('input', self.inputs, max_outputs=100))
+                        tf.summary.image('input', self.scaled_inputs, max_outputs=100))
 
             self.conv_flat = tf.contrib.layers.flatten(self.conv)
             self.fc = tf.contrib.layers.fully_connected(self.conv_flat, FLAGS.hidden_dim)
@@ -75,7 +90,7 @@ class FUNNetwork():
                     [self.f_percept, self.prev_rewards_onehot], 1,
                     name="Zt_r")
 
-            summary_f_percept_act = tf.contrib.layers.summarize_activation(self.f_percept)
+            self.summarize_activation(self.f_percept)
 
             ############################################################################################################
             # Manager network
@@ -95,7 +110,7 @@ class FUNNetwork():
 
             self.f_Mspace = tf.contrib.layers.layer_norm(self.f_Mspace)
             self.f_Mspace = tf.nn.elu(self.f_Mspace, name="St")
-            summary_f_Mspace_act = tf.contrib.layers.summarize_activation(self.f_Mspace)
+            self.summarize_activation(self.f_Mspace)
 
             m_rnn_in = tf.expand_dims(self.f_Mspace, [0], name="Mrnn_in")
             step_size = tf.shape(self.inputs)[:1]
@@ -117,7 +132,7 @@ class FUNNetwork():
             self.goals = tf.reshape(m_lstm_outputs, [-1, FLAGS.hidden_dim])
             self.normalized_goals = tf.contrib.layers.fully_connected(self.goals, FLAGS.hidden_dim, activation_fn=tf.tanh, name="Gt")
 
-            summary_goals = tf.contrib.layers.summarize_activation(self.normalized_goals)
+            self.summarize_activation(self.normalized_goals)
 
             def randomize_goals(t):
                 t = tf.cast(t, tf.int32)
@@ -139,7 +154,7 @@ class FUNNetwork():
             self.randomized_goals = tf.map_fn(lambda t: randomize_goals(t), tf.to_float(tf.range(0, step_size[0])),
                                               name="random_gt")
 
-            summary_random_goals = tf.contrib.layers.summarize_activation(self.randomized_goals)
+            self.summarize_activation(self.randomized_goals)
 
             self.decrease_prob_of_random_goal = tf.assign_sub(self.prob_of_random_goal, tf.constant(
                 (FLAGS.initial_random_goal_prob - FLAGS.final_random_goal_prob) / FLAGS.explore_steps))
@@ -148,7 +163,7 @@ class FUNNetwork():
                                            initializer=normalized_columns_initializer(1.0))
             self.m_value = tf.matmul(m_rnn_out, m_fc_value_w, name="M_Value")
 
-            summary_m_value_act = tf.contrib.layers.summarize_activation(self.m_value)
+            self.summarize_activation(self.m_value)
 
             ############################################################################################################
 
@@ -178,7 +193,7 @@ class FUNNetwork():
             Ut_flat = tf.reshape(w_lstm_outputs, [step_size[0], FLAGS.nb_actions * FLAGS.goal_embedding_size],
                                         name="Ut_flat")
 
-            summary_wrnn_act = tf.contrib.layers.summarize_activation(Ut)
+            self.summarize_activation(Ut)
 
             goal_encoding = tf.contrib.layers.fully_connected(self.sum_prev_goals, FLAGS.goal_embedding_size,
                                                               biases_initializer=None, scope="goal_emb")
@@ -186,14 +201,16 @@ class FUNNetwork():
             interm_rez = tf.squeeze(tf.matmul(Ut, tf.expand_dims(goal_encoding, 2)), 2)
             interm_rez = tf.contrib.layers.flatten(interm_rez)
             self.w_policy = tf.nn.softmax(interm_rez, name="W_Policy")
+            # Actions are sampled in the graph, fetched in the same run as the policy
+            self.sampled_action = tf.squeeze(tf.multinomial(interm_rez, 1), [1], name="sampled_action")
 
-            summary_w_policy_act = tf.contrib.layers.summarize_activation(self.w_policy)
+            self.summarize_activation(self.w_policy)
 
             w_fc_value_w = tf.get_variable("W_Value_W", shape=[FLAGS.nb_actions * FLAGS.goal_embedding_size + FLAGS.goal_embedding_size, 1],
                                            initializer=normalized_columns_initializer(1.0))
             self.w_value = tf.matmul(tf.concat([Ut_flat, goal_encoding], 1), w_fc_value_w, name="W_Value")
 
-            summary_w_value_act = tf.contrib.layers.summarize_activation(self.w_value)
+            self.summarize_activation(self.w_value)
 
             if scope != 'global':
 
@@ -245,20 +262,34 @@ class FUNNetwork():
                 self.var_norms = tf.global_norm(local_vars)
                 grads, self.grad_norms = tf.clip_by_global_norm(self.gradients, FLAGS.gradient_clip_value)
 
-                self.worker_summaries = [summary_f_percept_act, summary_f_Mspace_act, summary_goals,
-                                         summary_random_goals,
-                                         summary_m_value_act,
-                                         summary_wrnn_act, summary_w_policy_act, summary_w_value_act]
-                for grad, weight in zip(grads, local_vars):
-                    self.worker_summaries.append(tf.summary.histogram(weight.name + '_grad', grad))
-                    self.worker_summaries.append(tf.summary.histogram(weight.name, weight))
+                self.merged_summary = None
+                if self.build_summaries:
+                    self.worker_summaries = self.activation_summaries
+                    for grad, weight in zip(grads, local_vars):
+                        self.worker_summaries.append(tf.summary.histogram(weight.name + '_grad', grad))
+                        self.worker_summaries.append(tf.summary.histogram(weight.name, weight))
 
-                self.merged_summary = tf.summary.merge(self.worker_summaries)
+                    self.merged_summary = tf.summary.merge(self.worker_summaries)
 
                 global_vars = tf.get_collection(tf.GraphKeys.TRAINABLE_VARIABLES, 'global')
                 self.apply_grads = trainer.apply_gradients(zip(grads, global_vars))
 
 
+    def inference_signature(self):
+        # What evaluation feeds and fetches, exported with the checkpoints of the global network
+        return {'inputs': {'inputs': self.inputs, 'prev_rewards': self.prev_rewards, 'prev_actions': self.prev_actions,
+                           'prev_goal': self.prev_goal, 'sum_prev_goals': self.sum_prev_goals,
+                           'm_state_in_c': self.m_state_in[0], 'm_state_in_h': self.m_state_in[1],
+                           'w_state_in_c': self.w_state_in[0], 'w_state_in_h': self.w_state_in[1]},
+                'outputs': {'m_value': self.m_value, 'randomized_goals': self.randomized_goals,
+                            'f_Mspace': self.f_Mspace, 'sampled_action': self.sampled_action, 'w_value': self.w_value,
+                            'm_state_out_c': self.m_state_out[0], 'm_state_out_h': self.m_state_out[1],
+                            'w_state_out_c': self.w_state_out[0], 'w_state_out_h': self.w_state_out[1]}}
+
+    def summarize_activation(self, tensor):
+        if self.build_summaries:
+            self.activation_summaries.append(tf.contrib.layers.summarize_activation(tensor))
+
     def conditional_sub_state(self, is_this_current_step, tensor, previous_tensor):
         t = tf.cond(tf.cast(is_this_current_step, tf.bool),
                     lambda: tensor,
@@ -1,14 +1,22 @@
+import json
 import threading
+import time
 
 import tensorflow as tf
 import random
 import numpy as np
 import gym
 from gym import wrappers
-import gym_fast_envs
+try:
+    import gym_fast_envs
+except ImportError:
+    # Offline only the stand-in games of catcher are available
+    pass
+import catcher
 from agent import Agent
 from network import FUNNetwork
 import flags
+from utils import CheckpointWriter, TrainingSupervisor, checkpoint_variables, restore_checkpoint, start_env_creation
 import multiprocessing
 import atari_environment
 import os
@@ -43,7 +51,38 @@ def recreate_directory_structure():
 #     FLAGS.lr = 10 ** np.random.uniform(np.log10(10**(-2)), np.log10((10**(-4))))
 #     FLAGS.gamma = np.random.uniform(0.8, 1.0)
 
+def make_env(i):
+    gym_env = gym.make(FLAGS.game)
+    # if FLAGS.monitor:
+    #     gym_env = gym.wrappers.Monitor(gym_env, FLAGS.experiments_dir + '/worker_{}'.format(i), force=True)
+    if FLAGS.game not in flags.SUPPORTED_ENVS:
+        gym_env = atari_environment.AtariEnvironment(gym_env=gym_env, resized_width=FLAGS.resized_width,
+                                                     resized_height=FLAGS.resized_height,
+                                                     agent_history_length=FLAGS.agent_history_length)
+    return gym_env
+
+
+def nb_game_actions():
+    # Read from the action space of a bare gym environment, neither wrapped nor reset, so the graph is built without
+    # waiting for the environments of the workers. Pong and Breakout are played with 3 actions, see AtariEnvironment
+    if FLAGS.game in ("Pong-v0", "Breakout-v0"):
+        return 3
+    gym_env = gym.spec(FLAGS.game).make()
+    nb_actions = gym_env.action_space.n
+    gym_env.close()
+    return nb_actions
+
+
+def render_envs(envs):
+    def render():
+        for env in envs:
+            env.render()
+
+    return render
+
+
 def run():
+    start_time = time.time()
     recreate_directory_structure()
     tf.reset_default_graph()
 
@@ -59,48 +98,50 @@ def run():
             # num_agents = multiprocessing.cpu_count()
             num_agents = FLAGS.nb_concurrent
             agents = []
-            envs = []
-
-            for i in range(num_agents):
-                gym_env = gym.make(FLAGS.game)
-                # if FLAGS.monitor:
-                #     gym_env = gym.wrappers.Monitor(gym_env, FLAGS.experiments_dir + '/worker_{}'.format(i), force=True)
-                if FLAGS.game not in flags.SUPPORTED_ENVS:
-                    gym_env = atari_environment.AtariEnvironment(gym_env=gym_env, resized_width=FLAGS.resized_width,
-                                                                 resized_height=FLAGS.resized_height,
-                                                                 agent_history_length=FLAGS.agent_history_length)
-                    FLAGS.nb_actions = len(gym_env.gym_actions)
 
-                envs.append(gym_env)
+            # The environments are created on a thread pool while the graph is built, every agent waits only for
+            # its own one
+            env_futures = start_env_creation(make_env, num_agents, FLAGS.env_threads)
+            if FLAGS.game not in flags.SUPPORTED_ENVS:
+                FLAGS.nb_actions = nb_game_actions()
 
             global_network = FUNNetwork('global', None)
 
             for i in range(num_agents):
-                agents.append(Agent(envs[i], i, optimizer, global_step))
-            saver = tf.train.Saver(max_to_keep=5)
+                agents.append(Agent(env_futures[i].result(), i, optimizer, global_step))
+            envs = [future.result() for future in env_futures]
+            # Checkpoints hold the global network only, the agent copies are rebuilt from it on restore
+            checkpoint_vars = checkpoint_variables([agent.name for agent in agents])
+            saver = tf.train.Saver(checkpoint_vars, max_to_keep=5)
+            checkpoint_writer = CheckpointWriter(os.path.join(FLAGS.checkpoint_dir, FLAGS.model_name),
+                                                 FLAGS.checkpoint_interval, FLAGS.checkpoint_secs,
+                                                 var_list=checkpoint_vars,
+                                                 inference_signature=global_network.inference_signature())
 
         coord = tf.train.Coordinator()
         if FLAGS.resume:
-            ckpt = tf.train.get_checkpoint_state(os.path.join(FLAGS.checkpoint_dir, FLAGS.model_name))
-            print("Loading Model from {}".format(ckpt.model_checkpoint_path))
-            saver.restore(sess, ckpt.model_checkpoint_path)
+            restore_checkpoint(sess, saver, os.path.join(FLAGS.checkpoint_dir, FLAGS.model_name),
+                               [agent.update_local_vars for agent in agents])
         else:
             sess.run(tf.global_variables_initializer())
-
-        agent_threads = []
+        checkpoint_writer.start()
+        startup_seconds = time.time() - start_time
+        print("Started {} agents in {:.1f} seconds".format(len(agents), startup_seconds))
+
+        supervisor = TrainingSupervisor(sess, coord, checkpoint_writer, global_step,
+                                        lambda: sum(agent.total_steps for agent in agents),
+                                        render=render_envs(envs) if FLAGS.show_training else None,
+                                        render_fps=FLAGS.render_fps, report_secs=FLAGS.report_secs,
+                                        total_updates=lambda: sum(agent.total_updates for agent in agents),
+                                        max_steps=FLAGS.max_steps)
         for agent in agents:
-            thread = threading.Thread(target=(lambda: agent.play(sess, coord, saver)))
-            thread.start()
-            agent_threads.append(thread)
-
-        while True:
-            if FLAGS.show_training:
-                for env in envs:
-                    # time.sleep(1)
-                    # with main_lock:
-                    env.render()
-
-        coord.join(agent_threads)
+            supervisor.start_thread(agent.name, agent.play, sess, coord, checkpoint_writer)
+        throughput = supervisor.run(save_checkpoint=FLAGS.train)
+        throughput['startup_seconds'] = startup_seconds
+
+    if FLAGS.bench_result:
+        with open(FLAGS.bench_result, 'w') as f:
+            json.dump(throughput, f)
 
 
 if __name__ == '__main__':
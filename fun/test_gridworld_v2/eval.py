@@ -149,10 +149,9 @@ class PolicyMonitor(object):
                     self.local_AC.m_state_in[1]: m_rnn_state[1]
                 }
 
-                pi, w_v, w_rnn_state_new = sess.run(
-                    [self.local_AC.w_policy, self.local_AC.w_value, self.local_AC.w_state_out], feed_dict=feed_dict_w)
-                a = np.random.choice(pi[0], p=pi[0])
-                a = np.argmax(pi == a)
+                a, w_v, w_rnn_state_new = sess.run(
+                    [self.local_AC.sampled_action, self.local_AC.w_value, self.local_AC.w_state_out], feed_dict=feed_dict_w)
+                a = a[0]
 
                 w_rnn_state = w_rnn_state_new
                 m_rnn_state = m_rnn_state_new
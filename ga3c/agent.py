@@ -2,9 +2,15 @@ from multiprocessing import Process, Queue, Value
 import numpy as np
 import flags
 import gym
-import gym_fast_envs
+try:
+    import gym_fast_envs
+except ImportError:
+    # Offline only the stand-in games of catcher are available
+    pass
+import catcher
 import tensorflow as tf
 from atari_environment import AtariEnvironment
+from utils import PhaseTimer
 import time
 from scipy.signal import lfilter
 import datetime
@@ -28,9 +34,12 @@ class Agent(Process):
         self.nb_actions = len(self.env.gym_actions)
         self.wait_q = Queue(maxsize=1)
         self.stop = Value('i', 0)
+        # Phase timings are sent to the stats process with every finished episode
+        self.timer = PhaseTimer()
 
     def run(self):
         time.sleep(np.random.rand())
+        self.timer.reset()
 
         while not self.stop.value:
             if FLAGS.verbose:
@@ -40,37 +49,54 @@ class Agent(Process):
             for episode_buffer, episode_reward, episode_length in self.run_episode_generator():
                 if FLAGS.verbose:
                     print("Agent_{} puts a new episode in the training queue".format(self.id))
+                phase_start = time.time()
                 self.training_q.put(episode_buffer)
+                self.timer.lap('Training queue', phase_start)
             print("Agent_{} fished an episode and logs the result in the logs queue".format(self.id))
-            self.episode_log_q.put([datetime.now(), episode_reward, episode_length])
+            self.episode_log_q.put([datetime.now(), episode_reward, episode_length, self.name, self.timer.report()])
 
     def run_episode_generator(self):
+        # AtariEnvironment hands out views into its frame ring buffer, keep copies for the episode buffer
         s, _ = self.env.get_initial_state()
+        s = np.copy(s)
 
         d = False
         episode_buffer = []
         episode_reward = 0
         episode_step_count = 0
 
+        prediction = None
         while not d:
-            self.prediction_q.put((self.id, s))
-            pi, v = self.wait_q.get()
-            a = np.random.choice(pi[0], p=pi[0])
-            a = np.argmax(pi == a)
+            if prediction is None:
+                phase_start = time.time()
+                self.prediction_q.put((self.id, s))
+                prediction = self.wait_q.get()
+                self.timer.lap('Inference wait', phase_start)
+            a, pi, v = prediction
+            prediction = None
 
+            preprocess_time = self.env.preprocess_time
+            phase_start = time.time()
             s1, r, d, info = self.env.step(a)
+            self.timer.lap('Env step', phase_start)
+            self.timer.move('Env step', 'Preprocessing', self.env.preprocess_time - preprocess_time)
+            self.timer.add_steps(1)
+            s1 = np.copy(s1)
 
             r = np.clip(r, -1, 1)
 
-            episode_buffer.append([s, a, pi, r, s1, d, v[0, 0]])
+            episode_buffer.append([s, a, pi, r, s1, d, v])
             episode_reward += r
             episode_step_count += 1
             s = s1
 
             if len(episode_buffer) == FLAGS.max_episode_buffer_size and not d:
+                # The prediction for the bootstrap state is kept, the next step acts on the same state
+                phase_start = time.time()
                 self.prediction_q.put((self.id, s))
-                pi, v1 = self.wait_q.get()
-                updated_episode_buffer = self.get_training_data(episode_buffer, v1)
+                prediction = self.wait_q.get()
+                self.timer.lap('Inference wait', phase_start)
+                updated_episode_buffer = self.get_training_data(episode_buffer, prediction[2])
                 yield updated_episode_buffer, episode_reward, episode_step_count
             if d:
                 break
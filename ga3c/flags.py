@@ -46,6 +46,11 @@ tf.flags.DEFINE_integer("nb_predictors", 1, "nb_predictors")
 tf.flags.DEFINE_integer("nb_trainers", 1, "nb_trainers")
 tf.flags.DEFINE_integer("prediction_batch_size", 128, "prediction batch size")
 tf.flags.DEFINE_integer("training_min_batch_size", 0, "prediction batch size")
+tf.flags.DEFINE_integer("timing_summary_secs", 60, "Seconds between phase timing summaries of the predictors and trainers")
+tf.flags.DEFINE_integer("trace_every", 0, "Trace a prediction and a train run every N updates, 0 to disable")
+tf.flags.DEFINE_string("trace_dir", "./traces", "Directory where to write the Chrome traces")
+tf.flags.DEFINE_integer("max_steps", 0, "Stop training after this many environment steps, 0 to disable")
+tf.flags.DEFINE_string("bench_result", "", "File where to write the steps and updates per second of the run as json")
 
 
 
@@ -1,5 +1,6 @@
 import numpy as np
 import tensorflow as tf
+from utils import StepTracer, get_summary_writer
 
 FLAGS = tf.app.flags.FLAGS
 
@@ -13,17 +14,19 @@ class GACNetwork:
             with tf.device('gpu:0'):
                 self.summaries = tf.get_collection(tf.GraphKeys.SUMMARIES)
                 self.global_step = tf.Variable(0, dtype=tf.int32, name='global_episodes', trainable=False)
-                self.increment_global_step = self.global_step.assign_add(1)
+                self.global_step_increment = self.global_step.assign_add(1)
                 self.inputs = tf.placeholder(
                     shape=[None, FLAGS.resized_height, FLAGS.resized_width, FLAGS.agent_history_length],
-                    dtype=tf.float32,
+                    dtype=tf.uint8,
                     name="Input")
+                # Frames are stored and fed as uint8 luminance, the scaling to [0, 1] is done in the graph
+                self.scaled_inputs = tf.to_float(self.inputs) / 255.0
                 self.discounted_returns = tf.placeholder(tf.float32, [None], name='Return')
                 self.actions = tf.placeholder(shape=[None], dtype=tf.int32)
                 self.actions_onehot = tf.one_hot(self.actions, nb_actions, dtype=tf.float32)
 
                 self.conv1 = tf.contrib.layers.conv2d(
-                    self.inputs, 16, 5, 2, activation_fn=tf.nn.relu, scope="conv1")
+                    self.scaled_inputs, 16, 5, 2, activation_fn=tf.nn.relu, scope="conv1")
                 self.conv2 = tf.contrib.layers.conv2d(
                     self.conv1, 32, 5, 2, padding="VALID", activation_fn=tf.nn.relu, scope="conv2")
 
@@ -42,9 +45,10 @@ class GACNetwork:
                     activation_fn=None, scope="value"), axis=[1])
                 self.summaries.append(tf.summary.histogram("value_function", self.value))
 
-                self.policy = tf.contrib.layers.fully_connected(self.hidden, self.nb_actions, activation_fn=None,
-                                                                scope="policy")
-                self.policy = tf.nn.softmax(self.policy, name="policy") + 1e-8
+                policy_logits = tf.contrib.layers.fully_connected(self.hidden, self.nb_actions, activation_fn=None,
+                                                                  scope="policy")
+                self.policy = tf.nn.softmax(policy_logits, name="policy") + 1e-8
+                self.sampled_action = tf.squeeze(tf.multinomial(policy_logits, 1), [1], name="sampled_action")
                 self.summaries.append(tf.summary.histogram("value_function", self.policy))
 
                 self.responsible_outputs = tf.reduce_sum(self.policy * self.actions_onehot, [1])
@@ -75,21 +79,28 @@ class GACNetwork:
                         allow_soft_placement=True,
                         log_device_placement=False,
                         gpu_options=tf.GPUOptions(allow_growth=True)))
-                saver = tf.train.Saver(max_to_keep=5)
-                
-                self.summary_op = tf.summary.merge(self.summaries)
-                self.log_writer = tf.summary.FileWriter(FLAGS.summaries_dir, self.sess.graph)
+                self.saver = tf.train.Saver(max_to_keep=5)
 
+                self.summary_op = tf.summary.merge(self.summaries)
+                get_summary_writer().writer(FLAGS.summaries_dir).add_graph(self.sess.graph)
+                self.tracer = StepTracer('network', FLAGS.summaries_dir, FLAGS.trace_every, FLAGS.trace_dir)
 
                 if FLAGS.resume:
-                    ckpt = tf.train.get_checkpoint_state(FLAGS.checkpoint_dir)
-                    print("Loading Model from {}".format(ckpt.model_checkpoint_path))
-                    saver.restore(self.sess, ckpt.model_checkpoint_path)
+                    self.load()
                 else:
                     self.sess.run(tf.global_variables_initializer())
 
     def increment_global_step(self):
-        self.sess.run(self.increment_global_step)
+        self.sess.run(self.global_step_increment)
+
+    def save(self, episode_count):
+        self.saver.save(self.sess, FLAGS.checkpoint_dir + '/model-' + str(episode_count) + '.cptk',
+                        global_step=episode_count)
+
+    def load(self):
+        ckpt = tf.train.get_checkpoint_state(FLAGS.checkpoint_dir)
+        print("Loading Model from {}".format(ckpt.model_checkpoint_path))
+        self.saver.restore(self.sess, ckpt.model_checkpoint_path)
 
     def log(self, rollout):
         rollout = np.array(rollout)
@@ -105,15 +116,15 @@ class GACNetwork:
                      self.discounted_returns: discounted_returns,
                      self.actions: actions}
         step, summary = self.sess.run([self.global_step, self.summary_op], feed_dict=feed_dict)
-        self.log_writer.add_summary(summary, step)
+        get_summary_writer().add(FLAGS.summaries_dir, step, [], [summary])
 
     def predict(self, s):
         feed_dict = {self.inputs: s}
 
-        pi, v = self.sess.run(
-            [self.policy, self.value],
+        a, pi, v = self.tracer.run(
+            'inference', self.sess, [self.sampled_action, self.policy, self.value],
             feed_dict=feed_dict)
-        return pi, v
+        return a, pi, v
 
     def train(self, rollout, trainer_id):
         rollout = np.array(rollout)
@@ -129,7 +140,8 @@ class GACNetwork:
                      self.discounted_returns: discounted_returns,
                      self.actions: actions}
 
-        self.sess.run(self.apply_grads, feed_dict=feed_dict)
+        self.tracer.run('train', self.sess, self.apply_grads, feed_dict=feed_dict)
+        self.tracer.count_update()
 
     def get_global_step(self):
         step = self.sess.run(self.global_step)
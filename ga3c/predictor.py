@@ -3,6 +3,7 @@ import tensorflow as tf
 import numpy as np
 import flags
 import time
+from utils import PhaseTimer
 FLAGS = tf.app.flags.FLAGS
 
 class Predictor(Thread):
@@ -13,24 +14,37 @@ class Predictor(Thread):
         self.id = thread_id
         self.server = server
         self.stop = False
+        self.timer = PhaseTimer()
+        self.summary_dir = FLAGS.summaries_dir + "/" + self.name
 
     def run(self):
         agents_ids = np.zeros(FLAGS.prediction_batch_size, dtype=np.uint16)
         states = np.zeros(
             (FLAGS.prediction_batch_size, FLAGS.resized_height, FLAGS.resized_width, FLAGS.agent_history_length),
-            dtype=np.float32)
+            dtype=np.uint8)
 
+        last_timing_summary = time.time()
         while not self.stop:
+            phase_start = time.time()
             for i in np.arange(FLAGS.prediction_batch_size):
                 if self.server.prediction_q.empty():
                     break
                 print("Predictor_{} gets a new prediction form the prediction queue".format(self.id))
                 agents_ids[i], states[i] = self.server.prediction_q.get()
 
+            phase_start = self.timer.lap('Batch gathering', phase_start)
+
             if i > 0:
-                pi, v = self.server.network.predict(states[:i])
+                a, pi, v = self.server.network.predict(states[:i])
+                phase_start = self.timer.lap('Inference', phase_start)
 
                 for j in np.arange(i):
                     print("Predictor_{} puts a new prediction in the agent {} wait queue".format(self.id, agents_ids[j]))
-                    self.server.agents[agents_ids[j]].wait_q.put((pi[j], v[j]))
+                    self.server.agents[agents_ids[j]].wait_q.put((a[j], pi[j], v[j]))
+                self.timer.lap('Replies', phase_start)
+                self.timer.add_steps(i)
+
+            if time.time() - last_timing_summary >= FLAGS.timing_summary_secs:
+                self.timer.write_summaries(self.summary_dir, self.server.network.get_global_step())
+                last_timing_summary = time.time()
             time.sleep(0.01)
@@ -1,9 +1,15 @@
+import json
 import threading
 import multiprocessing
 from threading import Lock
 import gym
 from gym import wrappers
-import gym_fast_envs
+try:
+    import gym_fast_envs
+except ImportError:
+    # Offline only the stand-in games of catcher are available
+    pass
+import catcher
 # import gym_ple
 import tensorflow as tf
 from atari_environment import AtariEnvironment
@@ -39,7 +45,11 @@ def run():
     recreate_directory_structure()
     gym_env = gym.make(FLAGS.game)
     nb_actions = gym_env.action_space.n
-    Server(nb_actions).run()
+    throughput = Server(nb_actions).run()
+
+    if FLAGS.bench_result:
+        with open(FLAGS.bench_result, 'w') as f:
+            json.dump(throughput, f)
 
 if __name__ == '__main__':
     run()
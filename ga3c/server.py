@@ -6,6 +6,7 @@ from predictor import Predictor
 from trainer import Trainer
 from agent import Agent
 from stats import Stats
+from utils import get_summary_writer
 import time
 import flags
 FLAGS = tf.app.flags.FLAGS
@@ -40,19 +41,40 @@ class Server:
             self.predictors.append(Predictor(self, i))
             self.predictors[-1].start()
 
-
-        while True:
-            if self.stats.episode_count.value % FLAGS.checkpoint_interval:
-                self.save_model()
+        start_time = time.time()
+        last_checkpoint = self.stats.episode_count.value
+        while not FLAGS.max_steps or self.frame_counter < FLAGS.max_steps:
+            episode_count = self.stats.episode_count.value
+            # The loop polls faster than episodes end, every episode count is only saved once
+            if FLAGS.train and episode_count != last_checkpoint and episode_count % FLAGS.checkpoint_interval == 0:
+                self.save_model(episode_count)
+                last_checkpoint = episode_count
             time.sleep(0.05)
 
+        duration = time.time() - start_time
+        nb_steps, nb_updates = self.frame_counter, self.training_step
+        self.stop()
+        return {'seconds': duration, 'steps': nb_steps, 'updates': nb_updates,
+                'steps_per_second': nb_steps / duration, 'updates_per_second': nb_updates / duration}
+
+    def stop(self):
+        for thread in self.predictors + self.trainers:
+            thread.stop = True
+        for agent in self.agents:
+            agent.stop.value = 1
+        # Agents and stats can be blocked on a queue whose other end is gone, they are terminated instead of joined
+        for process in self.agents + [self.stats]:
+            process.terminate()
+            process.join()
+        get_summary_writer().flush()
+
     def train(self, updated_episode_buffer, trainer_id):
         self.network.train(updated_episode_buffer, trainer_id)
         self.training_step += 1
         self.frame_counter += updated_episode_buffer.shape[0]
         self.network.increment_global_step()
-        if self.stats.episode_count % FLAGS.summary_interval == 0:
+        if self.stats.episode_count.value % FLAGS.summary_interval == 0:
             self.network.log(updated_episode_buffer)
 
-    def save_model(self):
-        self.network.save(self.stats.episode_count.value)
+    def save_model(self, episode_count):
+        self.network.save(episode_count)
@@ -2,43 +2,48 @@ from multiprocessing import Process, Queue, Value
 import numpy as np
 import flags
 import gym
-import gym_fast_envs
+try:
+    import gym_fast_envs
+except ImportError:
+    # Offline only the stand-in games of catcher are available
+    pass
+import catcher
 import tensorflow as tf
 from atari_environment import AtariEnvironment
 import time
 from scipy.signal import lfilter
+from utils import WindowedStat, timing_scalars, get_summary_writer
 FLAGS = tf.app.flags.FLAGS
 
+
 class Stats(Process):
     def __init__(self):
         super(Stats, self).__init__(name="Stats")
 
         self.episode_log_q = Queue(maxsize=100)
-        self.episode_rewards = []
-        self.episode_lengths = []
+        self.episode_rewards = WindowedStat(FLAGS.summary_interval)
+        self.episode_lengths = WindowedStat(FLAGS.summary_interval)
 
         self.episode_count = Value('i', 0)
 
-        self.summary_writer = tf.summary.FileWriter(FLAGS.summaries_dir)
-        self.summary = tf.Summary()
-
     def run(self):
         while True:
             print("Stats thread takes a tuple from the log queue. Episode count it {}".format(self.episode_count.value))
-            time_of_reward, episode_reward, episode_length = self.episode_log_q.get()
-            self.episode_rewards.append([time_of_reward, episode_reward, episode_length])
+            time_of_reward, episode_reward, episode_length, agent_name, timings = self.episode_log_q.get()
+            self.episode_rewards.add(episode_reward)
+            self.episode_lengths.add(episode_length)
 
             self.episode_count.value += 1
+            self.write_timings(agent_name, timings)
 
-            if self.episode_count.value % FLAGS.summary_interval:
+            if self.episode_count.value % FLAGS.summary_interval == 0:
                 print("Stats thread makes a new summary log")
-                mean_reward = np.mean(self.episode_rewards[-FLAGS.summary_interval:])
-                mean_length = np.mean(self.episode_lengths[-FLAGS.summary_interval:])
-
-                self.summary.value.add(tag='Perf/Reward', simple_value=float(mean_reward))
-                self.summary.value.add(tag='Perf/Length', simple_value=float(mean_length))
-
-                self.summary_writer.add_summary(self.summary, self.episode_count.value)
-                self.summary_writer.flush()
+                get_summary_writer().add(FLAGS.summaries_dir, self.episode_count.value,
+                                         [('Perf/Reward', self.episode_rewards.mean()),
+                                          ('Perf/Length', self.episode_lengths.mean())])
 
             time.sleep(0.05)
+
+    def write_timings(self, name, timings):
+        # Every agent process reports the phase timings of its episodes to a log directory of its own
+        get_summary_writer().add(FLAGS.summaries_dir + "/" + name, self.episode_count.value, timing_scalars(*timings))
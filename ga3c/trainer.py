@@ -3,6 +3,7 @@ import tensorflow as tf
 import numpy as np
 import flags
 import time
+from utils import PhaseTimer
 FLAGS = tf.app.flags.FLAGS
 
 class Trainer(Thread):
@@ -13,9 +14,13 @@ class Trainer(Thread):
         self.id = thread_id
         self.server = server
         self.stop = False
+        self.timer = PhaseTimer()
+        self.summary_dir = FLAGS.summaries_dir + "/" + self.name
 
     def run(self):
+        last_timing_summary = time.time()
         while not self.stop:
+            phase_start = time.time()
             batch_size = 0
             while batch_size <= FLAGS.training_min_batch_size:
                 print("Trainer_{} gets a new training batch form the training queue".format(self.id))
@@ -26,7 +31,14 @@ class Trainer(Thread):
                     batch_episode_buffer.extend(updated_episode_buffer)
                 batch_size += updated_episode_buffer.shape[0]
 
+            phase_start = self.timer.lap('Batch gathering', phase_start)
+
             self.server.train(updated_episode_buffer, self.id)
+            self.timer.lap('Train', phase_start)
+            self.timer.add_steps(batch_size)
 
+            if time.time() - last_timing_summary >= FLAGS.timing_summary_secs:
+                self.timer.write_summaries(self.summary_dir, self.server.network.get_global_step())
+                last_timing_summary = time.time()
             time.sleep(0.01)
 
@@ -0,0 +1,225 @@
+import os
+import queue
+import time
+from collections import OrderedDict
+from threading import Thread, Lock
+
+import numpy as np
+import tensorflow as tf
+from tensorflow.python.client import timeline
+
+
+class WindowedStat():
+    """Mean of the last window values of a stream, kept in a fixed ring buffer with a running sum so that adding a
+    value and reading the mean are O(1). The mean and variance of every value since the start are kept with Welford's
+    update, so memory stays flat however long the run."""
+
+    def __init__(self, window):
+        self.values = np.zeros(window, dtype=np.float64)
+        self.index = 0
+        self.size = 0
+        self.window_sum = 0.0
+        self.count = 0
+        self.total_mean = 0.0
+        self.total_m2 = 0.0
+
+    def add(self, value):
+        value = float(value)
+        if self.size == len(self.values):
+            self.window_sum -= self.values[self.index]
+        else:
+            self.size += 1
+        self.values[self.index] = value
+        self.window_sum += value
+        self.index = (self.index + 1) % len(self.values)
+        if self.index == 0:
+            # Resumming once per window keeps the rounding errors of the running sum from accumulating
+            self.window_sum = float(np.sum(self.values[:self.size]))
+
+        self.count += 1
+        delta = value - self.total_mean
+        self.total_mean += delta / self.count
+        self.total_m2 += delta * (value - self.total_mean)
+
+    def mean(self):
+        return self.window_sum / self.size if self.size else float('nan')
+
+    def total_variance(self):
+        return self.total_m2 / self.count if self.count else float('nan')
+
+    def __len__(self):
+        return self.count
+
+
+class PhaseTimer():
+    """Wall time a loop spends in each of its phases. lap(phase, start) charges the time since start to phase and
+    returns the current time, so consecutive phases are timed with a single clock read each."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.totals = OrderedDict()
+        self.nb_steps = 0
+        self.start_time = time.time()
+
+    def lap(self, phase, start):
+        now = time.time()
+        self.totals[phase] = self.totals.get(phase, 0.0) + now - start
+        return now
+
+    def move(self, from_phase, to_phase, seconds):
+        self.totals[from_phase] = self.totals.get(from_phase, 0.0) - seconds
+        self.totals[to_phase] = self.totals.get(to_phase, 0.0) + seconds
+
+    def add_steps(self, nb_steps):
+        self.nb_steps += nb_steps
+
+    def report(self):
+        """Fraction of the wall time spent in every phase, untimed code included as Other, and the steps per second
+        since the last report. A new measurement period starts."""
+        elapsed = max(time.time() - self.start_time, 1e-6)
+        fractions = OrderedDict((phase, total / elapsed) for phase, total in self.totals.items())
+        fractions['Other'] = max(1.0 - sum(fractions.values()), 0.0)
+        steps_per_second = self.nb_steps / elapsed
+        self.reset()
+        return fractions, steps_per_second
+
+    def write_summaries(self, logdir, step):
+        get_summary_writer().add(logdir, step, timing_scalars(*self.report()))
+
+
+def timing_scalars(fractions, steps_per_second):
+    scalars = [('Timing/' + phase, fraction) for phase, fraction in fractions.items()]
+    scalars.append(('Timing/Steps per second', steps_per_second))
+    return scalars
+
+
+class StepTracer():
+    """Every trace_every updates, the next sess.run of each kind (inference, train, ...) is run once with a
+    FULL_TRACE. The run metadata is written to logdir by the SummaryWriter, TensorBoard shows it on the graph tab, and
+    the step stats are dumped as a Chrome trace to trace_dir, to be opened at chrome://tracing."""
+
+    def __init__(self, name, logdir, trace_every, trace_dir):
+        self.name = name
+        self.logdir = logdir
+        self.trace_every = trace_every
+        self.trace_dir = trace_dir
+        self.nb_updates = 0
+        # Kinds already traced in the current round, None until the first round starts
+        self.traced = None
+        if trace_every and not tf.gfile.Exists(trace_dir):
+            tf.gfile.MakeDirs(trace_dir)
+
+    def count_update(self):
+        self.nb_updates += 1
+        if self.trace_every and self.nb_updates % self.trace_every == 0:
+            self.traced = set()
+
+    def run(self, kind, sess, fetches, feed_dict=None):
+        if self.traced is None or kind in self.traced:
+            return sess.run(fetches, feed_dict=feed_dict)
+        self.traced.add(kind)
+
+        run_metadata = tf.RunMetadata()
+        result = sess.run(fetches, feed_dict=feed_dict, run_metadata=run_metadata,
+                          options=tf.RunOptions(trace_level=tf.RunOptions.FULL_TRACE))
+        tag = "{}_{}_{}".format(self.name, kind, self.nb_updates)
+        get_summary_writer().add(self.logdir, self.nb_updates, [], run_metadata=(tag, run_metadata))
+        trace = timeline.Timeline(run_metadata.step_stats).generate_chrome_trace_format()
+        with open(os.path.join(self.trace_dir, tag + '.json'), 'w') as f:
+            f.write(trace)
+        return result
+
+
+def merge_summaries(summary, serialized_summaries):
+    """Adds the values of the serialized summaries to summary, the histograms that share a tag are merged into one."""
+    values_by_tag = OrderedDict()
+    for serialized in serialized_summaries:
+        for value in tf.Summary.FromString(serialized).value:
+            values_by_tag.setdefault(value.tag, []).append(value)
+
+    for tag, values in values_by_tag.items():
+        value_field = values[0].WhichOneof('value')
+        if len(values) > 1 and value_field != 'histo':
+            print('Warning: could not aggregate summary of type {}'.format(value_field))
+            continue
+        merged = summary.value.add()
+        merged.CopyFrom(values[0])
+        if len(values) == 1:
+            continue
+        histos = [value.histo for value in values]
+        merged.histo.min = min(histo.min for histo in histos)
+        merged.histo.max = max(histo.max for histo in histos)
+        merged.histo.num, merged.histo.sum, merged.histo.sum_squares = \
+            np.sum([[histo.num, histo.sum, histo.sum_squares] for histo in histos], axis=0)
+        # Histograms of the same op share their bucket limits, their counts add up bucket by bucket
+        if all(list(histo.bucket_limit) == list(histos[0].bucket_limit) for histo in histos):
+            del merged.histo.bucket[:]
+            merged.histo.bucket.extend(np.sum([list(histo.bucket) for histo in histos], axis=0).tolist())
+
+
+class SummaryWriter(Thread):
+    """Writes the summaries of all agents on a background thread. Agents hand over their scalars and the serialized
+    summaries they fetched and go on, the summaries are merged into one event per step and the event files flushed
+    here. There is one FileWriter per log directory, shared by everything that logs to it."""
+
+    def __init__(self, max_queue=100):
+        super(SummaryWriter, self).__init__(name="SummaryWriter")
+        self.setDaemon(True)
+        self.jobs = queue.Queue(max_queue)
+        self.writers = {}
+        self.lock = Lock()
+
+    def writer(self, logdir):
+        with self.lock:
+            if logdir not in self.writers:
+                self.writers[logdir] = tf.summary.FileWriter(logdir)
+            return self.writers[logdir]
+
+    def add(self, logdir, step, scalars, summaries=(), images=(), run_metadata=None):
+        """scalars is a list of (tag, value) pairs, summaries and images are serialized Summary protobufs,
+        run_metadata a (tag, RunMetadata) pair."""
+        try:
+            self.jobs.put_nowait((logdir, step, scalars, summaries, images, run_metadata))
+        except queue.Full:
+            # Summaries are dropped rather than blocking training behind a slow disk
+            print("Summary queue full, dropping the summaries of step {}".format(step))
+
+    def flush(self):
+        self.jobs.join()
+        with self.lock:
+            for writer in self.writers.values():
+                writer.flush()
+
+    def run(self):
+        while True:
+            logdir, step, scalars, summaries, images, run_metadata = self.jobs.get()
+            summary = tf.Summary()
+            for tag, value in scalars:
+                summary.value.add(tag=tag, simple_value=float(value))
+            merge_summaries(summary, summaries)
+            writer = self.writer(logdir)
+            if summary.value:
+                writer.add_summary(summary, step)
+            for image in images:
+                writer.add_summary(image, step)
+            if run_metadata is not None:
+                writer.add_run_metadata(run_metadata[1], run_metadata[0], global_step=step)
+            if self.jobs.empty():
+                writer.flush()
+            self.jobs.task_done()
+
+
+summary_writer = None
+summary_writer_lock = Lock()
+
+
+def get_summary_writer():
+    """The SummaryWriter of the process, started on first use."""
+    global summary_writer
+    with summary_writer_lock:
+        if summary_writer is None:
+            summary_writer = SummaryWriter()
+            summary_writer.start()
+        return summary_writer
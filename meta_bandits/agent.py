@@ -1,49 +1,70 @@
+import time
+
 import numpy as np
 import tensorflow as tf
 from network import ACNetwork
-from utils import update_target_graph, discount, set_image_bandit, set_image_bandit_11_arms, make_gif
+from utils import update_target_graph, discount, RolloutBuffer, WindowedStat, PhaseTimer, FrameCapture, \
+    set_image_bandit, set_image_bandit_11_arms, make_gif, get_summary_writer
 
 FLAGS = tf.app.flags.FLAGS
 
 
 class Agent():
-    def __init__(self, game, thread_id, optimizer, global_step, settings):
+    """Plays and trains a copy of the global network. Test agents can instead play the policy of an InferenceGraph,
+    then no training graph is built and play runs in the session of the inference graph."""
+
+    def __init__(self, game, thread_id, optimizer, global_step, settings, inference_graph=None):
         self.name = "agent_" + str(thread_id)
         self.thread_id = thread_id
         self.model_path = settings["checkpoint_dir"]
         self.settings = settings
         self.optimizer = optimizer
-        self.global_episode = global_step
-        self.increment_global_episode = self.global_episode.assign_add(1)
-        self.episode_rewards = []
+        self.inference_graph = inference_graph
+        if inference_graph is None:
+            self.global_episode = global_step
+            self.increment_global_episode = self.global_episode.assign_add(1)
+        # Wall time of the phases of play, written to the agent's summaries every summary_interval episodes
+        self.timer = PhaseTimer()
+        self.episode_rewards = WindowedStat(FLAGS.summary_interval)
 
         # if not FLAGS.train:
-        self.episode_regrets = []
-        self.episodes_suboptimal_arms = []
-
-        self.episode_lengths = []
-        self.episode_mean_values = []
-        self.summary_writer = tf.summary.FileWriter(settings["summaries_dir"] + "/agent_" + str(self.thread_id))
-        self.summary = tf.Summary()
+        self.episode_regrets = WindowedStat(FLAGS.summary_interval)
+        self.episodes_suboptimal_arms = WindowedStat(FLAGS.summary_interval)
+
+        self.episode_lengths = WindowedStat(FLAGS.summary_interval)
+        self.episode_mean_values = WindowedStat(FLAGS.summary_interval)
+        self.summary_dir = settings["summaries_dir"] + "/agent_" + str(self.thread_id)
+        self.summary_writer = get_summary_writer().writer(self.summary_dir)
+        # Every test episode is rendered, training episodes only every frames_interval on the frames_workers
+        if FLAGS.train:
+            self.frame_capture = FrameCapture(FLAGS.frames_interval, FLAGS.max_frames,
+                                              str(thread_id) in FLAGS.frames_workers.split(","))
+        else:
+            self.frame_capture = FrameCapture(1, FLAGS.max_frames)
 
-        self.local_AC = ACNetwork(self.name, optimizer, self.global_episode)
-        self.update_local_vars = update_target_graph('global', self.name)
+        if inference_graph is None:
+            self.local_AC = ACNetwork(self.name, optimizer, self.global_episode)
+            self.signature = self.local_AC.inference_signature()
+            self.update_local_vars = update_target_graph('global', self.name)
         self.env = game
-
-    def train(self, rollout, sess, bootstrap_value, settings, summaries=False):
-        rollout = np.array(rollout)
-        actions = rollout[:, 0]
-        rewards = rollout[:, 1]
-        timesteps = rollout[:, 2]
+        self.episode_buffer = RolloutBuffer(128, {"actions": np.int32, "rewards": np.float32,
+                                                  "timesteps": np.float32, "dones": np.bool_,
+                                                  "values": np.float32})
+
+    def train(self, rollout, sess, bootstrap_value, settings, summaries=False, histograms=False):
+        start_time = time.time()
+        actions = rollout["actions"]
+        rewards = rollout["rewards"]
+        timesteps = rollout["timesteps"]
         if FLAGS.meta:
-            prev_rewards = [0] + rewards[:-1].tolist()
-        prev_actions = [0] + actions[:-1].tolist()
-        values = rollout[:, 4]
+            prev_rewards = np.append(0, rewards[:-1])
+        prev_actions = np.append(0, actions[:-1])
+        values = rollout["values"]
 
         # The advantage function uses "Generalized Advantage Estimation"
-        rewards_plus = np.asarray(rewards.tolist() + [bootstrap_value])
+        rewards_plus = np.append(rewards, bootstrap_value)
         discounted_rewards = discount(rewards_plus, settings["gamma"])[:-1]
-        value_plus = np.asarray(values.tolist() + [bootstrap_value])
+        value_plus = np.append(values, bootstrap_value)
         policy_target = discounted_rewards - value_plus[:-1]
         if FLAGS.gen_adv:
             td_residuals = rewards + settings["gamma"] * value_plus[1:] - value_plus[:-1]
@@ -69,24 +90,45 @@ class Agent():
                          self.local_AC.state_in[0]: rnn_state[0],
                          self.local_AC.state_in[1]: rnn_state[1]}
 
+        # Only the summaries_scope network has histogram and image summaries to fetch
+        histograms = histograms and self.local_AC.merged_summary is not None
         if summaries:
-            l, v_l, p_l, e_l, g_n, v_n, _, ms = sess.run([self.local_AC.loss,
-                                                          self.local_AC.value_loss,
-                                                          self.local_AC.policy_loss,
-                                                          self.local_AC.entropy,
-                                                          self.local_AC.grad_norms,
-                                                          self.local_AC.var_norms,
-                                                          self.local_AC.apply_grads,
-                                                          self.local_AC.merged_summary],
-                                                         feed_dict=feed_dict)
-
-            return l / len(rollout), v_l / len(rollout), p_l / len(rollout), e_l / len(rollout), g_n, v_n, ms
+            fetches = [self.local_AC.loss,
+                       self.local_AC.value_loss,
+                       self.local_AC.policy_loss,
+                       self.local_AC.entropy,
+                       self.local_AC.grad_norms,
+                       self.local_AC.var_norms,
+                       self.local_AC.apply_grads]
+            if histograms:
+                fetches.append(self.local_AC.merged_summary)
+            results = sess.run(fetches, feed_dict=feed_dict)
+            l, v_l, p_l, e_l, g_n, v_n, _ = results[:7]
+            ms = results[7] if histograms else None
+
+            stats = l / len(rollout), v_l / len(rollout), p_l / len(rollout), e_l / len(rollout), g_n, v_n, ms
         else:
             _ = sess.run([self.local_AC.apply_grads], feed_dict=feed_dict)
-            return None
-
-    def play(self, sess, coord, saver):
-        episode_count = sess.run(self.global_episode)
+            stats = None
+        self.timer.lap('Train', start_time)
+        return stats
+
+    def is_histogram_episode(self, episode_count):
+        # The histograms cost far more to fetch than the scalars, only every histogram_interval-th summary
+        # episode fetches them
+        return episode_count % (FLAGS.summary_interval * FLAGS.histogram_interval) == 0
+
+    def run_policy(self, sess, outputs, inputs):
+        if self.inference_graph is not None:
+            return self.inference_graph.run(outputs, inputs)
+        return sess.run([self.signature['outputs'][name] for name in outputs],
+                        feed_dict={self.signature['inputs'][name]: value for name, value in inputs.items()})
+
+    def play(self, sess, coord, checkpoint_writer):
+        if self.inference_graph is not None:
+            episode_count = self.inference_graph.episode_count
+        else:
+            episode_count = sess.run(self.global_episode)
 
         total_steps = 0
         if not FLAGS.train:
@@ -94,12 +136,17 @@ class Agent():
 
         print("Starting agent " + str(self.thread_id))
         with sess.as_default(), sess.graph.as_default():
+            self.timer.reset()
             while not coord.should_stop():
                 if FLAGS.train and episode_count > FLAGS.max_nb_episodes_train:
                     return 0
 
-                sess.run(self.update_local_vars)
-                episode_buffer = []
+                if self.inference_graph is None:
+                    phase_start = time.time()
+                    sess.run(self.update_local_vars)
+                    self.timer.lap('Sync', phase_start)
+                episode_buffer = self.episode_buffer
+                episode_buffer.clear()
 
                 # if not FLAGS.train:
                 #     print("Episode {}".format(test_episode_count))
@@ -107,7 +154,7 @@ class Agent():
                 episode_regret = 0
                 episode_suboptimal_arm = 0
                 episode_values = []
-                episode_frames = []
+                self.frame_capture.start_episode(episode_count)
                 episode_reward = [0 for _ in range(FLAGS.nb_actions)]
                 episode_step_count = 0
                 d = False
@@ -121,30 +168,31 @@ class Agent():
                     #print(test_episode_count)
                     self.env.set(self.settings["envs"][test_episode_count])
 
-                rnn_state = self.local_AC.state_init
+                if self.inference_graph is not None:
+                    rnn_state = [self.inference_graph.zero_state('state_in_c'),
+                                 self.inference_graph.zero_state('state_in_h')]
+                else:
+                    rnn_state = self.local_AC.state_init
 
                 while not d:
+                    phase_start = time.time()
+                    inputs = {
+                        'timestep': [[t]],
+                        'prev_actions': [a],
+                        'state_in_c': rnn_state[0],
+                        'state_in_h': rnn_state[1]}
                     if FLAGS.meta:
-                        feed_dict = {
-                            self.local_AC.prev_rewards: [[r]],
-                            self.local_AC.timestep: [[t]],
-                            self.local_AC.prev_actions: [a],
-                            self.local_AC.state_in[0]: rnn_state[0],
-                            self.local_AC.state_in[1]: rnn_state[1]}
-                    else:
-                        feed_dict = {
-                            self.local_AC.timestep: [[t]],
-                            self.local_AC.prev_actions: [a],
-                            self.local_AC.state_in[0]: rnn_state[0],
-                            self.local_AC.state_in[1]: rnn_state[1]}
-
-                    pi, v, rnn_state_new = sess.run(
-                        [self.local_AC.policy, self.local_AC.value, self.local_AC.state_out], feed_dict=feed_dict)
-                    a = np.random.choice(pi[0])
-                    a = np.argmax(pi == a)
-
-                    rnn_state = rnn_state_new
+                        inputs['prev_rewards'] = [[r]]
+
+                    a, v, c, h = self.run_policy(sess, ['sampled_action', 'value', 'state_out_c', 'state_out_h'],
+                                                 inputs)
+                    self.timer.lap('Inference', phase_start)
+                    a = a[0]
+
+                    rnn_state = (c, h)
+                    phase_start = time.time()
                     r, d, t = self.env.pull_arm(a)
+                    self.timer.lap('Env step', phase_start)
 
                     # if not FLAGS.train:
                     episode_regret += self.env.get_timestep_regret(a)
@@ -152,23 +200,27 @@ class Agent():
                     if optimal_action != a:
                         episode_suboptimal_arm += 1
 
-                    episode_buffer.append([a, r, t, d, v[0, 0]])
+                    episode_buffer.add(actions=a, rewards=r, timesteps=t, dones=d, values=v[0, 0])
                     episode_values.append(v[0, 0])
 
-                    if not FLAGS.game == '11arms':
-                        episode_frames.append(set_image_bandit(episode_reward, self.env.get_bandit(), a, t))
-                    else:
-                        episode_frames.append(
-                            set_image_bandit_11_arms(episode_reward, self.env.get_optimal_arm(), a, t))
+                    if self.frame_capture.wants_frame():
+                        phase_start = time.time()
+                        if not FLAGS.game == '11arms':
+                            self.frame_capture.add(set_image_bandit(episode_reward, self.env.get_bandit(), a, t))
+                        else:
+                            self.frame_capture.add(
+                                set_image_bandit_11_arms(episode_reward, self.env.get_optimal_arm(), a, t))
+                        self.timer.lap('Frames', phase_start)
 
                     episode_reward[a] += r
                     total_steps += 1
+                    self.timer.add_steps(1)
                     episode_step_count += 1
 
-                self.episode_rewards.append(np.sum(episode_reward))
+                self.episode_rewards.add(np.sum(episode_reward))
 
-                self.episodes_suboptimal_arms.append(episode_suboptimal_arm)
-                self.episode_regrets.append(episode_regret)
+                self.episodes_suboptimal_arms.add(episode_suboptimal_arm)
+                self.episode_regrets.add(episode_regret)
 
                 # if not FLAGS.train:
                 #     print("Episode total reward was: {} vs optimal reward {}".format(np.sum(episode_reward),
@@ -176,20 +228,21 @@ class Agent():
                 #     print("Regret is {}".format(max(episode_rewards_for_optimal_arm - np.sum(episode_reward), 0)))
                 #     print("Suboptimal arms in the episode: {}".format(episode_suboptimal_arm))
 
-                self.episode_lengths.append(episode_step_count)
-                self.episode_mean_values.append(np.mean(episode_values))
+                self.episode_lengths.add(episode_step_count)
+                self.episode_mean_values.add(np.mean(episode_values))
 
                 if len(episode_buffer) != 0 and FLAGS.train == True:
                     if episode_count % FLAGS.summary_interval == 0 and episode_count != 0:
-                        l, v_l, p_l, e_l, g_n, v_n, ms = self.train(episode_buffer, sess, 0.0, self.settings, True)
+                        l, v_l, p_l, e_l, g_n, v_n, ms = self.train(episode_buffer, sess, 0.0, self.settings, True,
+                                                                    self.is_histogram_episode(episode_count))
                     else:
                         self.train(episode_buffer, sess, 0.0, self.settings, False)
 
                 if not FLAGS.train and test_episode_count == FLAGS.nb_test_episodes - 1:
                     # episode_regret = [max(o - r, 0) for (o, r) in
                     #                   zip(self.episode_optimal_rewards, self.episode_rewards)]
-                    mean_regret = np.mean(self.episode_regrets)
-                    mean_nb_suboptimal_arms = np.mean(self.episodes_suboptimal_arms)
+                    mean_regret = self.episode_regrets.total_mean
+                    mean_nb_suboptimal_arms = self.episodes_suboptimal_arms.total_mean
 
                     if self.settings["mode"] == "val":
                         with open(FLAGS.results_val_file, "a+") as f:
@@ -200,7 +253,7 @@ class Agent():
                                 mean_regret,
                                 mean_nb_suboptimal_arms))
                     elif self.settings["mode"] == "test":
-                        self.images = np.array(episode_frames)
+                        self.images = np.array(self.frame_capture.frames)
                         #make_gif(self.images,
                         #         self.settings["frames_dir"] + '/image' + str(test_episode_count) + '.gif',
                          #        duration=len(self.images) * 0.1, true_image=True)
@@ -219,77 +272,48 @@ class Agent():
                     return 1
 
                 if not FLAGS.train:
-                    self.images = np.array(episode_frames)
+                    self.images = np.array(self.frame_capture.frames)
                     make_gif(self.images, FLAGS.frames_test_dir + '/image' + str(episode_count) + '.gif',
                              duration=len(self.images) * 0.1, true_image=True)
+                elif self.frame_capture.frames:
+                    phase_start = time.time()
+                    self.images = np.array(self.frame_capture.frames)
+                    make_gif(self.images, self.settings["frames_dir"] + '/image' + str(episode_count) + '.gif',
+                             duration=len(self.images) * 0.1, true_image=True)
+                    self.timer.lap('Frames', phase_start)
 
-                if FLAGS.train == True and episode_count % FLAGS.checkpoint_interval == 0 and episode_count != 0:
-                    saver.save(sess, self.model_path + '/model-' + str(episode_count) + '.cptk',
-                               global_step=self.global_episode)
-                    print("Saved Model at {}".format(self.model_path + '/model-' + str(episode_count) + '.cptk'))
+                if FLAGS.train == True:
+                    phase_start = time.time()
+                    checkpoint_writer.maybe_save(sess, episode_count)
+                    self.timer.lap('Checkpoint', phase_start)
 
                 if FLAGS.train and episode_count % FLAGS.summary_interval == 0 and episode_count != 0:
-                    # if episode_count % FLAGS.frames_interval == 0 and self.name == 'agent_0':
-                    #     self.images = np.array(episode_frames)
-                    #     make_gif(self.images, self.settings.frames_dir + '/image' + str(episode_count) + '.gif',
-                    #              duration=len(self.images) * 0.1, true_image=True)
-
-                    mean_reward = np.mean(self.episode_rewards[-FLAGS.summary_interval:])
-                    mean_length = np.mean(self.episode_lengths[-FLAGS.summary_interval:])
-                    mean_value = np.mean(self.episode_mean_values[-FLAGS.summary_interval:])
-                    episode_regret = [max(o - r, 0) for (o, r) in
-                                      zip(self.episode_optimal_rewards[-FLAGS.summary_interval:],
-                                          self.episode_rewards[-50:])]
-                    mean_regret = np.mean(episode_regret)
-                    mean_nb_suboptimal_arms = np.mean(self.episodes_suboptimal_arms[-FLAGS.summary_interval:])
-
-                    self.summary.value.add(tag='Perf/Reward', simple_value=float(mean_reward))
-                    self.summary.value.add(tag='Perf/Length', simple_value=float(mean_length))
-                    self.summary.value.add(tag='Perf/Value', simple_value=float(mean_value))
-
-                    self.summary.value.add(tag='Mean Regret', simple_value=float(mean_regret))
-                    self.summary.value.add(tag='Mean NSuboptArms', simple_value=float(mean_nb_suboptimal_arms))
-                    self.summary.value.add(tag='Losses/Total Loss', simple_value=float(l))
-                    self.summary.value.add(tag='Losses/Value Loss', simple_value=float(v_l))
-                    self.summary.value.add(tag='Losses/Policy Loss', simple_value=float(p_l))
-                    self.summary.value.add(tag='Losses/Entropy', simple_value=float(e_l))
-                    self.summary.value.add(tag='Losses/Grad Norm', simple_value=float(g_n))
-                    self.summary.value.add(tag='Losses/Var Norm', simple_value=float(v_n))
-                    summaries = tf.Summary().FromString(ms)
-                    sub_summaries_dict = {}
-                    for value in summaries.value:
-                        value_field = value.WhichOneof('value')
-                        value_ifo = sub_summaries_dict.setdefault(value.tag,
-                                                                  {'value_field': None, 'values': []})
-                        if not value_ifo['value_field']:
-                            value_ifo['value_field'] = value_field
-                        else:
-                            assert value_ifo['value_field'] == value_field
-                        value_ifo['values'].append(getattr(value, value_field))
-
-                    for name, value_ifo in sub_summaries_dict.items():
-                        summary_value = self.summary.value.add()
-                        summary_value.tag = name
-                        if value_ifo['value_field'] == 'histo':
-                            values = value_ifo['values']
-                            summary_value.histo.min = min([x.min for x in values])
-                            summary_value.histo.max = max([x.max for x in values])
-                            summary_value.histo.num = sum([x.num for x in values])
-                            summary_value.histo.sum = sum([x.sum for x in values])
-                            summary_value.histo.sum_squares = sum([x.sum_squares for x in values])
-                            for lim in values[0].bucket_limit:
-                                summary_value.histo.bucket_limit.append(lim)
-                            for bucket in values[0].bucket:
-                                summary_value.histo.bucket.append(bucket)
-                        else:
-                            print(
-                                'Warning: could not aggregate summary of type {}'.format(value_ifo['value_field']))
-
-                    self.summary_writer.add_summary(self.summary, episode_count)
-
-                    self.summary_writer.flush()
-
-                if self.name == 'agent_0':
+                    phase_start = time.time()
+
+                    mean_reward = self.episode_rewards.mean()
+                    mean_length = self.episode_lengths.mean()
+                    mean_value = self.episode_mean_values.mean()
+                    mean_regret = self.episode_regrets.mean()
+                    mean_nb_suboptimal_arms = self.episodes_suboptimal_arms.mean()
+
+                    scalars = [('Perf/Reward', mean_reward),
+                               ('Perf/Length', mean_length),
+                               ('Perf/Value', mean_value),
+                               ('Mean Regret', mean_regret),
+                               ('Mean NSuboptArms', mean_nb_suboptimal_arms),
+                               ('Losses/Total Loss', l),
+                               ('Losses/Value Loss', v_l),
+                               ('Losses/Policy Loss', p_l),
+                               ('Losses/Entropy', e_l),
+                               ('Losses/Grad Norm', g_n),
+                               ('Losses/Var Norm', v_n)]
+                    # The histograms are merged and everything is written on the summary thread
+                    get_summary_writer().add(self.summary_dir, episode_count, scalars, [ms] if ms is not None else [])
+                    self.timer.lap('Summaries', phase_start)
+                if episode_count % FLAGS.summary_interval == 0 and episode_count != 0:
+                    self.timer.write_summaries(self.summary_dir, episode_count)
+
+                if self.name == 'agent_0' and self.inference_graph is None:
                     sess.run(self.increment_global_episode)
                 if not FLAGS.train:
                 #     if self.settings["mode"] == "test":
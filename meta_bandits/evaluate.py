@@ -8,6 +8,7 @@ from envs.bandit_envs import TwoArms, ElevenArms
 from network import ACNetwork
 from baseline import RandomAgent
 import flags
+from utils import CheckpointWriter, checkpoint_variables, restore_checkpoint, load_inference_graph
 import os
 
 FLAGS = tf.app.flags.FLAGS
@@ -114,6 +115,17 @@ def evaluate_one_test():
 
 def run(settings):
     recreate_subdirectory_structure(settings)
+    if not FLAGS.train and FLAGS.inference_graph:
+        inference_graph = load_inference_graph(settings["load_from"])
+        if inference_graph is not None:
+            # Only the exported policy is imported, the training graph is not built
+            print("Loading inference graph from {}".format(inference_graph.path))
+            env = ElevenArms() if settings["game"] == '11arms' else TwoArms(settings["game"])
+            agent = Agent(env, 0, None, None, settings, inference_graph=inference_graph)
+            agent.play(inference_graph.sess, tf.train.Coordinator(), None)
+            inference_graph.close()
+            return
+
     tf.reset_default_graph()
 
     with tf.device("/cpu:0"):
@@ -133,17 +145,21 @@ def run(settings):
 
         for i in range(num_agents):
             agents.append(Agent(envs[i], i, optimizer, global_step, settings))
-        saver = tf.train.Saver(max_to_keep=5)
+        # Checkpoints hold the global network only, the agent copies are rebuilt from it on restore
+        checkpoint_vars = checkpoint_variables([agent.name for agent in agents])
+        saver = tf.train.Saver(checkpoint_vars, max_to_keep=5)
+        checkpoint_writer = CheckpointWriter(settings["checkpoint_dir"], FLAGS.checkpoint_interval,
+                                             FLAGS.checkpoint_secs, var_list=checkpoint_vars,
+                                             inference_signature=global_network.inference_signature())
 
     with tf.Session() as sess:
         coord = tf.train.Coordinator()
-        ckpt = tf.train.get_checkpoint_state(settings["load_from"])
-        print("Loading Model from {}".format(ckpt.model_checkpoint_path))
-        saver.restore(sess, ckpt.model_checkpoint_path)
+        restore_checkpoint(sess, saver, settings["load_from"], [agent.update_local_vars for agent in agents])
 
+        checkpoint_writer.start()
         agent_threads = []
         for agent in agents:
-            agent_play = lambda: agent.play(sess, coord, saver)
+            agent_play = lambda: agent.play(sess, coord, checkpoint_writer)
             thread = threading.Thread(target=agent_play)
             thread.start()
             agent_threads.append(thread)
@@ -19,8 +19,17 @@ tf.app.flags.DEFINE_string('frames_test_dir', './frames_test',
                            """Directory where to write test event gifs""")
 
 tf.app.flags.DEFINE_integer('summary_interval', 30000, """Number of episodes of interval between summary saves""")
+tf.app.flags.DEFINE_integer('histogram_interval', 10,
+                            """Number of summary saves between fetches of the histogram and image summaries""")
+tf.app.flags.DEFINE_string('summaries_scope', 'agent_0',
+                           """Scope of the only network that builds histogram and image summaries""")
 tf.app.flags.DEFINE_integer('checkpoint_interval', 20000, """Number of episodes of interval between checkpoint saves""")
-tf.app.flags.DEFINE_integer('frames_interval', 30000, """Number of episodes of interval between frames saves""")
+tf.app.flags.DEFINE_integer('checkpoint_secs', 0,
+                            """Seconds between checkpoint saves, in addition to checkpoint_interval, 0 to disable""")
+tf.app.flags.DEFINE_integer('frames_interval', 0,
+                            """Number of episodes between captured training episodes, 0 to disable frame capture""")
+tf.app.flags.DEFINE_string('frames_workers', '0', """Comma separated ids of the agents whose episodes are captured""")
+tf.app.flags.DEFINE_integer('max_frames', 100, """Maximum number of frames captured per episode""")
 tf.app.flags.DEFINE_integer('nb_actions', 2, """Number of actions to take""")
 tf.app.flags.DEFINE_float('beta_v', 0.05, """Coefficient of value function loss""")
 tf.app.flags.DEFINE_float('lr', 0.0014, """LR value used for one test""")
@@ -29,6 +38,8 @@ tf.app.flags.DEFINE_integer('max_nb_episodes_train', 20000, """Max number of epi
 
 tf.app.flags.DEFINE_float('gradient_clip_value', 50.0, """gradient_clip_value""")
 tf.app.flags.DEFINE_integer('nb_test_episodes', 150, """Test episodes""")
+tf.app.flags.DEFINE_boolean('inference_graph', True,
+                            """Evaluate the inference graph exported with the latest checkpoint instead of the training graph""")
 tf.app.flags.DEFINE_boolean('gen_adv', True,
                             """Whether to use generalized advantage estimation""")
 tf.app.flags.DEFINE_boolean('meta', True,
@@ -40,3 +51,9 @@ tf.app.flags.DEFINE_string('results_test_file', './results_test.txt',
                            """File where to write test results""")
 tf.app.flags.DEFINE_string('results_eval_file', './results_eval.txt',
                            """File where to write eval results""")
+tf.app.flags.DEFINE_string('microbench_baseline', './microbench_baseline.json',
+                           """File where the micro-benchmark baseline timings are saved""")
+tf.app.flags.DEFINE_boolean('save_baseline', False, """Save the micro-benchmark timings as the new baseline""")
+tf.app.flags.DEFINE_boolean('compare_baseline', False, """Compare the micro-benchmark timings to the saved baseline""")
+tf.app.flags.DEFINE_float('regression_tolerance', 0.1,
+                          """Relative slowdown over the baseline reported as a regression""")
@@ -0,0 +1,70 @@
+import sys
+
+import numpy as np
+import tensorflow as tf
+from envs.bandit_envs import TwoArms
+from network import ACNetwork
+from utils import discount, set_image_bandit, run_microbenchmarks
+import flags
+
+FLAGS = tf.app.flags.FLAGS
+
+# Every bandit episode is 100 pulls
+EPISODE_LENGTH = 100
+
+
+def discount_kernels():
+    episode_rewards = np.random.randn(EPISODE_LENGTH + 1)
+    return [("discount_episode", lambda: discount(episode_rewards, FLAGS.gamma), 10000)]
+
+
+def bandit_kernels():
+    kernels = []
+    for difficulty in [FLAGS.game, 'restless']:
+        env = TwoArms(difficulty)
+
+        def pull_arm(env=env):
+            _, d, _ = env.pull_arm(np.random.randint(2))
+            if d:
+                env.reset()
+
+        kernels.append(("pull_arm_{}".format(difficulty), pull_arm, 10000))
+
+    # Rendering reads ./resources, the benchmark runs from the package directory like the training scripts
+    values = np.random.uniform(0, 100, size=2)
+    probs = np.random.uniform(size=2)
+    kernels.append(("set_image_bandit", lambda: set_image_bandit(values, probs, 1, 50), 100))
+    return kernels
+
+
+def summary_kernels(sess):
+    # The histogram summaries of every weight and gradient merged on a summary episode of the agents
+    ACNetwork('global', None)
+    # Only the summaries_scope network builds the histograms
+    local_AC = ACNetwork(FLAGS.summaries_scope, tf.train.AdamOptimizer(learning_rate=FLAGS.lr))
+    sess.run(tf.global_variables_initializer())
+
+    feed_dict = {local_AC.target_v: np.random.randn(EPISODE_LENGTH),
+                 local_AC.prev_actions: np.random.randint(FLAGS.nb_actions, size=EPISODE_LENGTH),
+                 local_AC.actions: np.random.randint(FLAGS.nb_actions, size=EPISODE_LENGTH),
+                 local_AC.timestep: np.vstack(np.arange(EPISODE_LENGTH)),
+                 local_AC.advantages: np.random.randn(EPISODE_LENGTH),
+                 local_AC.state_in[0]: local_AC.state_init[0],
+                 local_AC.state_in[1]: local_AC.state_init[1]}
+    if FLAGS.meta:
+        feed_dict[local_AC.prev_rewards] = np.vstack(np.random.randint(2, size=EPISODE_LENGTH))
+    return [("merged_summary", lambda: sess.run(local_AC.merged_summary, feed_dict=feed_dict), 50)]
+
+
+def run():
+    with tf.Graph().as_default(), tf.device("/cpu:0"), tf.Session() as sess:
+        kernels = discount_kernels() + bandit_kernels() + summary_kernels(sess)
+        regressions = run_microbenchmarks(kernels, FLAGS.microbench_baseline, FLAGS.save_baseline,
+                                          FLAGS.compare_baseline, FLAGS.regression_tolerance)
+    if regressions:
+        print("Regressions: {}".format(", ".join(regressions)))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    run()
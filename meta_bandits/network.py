@@ -11,6 +11,8 @@ FLAGS = tf.app.flags.FLAGS
 
 class ACNetwork():
     def __init__(self, scope, trainer, global_step=None):
+        # Only the summaries_scope network writes histograms, the other scopes skip building their ops
+        self.build_summaries = scope == FLAGS.summaries_scope
         with tf.variable_scope(scope):
             if FLAGS.meta:
                 self.prev_rewards = tf.placeholder(shape=[None, 1], dtype=tf.float32, name="Prev_Rewards")
@@ -48,7 +50,10 @@ class ACNetwork():
 
             fc_pol_w = tf.get_variable("FC_Pol_W", shape=[48, FLAGS.nb_actions],
                                        initializer=normalized_columns_initializer(0.01))
-            self.policy = tf.nn.softmax(tf.matmul(rnn_out, fc_pol_w, name="Policy"), name="Policy_soft")
+            policy_logits = tf.matmul(rnn_out, fc_pol_w, name="Policy")
+            self.policy = tf.nn.softmax(policy_logits, name="Policy_soft")
+            # Actions are sampled in the graph, fetched in the same run as the policy
+            self.sampled_action = tf.squeeze(tf.multinomial(policy_logits, 1), [1], name="sampled_action")
 
             fc_value_w = tf.get_variable("FC_Value_W", shape=[48, 1],
                                          initializer=normalized_columns_initializer(1.0))
@@ -85,15 +90,29 @@ class ACNetwork():
                 self.var_norms = tf.global_norm(local_vars)
                 grads, self.grad_norms = tf.clip_by_global_norm(self.gradients, FLAGS.gradient_clip_value)
 
-                for grad, weight in zip(grads, local_vars):
-                    tf.summary.histogram(weight.name + '_grad', grad)
-                    tf.summary.histogram(weight.name, weight)
+                self.merged_summary = None
+                if self.build_summaries:
+                    # Merged from this scope's histograms only, merge_all would pull in every other agent's as well
+                    self.worker_summaries = []
+                    for grad, weight in zip(grads, local_vars):
+                        self.worker_summaries.append(tf.summary.histogram(weight.name + '_grad', grad))
+                        self.worker_summaries.append(tf.summary.histogram(weight.name, weight))
 
-                self.merged_summary = tf.summary.merge_all()
+                    self.merged_summary = tf.summary.merge(self.worker_summaries)
 
                 global_vars = tf.get_collection(tf.GraphKeys.TRAINABLE_VARIABLES, 'global')
                 self.apply_grads = trainer.apply_gradients(zip(grads, global_vars))
 
+    def inference_signature(self):
+        # What evaluation feeds and fetches, exported with the checkpoints of the global network
+        inputs = {'prev_actions': self.prev_actions, 'timestep': self.timestep,
+                  'state_in_c': self.state_in[0], 'state_in_h': self.state_in[1]}
+        if FLAGS.meta:
+            inputs['prev_rewards'] = self.prev_rewards
+        return {'inputs': inputs,
+                'outputs': {'policy': self.policy, 'sampled_action': self.sampled_action, 'value': self.value,
+                            'state_out_c': self.state_out[0], 'state_out_h': self.state_out[1]}}
+
     def xavier_initializer(self, uniform=True, seed=None, dtype=dtypes.float32):
         return self.variance_scaling_initializer(factor=1.0, mode='FAN_AVG',
                                                  uniform=uniform, seed=seed, dtype=dtype)
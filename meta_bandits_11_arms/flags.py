@@ -19,8 +19,17 @@ tf.app.flags.DEFINE_string('frames_test_dir', './frames_test',
                            """Directory where to write test event gifs""")
 
 tf.app.flags.DEFINE_integer('summary_interval', 20000, """Number of episodes of interval between summary saves""")
+tf.app.flags.DEFINE_integer('histogram_interval', 10,
+                            """Number of summary saves between fetches of the histogram and image summaries""")
+tf.app.flags.DEFINE_string('summaries_scope', 'agent_0',
+                           """Scope of the only network that builds histogram and image summaries""")
 tf.app.flags.DEFINE_integer('checkpoint_interval', 20000, """Number of episodes of interval between checkpoint saves""")
-tf.app.flags.DEFINE_integer('frames_interval', 20000, """Number of episodes of interval between frames saves""")
+tf.app.flags.DEFINE_integer('checkpoint_secs', 0,
+                            """Seconds between checkpoint saves, in addition to checkpoint_interval, 0 to disable""")
+tf.app.flags.DEFINE_integer('frames_interval', 0,
+                            """Number of episodes between captured training episodes, 0 to disable frame capture""")
+tf.app.flags.DEFINE_string('frames_workers', '0', """Comma separated ids of the agents whose episodes are captured""")
+tf.app.flags.DEFINE_integer('max_frames', 100, """Maximum number of frames captured per episode""")
 tf.app.flags.DEFINE_integer('nb_actions', 11, """Number of actions to take""")
 tf.app.flags.DEFINE_float('beta_v', 0.05, """Coefficient of value function loss""")
 tf.app.flags.DEFINE_float('lr', 0.001, """LR value used for one test""")
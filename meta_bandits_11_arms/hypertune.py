@@ -10,6 +10,7 @@ from baseline import RandomAgent
 import multiprocessing
 import concurrent.futures
 import flags
+from utils import CheckpointWriter, checkpoint_variables, restore_checkpoint, get_summary_writer
 import os
 
 FLAGS = tf.app.flags.FLAGS
@@ -85,24 +86,28 @@ def run(settings):
 
         for i in range(num_agents):
             agents.append(Agent(envs[i], i, optimizer, global_step, settings))
-        saver = tf.train.Saver(max_to_keep=5)
+        # Checkpoints hold the global network only, the agent copies are rebuilt from it on restore
+        checkpoint_vars = checkpoint_variables([agent.name for agent in agents])
+        saver = tf.train.Saver(checkpoint_vars, max_to_keep=5)
+        checkpoint_writer = CheckpointWriter(settings["checkpoint_dir"], FLAGS.checkpoint_interval,
+                                             FLAGS.checkpoint_secs, var_list=checkpoint_vars)
 
     with tf.Session() as sess:
         coord = tf.train.Coordinator()
         if FLAGS.resume:
-            ckpt = tf.train.get_checkpoint_state(settings["checkpoint_dir"])
-            print("Loading Model from {}".format(ckpt.model_checkpoint_path))
-            saver.restore(sess, ckpt.model_checkpoint_path)
+            restore_checkpoint(sess, saver, settings["checkpoint_dir"], [agent.update_local_vars for agent in agents])
         else:
             sess.run(tf.global_variables_initializer())
 
+        checkpoint_writer.start()
         agent_threads = []
         for agent in agents:
-            agent_play = lambda: agent.play(sess, coord, saver)
+            agent_play = lambda: agent.play(sess, coord, checkpoint_writer)
             thread = threading.Thread(target=agent_play)
             thread.start()
             agent_threads.append(thread)
         coord.join(agent_threads)
+        get_summary_writer().flush()
 
 
 def thread_processing(game):
@@ -1,7 +1,10 @@
+import time
+
 import numpy as np
 import tensorflow as tf
 from network import ACNetwork, ConvNetwork
-from utils import update_target_graph, discount, set_image_bandit, set_image_bandit_11_arms, make_gif
+from utils import update_target_graph, discount, RolloutBuffer, WindowedStat, PhaseTimer, StepTracer, set_image_bandit, set_image_bandit_11_arms, make_gif, \
+    get_summary_writer
 import os
 FLAGS = tf.app.flags.FLAGS
 
@@ -14,16 +17,22 @@ class Agent():
         self.optimizer = optimizer
         self.global_episode = global_step
         self.increment_global_episode = self.global_episode.assign_add(1)
-        self.episode_rewards = []
+        self.total_steps = 0
+        # Wall time of the phases of play, written to the agent's summaries every summary_interval episodes
+        self.timer = PhaseTimer()
+        self.episode_rewards = WindowedStat(FLAGS.summary_interval)
 
         # if not FLAGS.train:
         self.episode_optimal_rewards = []
-        self.episodes_suboptimal_arms = []
+        self.episodes_suboptimal_arms = WindowedStat(FLAGS.summary_interval)
 
-        self.episode_lengths = []
-        self.episode_mean_values = []
-        self.summary_writer = tf.summary.FileWriter(os.path.join(FLAGS.summaries_dir, FLAGS.model_name) + "/worker_" + str(self.thread_id))
-        self.summary = tf.Summary()
+        self.episode_lengths = WindowedStat(FLAGS.summary_interval)
+        self.episode_mean_values = WindowedStat(FLAGS.summary_interval)
+        self.summary_dir = os.path.join(FLAGS.summaries_dir, FLAGS.model_name) + "/worker_" + str(self.thread_id)
+        self.summary_writer = get_summary_writer().writer(self.summary_dir)
+        # Only the first agent is traced, concurrent traces would profile each other
+        self.tracer = StepTracer(self.name, self.summary_dir, FLAGS.trace_every if thread_id == 0 else 0,
+                                 FLAGS.trace_dir)
 
         if FLAGS.use_conv:
             self.local_AC = ConvNetwork(self.name, optimizer, self.global_episode)
@@ -32,23 +41,26 @@ class Agent():
 
         self.update_local_vars = update_target_graph('global', self.name)
         self.env = game
-
-    def train(self, rollout, sess, bootstrap_value, summaries=False):
-        rollout = np.array(rollout)
-        observations = rollout[:, 0]
-        actions = rollout[:, 1]
-        rewards = rollout[:, 2]
-        timesteps = rollout[:, 3]
-        values = rollout[:, 5]
+        self.episode_buffer = RolloutBuffer(128, {"observations": np.float32, "actions": np.int32,
+                                                  "rewards": np.float32, "timesteps": np.float32,
+                                                  "dones": np.bool_, "values": np.float32})
+
+    def train(self, rollout, sess, bootstrap_value, summaries=False, histograms=False):
+        start_time = time.time()
+        observations = rollout["observations"]
+        actions = rollout["actions"]
+        rewards = rollout["rewards"]
+        timesteps = rollout["timesteps"]
+        values = rollout["values"]
 
         if FLAGS.meta:
-            prev_rewards = [0] + rewards[:-1].tolist()
-            prev_actions = [0] + actions[:-1].tolist()
+            prev_rewards = np.append(0, rewards[:-1])
+            prev_actions = np.append(0, actions[:-1])
 
         # The advantage function uses "Generalized Advantage Estimation"
-        rewards_plus = np.asarray(rewards.tolist() + [bootstrap_value])
+        rewards_plus = np.append(rewards, bootstrap_value)
         discounted_rewards = discount(rewards_plus, FLAGS.gamma)[:-1]
-        value_plus = np.asarray(values.tolist() + [bootstrap_value])
+        value_plus = np.append(values, bootstrap_value)
         policy_target = discounted_rewards - value_plus[:-1]
         if FLAGS.gen_adv:
             td_residuals = rewards + FLAGS.gamma * value_plus[1:] - value_plus[:-1]
@@ -58,7 +70,7 @@ class Agent():
         rnn_state = self.local_AC.state_init
         if FLAGS.meta:
             feed_dict = {self.local_AC.target_v: discounted_rewards,
-                         self.local_AC.inputs: np.stack(observations, axis=0),
+                         self.local_AC.inputs: observations,
                          self.local_AC.prev_rewards: prev_rewards,
                          self.local_AC.prev_actions: prev_actions,
                          self.local_AC.actions: actions,
@@ -68,44 +80,58 @@ class Agent():
                          self.local_AC.state_in[1]: rnn_state[1]}
         else:
             feed_dict = {self.local_AC.target_v: discounted_rewards,
-                         self.local_AC.inputs: np.stack(observations, axis=0),
+                         self.local_AC.inputs: observations,
                          self.local_AC.actions: actions,
                          self.local_AC.advantages: policy_target,
                          self.local_AC.state_in[0]: rnn_state[0],
                          self.local_AC.state_in[1]: rnn_state[1]}
 
+        # Only the summaries_scope network has histogram and image summaries to fetch
+        histograms = histograms and self.local_AC.merged_summary is not None
         if summaries:
-            l, v_l, p_l, e_l, g_n, v_n, _, ms, img_summ = sess.run([self.local_AC.loss,
-                                                                    self.local_AC.value_loss,
-                                                                    self.local_AC.policy_loss,
-                                                                    self.local_AC.entropy,
-                                                                    self.local_AC.grad_norms,
-                                                                    self.local_AC.var_norms,
-                                                                    self.local_AC.apply_grads,
-                                                                    self.local_AC.merged_summary,
-                                                                    self.local_AC.image_summaries],
-                                                                   feed_dict=feed_dict)
-            return l / len(rollout), v_l / len(rollout), p_l / len(rollout), e_l / len(rollout), g_n, v_n, ms, img_summ
+            fetches = [self.local_AC.loss,
+                       self.local_AC.value_loss,
+                       self.local_AC.policy_loss,
+                       self.local_AC.entropy,
+                       self.local_AC.grad_norms,
+                       self.local_AC.var_norms,
+                       self.local_AC.apply_grads]
+            if histograms:
+                fetches += [self.local_AC.merged_summary, self.local_AC.image_summaries]
+            results = self.tracer.run('train_summaries', sess, fetches, feed_dict=feed_dict)
+            l, v_l, p_l, e_l, g_n, v_n, _ = results[:7]
+            ms, img_summ = results[7:] if histograms else (None, [])
+            stats = l / len(rollout), v_l / len(rollout), p_l / len(rollout), e_l / len(rollout), g_n, v_n, ms, img_summ
         else:
-            _ = sess.run([self.local_AC.apply_grads], feed_dict=feed_dict)
-            return None
-
-    def play(self, sess, coord, saver):
+            _ = self.tracer.run('train', sess, [self.local_AC.apply_grads], feed_dict=feed_dict)
+            stats = None
+        self.tracer.count_update()
+        self.timer.lap('Train', start_time)
+        return stats
+
+    def is_histogram_episode(self, episode_count):
+        # The histograms and images cost far more to fetch than the scalars, only every histogram_interval-th
+        # summary episode fetches them
+        return episode_count % (FLAGS.summary_interval * FLAGS.histogram_interval) == 0
+
+    def play(self, sess, coord, checkpoint_writer):
         episode_count = sess.run(self.global_episode)
 
         if not FLAGS.train:
             test_episode_count = 0
 
-        total_steps = 0
-
         print("Starting worker " + str(self.thread_id))
         with sess.as_default(), sess.graph.as_default():
+            self.timer.reset()
             while not coord.should_stop():
                 if FLAGS.train and episode_count > FLAGS.max_nb_episodes_train:
                     return 0
 
+                phase_start = time.time()
                 sess.run(self.update_local_vars)
-                episode_buffer = []
+                self.timer.lap('Sync', phase_start)
+                episode_buffer = self.episode_buffer
+                episode_buffer.clear()
 
                 episode_values = []
                 episode_reward = 0
@@ -120,6 +146,7 @@ class Agent():
                 rnn_state = self.local_AC.state_init
 
                 while not d:
+                    phase_start = time.time()
 
                     if FLAGS.meta:
                         feed_dict = {
@@ -135,18 +162,21 @@ class Agent():
                             self.local_AC.state_in[0]: rnn_state[0],
                             self.local_AC.state_in[1]: rnn_state[1]}
 
-                    pi, v, rnn_state_new = sess.run(
-                        [self.local_AC.policy, self.local_AC.value, self.local_AC.state_out], feed_dict=feed_dict)
-                    a = np.random.choice(pi[0], p=pi[0])
-                    a = np.argmax(pi == a)
+                    a, v, rnn_state_new = self.tracer.run(
+                        'inference', sess, [self.local_AC.sampled_action, self.local_AC.value, self.local_AC.state_out], feed_dict=feed_dict)
+                    self.timer.lap('Inference', phase_start)
+                    a = a[0]
 
                     rnn_state = rnn_state_new
+                    phase_start = time.time()
                     s1, r, d, _ = self.env.step(a)
+                    self.timer.lap('Env step', phase_start)
 
-                    episode_buffer.append([s, a, r, t, d, v[0, 0]])
+                    episode_buffer.add(observations=s, actions=a, rewards=r, timesteps=t, dones=d, values=v[0, 0])
                     episode_values.append(v[0, 0])
                     episode_reward += r
-                    total_steps += 1
+                    self.total_steps += 1
+                    self.timer.add_steps(1)
                     t += 1
                     episode_step_count += 1
 
@@ -156,76 +186,53 @@ class Agent():
                     if t > 100:
                         d = True
 
-                self.episode_rewards.append(episode_reward)
-                self.episode_lengths.append(episode_step_count)
-                self.episode_mean_values.append(np.mean(episode_values))
+                self.episode_rewards.add(episode_reward)
+                self.episode_lengths.add(episode_step_count)
+                self.episode_mean_values.add(np.mean(episode_values))
 
                 if len(episode_buffer) != 0 and FLAGS.train == True:
                     if episode_count % FLAGS.summary_interval == 0 and episode_count != 0:
-                        l, v_l, p_l, e_l, g_n, v_n, ms, img_sum = self.train(episode_buffer, sess, 0.0, summaries=True)
+                        l, v_l, p_l, e_l, g_n, v_n, ms, img_sum = self.train(
+                            episode_buffer, sess, 0.0, summaries=True, histograms=self.is_histogram_episode(episode_count))
                     else:
                         self.train(episode_buffer, sess, 0.0)
 
                 if not FLAGS.train and test_episode_count == FLAGS.nb_test_episodes - 1:
-                    print("Mean reward for the model is {}".format(np.mean(self.episode_rewards)))
+                    print("Mean reward for the model is {}".format(self.episode_rewards.total_mean))
                     return 1
 
+                if FLAGS.train and self.name == 'worker_0':
+                    phase_start = time.time()
+                    checkpoint_writer.maybe_save(sess, episode_count)
+                    self.timer.lap('Checkpoint', phase_start)
+
                 if FLAGS.train and episode_count % FLAGS.summary_interval == 0 and episode_count != 0 and \
                                 self.name == 'worker_0':
-                    if episode_count % FLAGS.checkpoint_interval == 0 and self.name == 'worker_0' and FLAGS.train == True:
-                        saver.save(sess, self.model_path + '/model-' + str(episode_count) + '.cptk',
-                                   global_step=self.global_episode)
-                        print("Saved Model at {}".format(self.model_path + '/model-' + str(episode_count) + '.cptk'))
+                    phase_start = time.time()
 
-                    mean_reward = np.mean(self.episode_rewards[-FLAGS.summary_interval:])
-                    mean_length = np.mean(self.episode_lengths[-FLAGS.summary_interval:])
-                    mean_value = np.mean(self.episode_mean_values[-FLAGS.summary_interval:])
+                    mean_reward = self.episode_rewards.mean()
+                    mean_length = self.episode_lengths.mean()
+                    mean_value = self.episode_mean_values.mean()
 
-                    self.summary.value.add(tag='Perf/Reward', simple_value=float(mean_reward))
-                    self.summary.value.add(tag='Perf/Length', simple_value=float(mean_length))
-                    self.summary.value.add(tag='Perf/Value', simple_value=float(mean_value))
+                    scalars = [('Perf/Reward', mean_reward),
+                               ('Perf/Length', mean_length),
+                               ('Perf/Value', mean_value)]
+                    summaries = []
 
                     if FLAGS.train:
-                        self.summary.value.add(tag='Losses/Total Loss', simple_value=float(l))
-                        self.summary.value.add(tag='Losses/Value Loss', simple_value=float(v_l))
-                        self.summary.value.add(tag='Losses/Policy Loss', simple_value=float(p_l))
-                        self.summary.value.add(tag='Losses/Entropy', simple_value=float(e_l))
-                        self.summary.value.add(tag='Losses/Grad Norm', simple_value=float(g_n))
-                        self.summary.value.add(tag='Losses/Var Norm', simple_value=float(v_n))
-                        summaries = tf.Summary().FromString(ms)
-                        sub_summaries_dict = {}
-                        for value in summaries.value:
-                            value_field = value.WhichOneof('value')
-                            value_ifo = sub_summaries_dict.setdefault(value.tag,
-                                                                      {'value_field': None, 'values': []})
-                            if not value_ifo['value_field']:
-                                value_ifo['value_field'] = value_field
-                            else:
-                                assert value_ifo['value_field'] == value_field
-                            value_ifo['values'].append(getattr(value, value_field))
-
-                        for name, value_ifo in sub_summaries_dict.items():
-                            summary_value = self.summary.value.add()
-                            summary_value.tag = name
-                            if value_ifo['value_field'] == 'histo':
-                                values = value_ifo['values']
-                                summary_value.histo.min = min([x.min for x in values])
-                                summary_value.histo.max = max([x.max for x in values])
-                                summary_value.histo.num = sum([x.num for x in values])
-                                summary_value.histo.sum = sum([x.sum for x in values])
-                                summary_value.histo.sum_squares = sum([x.sum_squares for x in values])
-                                for lim in values[0].bucket_limit:
-                                    summary_value.histo.bucket_limit.append(lim)
-                                for bucket in values[0].bucket:
-                                    summary_value.histo.bucket.append(bucket)
-                            else:
-                                print(
-                                    'Warning: could not aggregate summary of type {}'.format(value_ifo['value_field']))
-                    for s in img_sum:
-                        self.summary_writer.add_summary(s, episode_count)
-                    self.summary_writer.add_summary(self.summary, episode_count)
-
-                    self.summary_writer.flush()
+                        scalars += [('Losses/Total Loss', l),
+                                    ('Losses/Value Loss', v_l),
+                                    ('Losses/Policy Loss', p_l),
+                                    ('Losses/Entropy', e_l),
+                                    ('Losses/Grad Norm', g_n),
+                                    ('Losses/Var Norm', v_n)]
+                        if ms is not None:
+                            summaries.append(ms)
+                    # The histograms are merged and everything is written on the summary thread
+                    get_summary_writer().add(self.summary_dir, episode_count, scalars, summaries, img_sum)
+                    self.timer.lap('Summaries', phase_start)
+                if episode_count % FLAGS.summary_interval == 0 and episode_count != 0:
+                    self.timer.write_summaries(self.summary_dir, episode_count)
                 if self.name == 'worker_0':
                     sess.run(self.increment_global_episode)
                 if not FLAGS.train:
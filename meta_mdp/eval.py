@@ -15,18 +15,35 @@ FLAGS = tf.app.flags.FLAGS
 
 
 class PolicyMonitor(object):
-    def __init__(self, game, optimizer, global_step):
+    """Evaluates the global network through a policy_eval copy in the training graph, or the policy of an
+    InferenceGraph, then sess is the session of the inference graph."""
+
+    def __init__(self, game, optimizer=None, global_step=None, inference_graph=None):
         self.name = "policy_eval"
-        if FLAGS.use_conv:
-            self.local_AC = ConvNetwork(self.name, optimizer, global_step)
-        else:
-            self.local_AC = ACNetwork(self.name, optimizer, global_step)
-        self.update_local_ops = update_target_graph('global', self.name)
+        self.inference_graph = inference_graph
+        if inference_graph is None:
+            if FLAGS.use_conv:
+                self.local_AC = ConvNetwork(self.name, optimizer, global_step)
+            else:
+                self.local_AC = ACNetwork(self.name, optimizer, global_step)
+            self.signature = self.local_AC.inference_signature()
+            self.update_local_ops = update_target_graph('global', self.name)
         self.summary_writer = tf.summary.FileWriter(FLAGS.summaries_dir + "/policy_eval")
         self.env = game
         # self.actions = np.zeros([nb_actions])
         self.global_episode = global_step
 
+    def episode_count(self, sess):
+        if self.inference_graph is not None:
+            return self.inference_graph.episode_count
+        return sess.run(self.global_episode)
+
+    def run_policy(self, sess, outputs, inputs):
+        if self.inference_graph is not None:
+            return self.inference_graph.run(outputs, inputs)
+        return sess.run([self.signature['outputs'][name] for name in outputs],
+                        feed_dict={self.signature['inputs'][name]: value for name, value in inputs.items()})
+
     def eval_nb_test_episodes(self, sess):
         rewards = []
         for i in range(FLAGS.nb_test_episodes):
@@ -36,9 +53,10 @@ class PolicyMonitor(object):
 
     def eval_once(self, sess, summaries=True):
         with sess.as_default(), sess.graph.as_default():
-            # Copy params to local model
-            episode_count = sess.run(self.global_episode)
-            sess.run(self.update_local_ops)
+            episode_count = self.episode_count(sess)
+            if self.inference_graph is None:
+                # Copy params to local model
+                sess.run(self.update_local_ops)
 
             # Run an episode
             d = False
@@ -49,27 +67,24 @@ class PolicyMonitor(object):
             total_reward = 0.0
             episode_length = 0
 
-            rnn_state = self.local_AC.state_init
+            if self.inference_graph is not None:
+                rnn_state = [self.inference_graph.zero_state('state_in_0'),
+                             self.inference_graph.zero_state('state_in_1')]
+            else:
+                rnn_state = self.local_AC.state_init
 
             while not d:
+                inputs = {
+                    'inputs': [s],
+                    'state_in_0': rnn_state[0],
+                    'state_in_1': rnn_state[1]}
                 if FLAGS.meta:
-                    feed_dict = {
-                        self.local_AC.inputs: [s],
-                        self.local_AC.prev_rewards: [r],
-                        self.local_AC.timestep: [[t]],
-                        self.local_AC.prev_actions: [a],
-                        self.local_AC.state_in[0]: rnn_state[0],
-                        self.local_AC.state_in[1]: rnn_state[1]}
-                else:
-                    feed_dict = {
-                        self.local_AC.inputs: [s],
-                        self.local_AC.state_in[0]: rnn_state[0],
-                        self.local_AC.state_in[1]: rnn_state[1]}
-
-                pi, v, rnn_state_new = sess.run(
-                    [self.local_AC.policy, self.local_AC.value, self.local_AC.state_out], feed_dict=feed_dict)
-                a = np.random.choice(pi[0], p=pi[0])
-                a = np.argmax(pi == a)
+                    inputs.update(prev_rewards=[r], timestep=[[t]], prev_actions=[a])
+
+                a, v, state_0, state_1 = self.run_policy(
+                    sess, ['sampled_action', 'value', 'state_out_0', 'state_out_1'], inputs)
+                rnn_state_new = (state_0, state_1)
+                a = a[0]
 
                 rnn_state = rnn_state_new
                 s1, r, d, _ = self.env.step(a)
@@ -11,6 +11,7 @@ from network import ACNetwork, ConvNetwork
 import flags
 import multiprocessing
 from eval import PolicyMonitor
+from utils import load_inference_graph
 import os
 
 FLAGS = tf.app.flags.FLAGS
@@ -24,7 +25,25 @@ main_lock = Lock()
 #     FLAGS.lr = 10 ** np.random.uniform(np.log10(10**(-2)), np.log10((10**(-4))))
 #     FLAGS.gamma = np.random.uniform(0.8, 1.0)
 
+def make_monitor_env():
+    gym_env_monitor = gym.make(FLAGS.game)
+    if FLAGS.monitor:
+        gym_env_monitor = gym.wrappers.Monitor(gym_env_monitor,
+                                               os.path.join(FLAGS.test_experiments_dir, FLAGS.model_name),
+                                               force=True)
+    return gym_env_monitor
+
+
 def run():
+    if FLAGS.resume and FLAGS.inference_graph:
+        inference_graph = load_inference_graph(os.path.join(FLAGS.checkpoint_dir, FLAGS.model_name))
+        if inference_graph is not None:
+            # Only the exported policy is imported, the training graph is not built
+            print("Loading inference graph from {}".format(inference_graph.path))
+            pe = PolicyMonitor(game=make_monitor_env(), inference_graph=inference_graph)
+            pe.eval_nb_test_episodes(inference_graph.sess)
+            return
+
     tf.reset_default_graph()
 
     sess = tf.Session()
@@ -45,11 +64,7 @@ def run():
             else:
                 sess.run(tf.global_variables_initializer())
 
-            gym_env_monitor = gym.make(FLAGS.game)
-            if FLAGS.monitor:
-                gym_env_monitor = gym.wrappers.Monitor(gym_env_monitor,
-                                                       os.path.join(FLAGS.test_experiments_dir, FLAGS.model_name),
-                                                       force=True)
+            gym_env_monitor = make_monitor_env()
 
             pe = PolicyMonitor(
                 game=gym_env_monitor,
@@ -12,6 +12,11 @@ tf.app.flags.DEFINE_boolean('train', True,
                             """Whether to train or test""")
 tf.app.flags.DEFINE_boolean('show_training', False,
                             """Show windows with workers training""")
+tf.app.flags.DEFINE_integer('render_fps', 30, """Frames per second at which show_training renders the environments""")
+tf.app.flags.DEFINE_integer('report_secs', 60, """Seconds between steps per second reports, 0 to disable""")
+tf.app.flags.DEFINE_integer('trace_every', 0,
+                            """Trace an inference and a train run of the first worker every N updates, 0 to disable""")
+tf.app.flags.DEFINE_string('trace_dir', './traces', """Directory where to write the Chrome traces""")
 tf.app.flags.DEFINE_string('checkpoint_dir', './models',
                            """Directory where to save model checkpoints.""")
 tf.app.flags.DEFINE_string('summaries_dir', './summaries',
@@ -27,9 +32,17 @@ tf.app.flags.DEFINE_boolean('monitor', True,
 tf.app.flags.DEFINE_boolean('meta', True,
                             """Whether to use meta learning framwork or not""")
 tf.app.flags.DEFINE_integer('summary_interval', 1000, """Number of episodes of interval between summary saves""")
+tf.app.flags.DEFINE_integer('histogram_interval', 10,
+                            """Number of summary saves between fetches of the histogram and image summaries""")
+tf.app.flags.DEFINE_string('summaries_scope', 'worker_0',
+                           """Scope of the only network that builds histogram and image summaries""")
 tf.app.flags.DEFINE_integer('checkpoint_interval', 1000, """Number of episodes of interval between checkpoint saves""")
+tf.app.flags.DEFINE_integer('checkpoint_secs', 0,
+                            """Seconds between checkpoint saves, in addition to checkpoint_interval, 0 to disable""")
 tf.app.flags.DEFINE_integer('nb_actions', 4, """Number of actions to take""")
 tf.app.flags.DEFINE_integer('nb_concurrent', 4, """Number of concurrent threads""")
+tf.app.flags.DEFINE_integer('env_threads', 8,
+                            """Threads creating the environments at startup, 1 creates them one after another""")
 tf.app.flags.DEFINE_float('gamma', 0.95, """Gamma value""")
 tf.app.flags.DEFINE_float('lr', 1e-3, """Learning rate""")
 tf.app.flags.DEFINE_float('beta_v', 0.5, """Coefficient of value function loss""")
@@ -37,9 +50,17 @@ tf.app.flags.DEFINE_float('beta_e', 0.05, """Coefficient of entropy loss""")
 tf.app.flags.DEFINE_integer('max_nb_episodes_train', 90000, """Max number of episodes of training time""")
 tf.app.flags.DEFINE_float('gradient_clip_value', 50.0, """gradient_clip_value""")
 tf.app.flags.DEFINE_integer('nb_test_episodes', 15000000000, """Test episodes""")
+tf.app.flags.DEFINE_boolean('inference_graph', True,
+                            """Evaluate the inference graph exported with the latest checkpoint instead of the training graph""")
 tf.app.flags.DEFINE_boolean('gen_adv', True,
                             """Whether to use generalized advantage estimation""")
 tf.app.flags.DEFINE_boolean('fw', False,
                             """Whether to use fast weights""")
 tf.app.flags.DEFINE_boolean('use_conv', False, """use_conv""")
 tf.app.flags.DEFINE_boolean('one_hot_reward', True, """one_hot_reward""")
+tf.app.flags.DEFINE_string('microbench_baseline', './microbench_baseline.json',
+                           """File where the micro-benchmark baseline timings are saved""")
+tf.app.flags.DEFINE_boolean('save_baseline', False, """Save the micro-benchmark timings as the new baseline""")
+tf.app.flags.DEFINE_boolean('compare_baseline', False, """Compare the micro-benchmark timings to the saved baseline""")
+tf.app.flags.DEFINE_float('regression_tolerance', 0.1,
+                          """Relative slowdown over the baseline reported as a regression""")
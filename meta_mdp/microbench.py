@@ -0,0 +1,55 @@
+import sys
+
+import numpy as np
+import tensorflow as tf
+from fast_weights import LayerNormFastWeightsBasicRNNCell
+from utils import discount, run_microbenchmarks
+import flags
+
+FLAGS = tf.app.flags.FLAGS
+
+# Width of the features fed to the recurrent cell and length of the unrolled episodes
+INPUT_SIZE = 64
+UNROLL_LENGTH = 100
+
+
+def discount_kernels():
+    episode_rewards = np.random.randn(UNROLL_LENGTH + 1)
+    return [("discount_episode", lambda: discount(episode_rewards, FLAGS.gamma), 10000)]
+
+
+def fast_weights_kernels(sess):
+    # The cell as the network runs it, 48 units unrolled with dynamic_rnn from fed hidden state and fast weights
+    inputs = tf.placeholder(tf.float32, [1, None, INPUT_SIZE], name="inputs")
+    h_in = tf.placeholder(tf.float32, [1, 48], name="hidden_state")
+    fw_in = tf.placeholder(tf.float32, [1, 48, 48], name="fast_weights")
+    with tf.variable_scope("microbench"):
+        rnn_outputs, rnn_state = tf.nn.dynamic_rnn(
+            LayerNormFastWeightsBasicRNNCell(48), inputs, initial_state=(h_in, fw_in),
+            sequence_length=tf.shape(inputs)[1:2], time_major=False)
+        gradients = tf.gradients(tf.reduce_sum(rnn_outputs), tf.trainable_variables())
+    sess.run(tf.global_variables_initializer())
+
+    def feed_dict(nb_steps):
+        return {inputs: np.random.randn(1, nb_steps, INPUT_SIZE),
+                h_in: np.zeros((1, 48), np.float32),
+                fw_in: np.zeros((1, 48, 48), np.float32)}
+
+    step_feed_dict, unroll_feed_dict = feed_dict(1), feed_dict(UNROLL_LENGTH)
+    return [("fast_weights_step", lambda: sess.run([rnn_outputs, rnn_state], feed_dict=step_feed_dict), 500),
+            ("fast_weights_unroll", lambda: sess.run([rnn_outputs, rnn_state], feed_dict=unroll_feed_dict), 20),
+            ("fast_weights_unroll_gradients", lambda: sess.run(gradients, feed_dict=unroll_feed_dict), 20)]
+
+
+def run():
+    with tf.Graph().as_default(), tf.device("/cpu:0"), tf.Session() as sess:
+        kernels = discount_kernels() + fast_weights_kernels(sess)
+        regressions = run_microbenchmarks(kernels, FLAGS.microbench_baseline, FLAGS.save_baseline,
+                                          FLAGS.compare_baseline, FLAGS.regression_tolerance)
+    if regressions:
+        print("Regressions: {}".format(", ".join(regressions)))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    run()
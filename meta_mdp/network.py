@@ -12,21 +12,25 @@ FLAGS = tf.app.flags.FLAGS
 
 class ACNetwork():
     def __init__(self, scope, trainer, global_step=None):
+        # Only the summaries_scope network writes histograms and images, the other scopes skip building their ops
+        self.build_summaries = scope == FLAGS.summaries_scope
+        self.activation_summaries = []
         with tf.variable_scope(scope):
             self.inputs = tf.placeholder(shape=[None, FLAGS.game_size, FLAGS.game_size, FLAGS.game_channels],
                                          dtype=tf.float32, name="Inputs")
 
             self.image_summaries = []
-            with tf.variable_scope('inputs'):
-                tf.get_variable_scope().reuse_variables()
-                self.image_summaries.append(
-                    tf.summary.image('input', self.inputs, max_outputs=1))
+            if self.build_summaries:
+                with tf.variable_scope('inputs'):
+                    tf.get_variable_scope().reuse_variables()
+                    self.image_summaries.append(
+                        tf.summary.image('input', self.inputs, max_outputs=1))
 
             self.conv = tf.contrib.layers.fully_connected(tf.contrib.layers.flatten(self.inputs), 64)
             self.conv = tf.contrib.layers.layer_norm(self.conv)
             self.conv = tf.nn.elu(self.conv)
 
-            summary_conv_act = tf.contrib.layers.summarize_activation(self.conv)
+            self.summarize_activation(self.conv)
 
             if FLAGS.meta:
                 self.timestep = tf.placeholder(shape=[None, 1], dtype=tf.float32, name="timestep")
@@ -45,7 +49,7 @@ class ACNetwork():
             else:
                 hidden = self.conv
 
-            summary_hidden_act = tf.contrib.layers.summarize_activation(hidden)
+            self.summarize_activation(hidden)
 
             rnn_in = tf.expand_dims(hidden, [0], name="RNN_input")
             step_size = tf.shape(self.inputs)[:1]
@@ -85,19 +89,22 @@ class ACNetwork():
                 self.state_out = (lstm_c[:1, :], lstm_h[:1, :])
                 rnn_out = tf.reshape(lstm_outputs, [-1, 48], name="RNN_out")
 
-            summary_rnn_act = tf.contrib.layers.summarize_activation(rnn_out)
+            self.summarize_activation(rnn_out)
 
             fc_pol_w = tf.get_variable("FC_Pol_W", shape=[48, FLAGS.nb_actions],
                                        initializer=normalized_columns_initializer(0.01))
-            self.policy = tf.nn.softmax(tf.matmul(rnn_out, fc_pol_w, name="Policy"), name="Policy_soft")
+            policy_logits = tf.matmul(rnn_out, fc_pol_w, name="Policy")
+            self.policy = tf.nn.softmax(policy_logits, name="Policy_soft")
+            # Actions are sampled in the graph, fetched in the same run as the policy
+            self.sampled_action = tf.squeeze(tf.multinomial(policy_logits, 1), [1], name="sampled_action")
 
-            summary_policy_act = tf.contrib.layers.summarize_activation(self.policy)
+            self.summarize_activation(self.policy)
 
             fc_value_w = tf.get_variable("FC_Value_W", shape=[48, 1],
                                          initializer=normalized_columns_initializer(1.0))
             self.value = tf.matmul(rnn_out, fc_value_w, name="Value")
 
-            summary_value_act = tf.contrib.layers.summarize_activation(self.value)
+            self.summarize_activation(self.value)
 
             if scope != 'global':
                 self.actions = tf.placeholder(shape=[None], dtype=tf.int32, name="Actions")
@@ -130,19 +137,36 @@ class ACNetwork():
                 self.var_norms = tf.global_norm(local_vars)
                 grads, self.grad_norms = tf.clip_by_global_norm(self.gradients, FLAGS.gradient_clip_value)
 
-                self.worker_summaries = [summary_conv_act, summary_hidden_act, summary_rnn_act, summary_policy_act,
-                                         summary_value_act]
-                for grad, weight in zip(grads, local_vars):
-                    self.worker_summaries.append(tf.summary.histogram(weight.name + '_grad', grad))
-                    self.worker_summaries.append(tf.summary.histogram(weight.name, weight))
+                self.merged_summary = None
+                if self.build_summaries:
+                    self.worker_summaries = self.activation_summaries
+                    for grad, weight in zip(grads, local_vars):
+                        self.worker_summaries.append(tf.summary.histogram(weight.name + '_grad', grad))
+                        self.worker_summaries.append(tf.summary.histogram(weight.name, weight))
 
-                self.merged_summary = tf.summary.merge(self.worker_summaries)
+                    self.merged_summary = tf.summary.merge(self.worker_summaries)
 
                 global_vars = tf.get_collection(tf.GraphKeys.TRAINABLE_VARIABLES, 'global')
                 self.apply_grads = trainer.apply_gradients(zip(grads, global_vars))
 
+    def inference_signature(self):
+        # What evaluation feeds and fetches, exported with the checkpoints of the global network
+        inputs = {'inputs': self.inputs, 'state_in_0': self.state_in[0], 'state_in_1': self.state_in[1]}
+        if FLAGS.meta:
+            inputs.update(prev_rewards=self.prev_rewards, timestep=self.timestep, prev_actions=self.prev_actions)
+        return {'inputs': inputs,
+                'outputs': {'policy': self.policy, 'sampled_action': self.sampled_action, 'value': self.value,
+                            'state_out_0': self.state_out[0], 'state_out_1': self.state_out[1]}}
+
+    def summarize_activation(self, tensor):
+        if self.build_summaries:
+            self.activation_summaries.append(tf.contrib.layers.summarize_activation(tensor))
+
 class ConvNetwork():
     def __init__(self, scope, trainer, global_step=None):
+        # Only the summaries_scope network writes histograms and images, the other scopes skip building their ops
+        self.build_summaries = scope == FLAGS.summaries_scope
+        self.activation_summaries = []
         with tf.variable_scope(scope):
             self.inputs = tf.placeholder(shape=[None, FLAGS.game_size, FLAGS.game_size, FLAGS.game_channels],
                                          dtype=tf.float32, name="Inputs")
@@ -151,24 +175,24 @@ class ConvNetwork():
                 self.inputs, 32, 5, 2, activation_fn=tf.nn.elu, scope="conv1")
 
             self.image_summaries = []
-            with tf.variable_scope('conv1'):
-                tf.get_variable_scope().reuse_variables()
-                weights = tf.get_variable('weights')
-                grid = self.put_kernels_on_grid(weights)
-                self.image_summaries.append(
-                    tf.summary.image('kernels', grid, max_outputs=1))
-
-
-            with tf.variable_scope('inputs'):
-                tf.get_variable_scope().reuse_variables()
-                self.image_summaries.append(
-                    tf.summary.image('input', self.inputs, max_outputs=1))
+            if self.build_summaries:
+                with tf.variable_scope('conv1'):
+                    tf.get_variable_scope().reuse_variables()
+                    weights = tf.get_variable('weights')
+                    grid = self.put_kernels_on_grid(weights)
+                    self.image_summaries.append(
+                        tf.summary.image('kernels', grid, max_outputs=1))
+
+                with tf.variable_scope('inputs'):
+                    tf.get_variable_scope().reuse_variables()
+                    self.image_summaries.append(
+                        tf.summary.image('input', self.inputs, max_outputs=1))
 
             self.fc = tf.contrib.layers.fully_connected(tf.contrib.layers.flatten(self.conv), 64)
             # self.conv = tf.contrib.layers.layer_norm(self.conv)
             self.elu = tf.nn.elu(self.fc)
 
-            summary_conv_act = tf.contrib.layers.summarize_activation(self.elu)
+            self.summarize_activation(self.elu)
 
             if FLAGS.meta:
                 self.timestep = tf.placeholder(shape=[None, 1], dtype=tf.float32, name="timestep")
@@ -187,7 +211,7 @@ class ConvNetwork():
             else:
                 hidden = self.elu
 
-            summary_hidden_act = tf.contrib.layers.summarize_activation(hidden)
+            self.summarize_activation(hidden)
 
             rnn_in = tf.expand_dims(hidden, [0], name="RNN_input")
             step_size = tf.shape(self.inputs)[:1]
@@ -227,19 +251,22 @@ class ConvNetwork():
                 self.state_out = (lstm_c[:1, :], lstm_h[:1, :])
                 rnn_out = tf.reshape(lstm_outputs, [-1, 48], name="RNN_out")
 
-            summary_rnn_act = tf.contrib.layers.summarize_activation(rnn_out)
+            self.summarize_activation(rnn_out)
 
             fc_pol_w = tf.get_variable("FC_Pol_W", shape=[48, FLAGS.nb_actions],
                                        initializer=normalized_columns_initializer(0.01))
-            self.policy = tf.nn.softmax(tf.matmul(rnn_out, fc_pol_w, name="Policy"), name="Policy_soft")
+            policy_logits = tf.matmul(rnn_out, fc_pol_w, name="Policy")
+            self.policy = tf.nn.softmax(policy_logits, name="Policy_soft")
+            # Actions are sampled in the graph, fetched in the same run as the policy
+            self.sampled_action = tf.squeeze(tf.multinomial(policy_logits, 1), [1], name="sampled_action")
 
-            summary_policy_act = tf.contrib.layers.summarize_activation(self.policy)
+            self.summarize_activation(self.policy)
 
             fc_value_w = tf.get_variable("FC_Value_W", shape=[48, 1],
                                          initializer=normalized_columns_initializer(1.0))
             self.value = tf.matmul(rnn_out, fc_value_w, name="Value")
 
-            summary_value_act = tf.contrib.layers.summarize_activation(self.value)
+            self.summarize_activation(self.value)
 
             if scope != 'global':
                 self.actions = tf.placeholder(shape=[None], dtype=tf.int32, name="Actions")
@@ -272,17 +299,31 @@ class ConvNetwork():
                 self.var_norms = tf.global_norm(local_vars)
                 grads, self.grad_norms = tf.clip_by_global_norm(self.gradients, FLAGS.gradient_clip_value)
 
-                self.worker_summaries = [summary_conv_act, summary_hidden_act, summary_rnn_act, summary_policy_act,
-                                         summary_value_act]
-                for grad, weight in zip(grads, local_vars):
-                    self.worker_summaries.append(tf.summary.histogram(weight.name + '_grad', grad))
-                    self.worker_summaries.append(tf.summary.histogram(weight.name, weight))
+                self.merged_summary = None
+                if self.build_summaries:
+                    self.worker_summaries = self.activation_summaries
+                    for grad, weight in zip(grads, local_vars):
+                        self.worker_summaries.append(tf.summary.histogram(weight.name + '_grad', grad))
+                        self.worker_summaries.append(tf.summary.histogram(weight.name, weight))
 
-                self.merged_summary = tf.summary.merge(self.worker_summaries)
+                    self.merged_summary = tf.summary.merge(self.worker_summaries)
 
                 global_vars = tf.get_collection(tf.GraphKeys.TRAINABLE_VARIABLES, 'global')
                 self.apply_grads = trainer.apply_gradients(zip(grads, global_vars))
 
+    def inference_signature(self):
+        # What evaluation feeds and fetches, exported with the checkpoints of the global network
+        inputs = {'inputs': self.inputs, 'state_in_0': self.state_in[0], 'state_in_1': self.state_in[1]}
+        if FLAGS.meta:
+            inputs.update(prev_rewards=self.prev_rewards, timestep=self.timestep, prev_actions=self.prev_actions)
+        return {'inputs': inputs,
+                'outputs': {'policy': self.policy, 'sampled_action': self.sampled_action, 'value': self.value,
+                            'state_out_0': self.state_out[0], 'state_out_1': self.state_out[1]}}
+
+    def summarize_activation(self, tensor):
+        if self.build_summaries:
+            self.activation_summaries.append(tf.contrib.layers.summarize_activation(tensor))
+
     def put_kernels_on_grid(self, kernel, pad=1):
 
         '''Visualize conv. features as an image (mostly for the 1st layer).
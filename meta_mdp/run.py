@@ -1,4 +1,5 @@
 import threading
+import time
 
 import tensorflow as tf
 import random
@@ -9,6 +10,7 @@ import gym_fast_envs
 from agent import Agent
 from network import ACNetwork, ConvNetwork
 import flags
+from utils import CheckpointWriter, TrainingSupervisor, checkpoint_variables, restore_checkpoint, start_env_creation
 import multiprocessing
 import os
 FLAGS = tf.app.flags.FLAGS
@@ -40,7 +42,23 @@ def recreate_directory_structure():
 #     FLAGS.lr = 10 ** np.random.uniform(np.log10(10**(-2)), np.log10((10**(-4))))
 #     FLAGS.gamma = np.random.uniform(0.8, 1.0)
 
+def make_env(i):
+    gym_env = gym.make(FLAGS.game)
+    # if FLAGS.monitor:
+    #     gym_env = gym.wrappers.Monitor(gym_env, FLAGS.experiments_dir + '/worker_{}'.format(i), force=True)
+    return gym_env
+
+
+def render_envs(envs):
+    def render():
+        for env in envs:
+            env.render()
+
+    return render
+
+
 def run():
+    start_time = time.time()
     recreate_directory_structure()
     tf.reset_default_graph()
 
@@ -51,6 +69,8 @@ def run():
         with tf.device("/cpu:0"):
             global_step = tf.Variable(0, dtype=tf.int32, name='global_episodes', trainable=False)
             optimizer = tf.train.AdamOptimizer(learning_rate=FLAGS.lr)
+            # The environments are created on a thread pool while the graph is built
+            env_futures = start_env_creation(make_env, FLAGS.nb_concurrent, FLAGS.env_threads)
             if FLAGS.use_conv:
                 global_network = ConvNetwork('global', None)
             else:
@@ -59,40 +79,34 @@ def run():
             # num_agents = multiprocessing.cpu_count()
             num_agents = FLAGS.nb_concurrent
             agents = []
-            envs = []
-
-            for i in range(num_agents):
-                gym_env = gym.make(FLAGS.game)
-                # if FLAGS.monitor:
-                #     gym_env = gym.wrappers.Monitor(gym_env, FLAGS.experiments_dir + '/worker_{}'.format(i), force=True)
-                envs.append(gym_env)
 
             for i in range(num_agents):
-                agents.append(Agent(envs[i], i, optimizer, global_step))
-            saver = tf.train.Saver(max_to_keep=5)
+                agents.append(Agent(env_futures[i].result(), i, optimizer, global_step))
+            envs = [future.result() for future in env_futures]
+            # Checkpoints hold the global network only, the agent copies are rebuilt from it on restore
+            checkpoint_vars = checkpoint_variables([agent.name for agent in agents])
+            saver = tf.train.Saver(checkpoint_vars, max_to_keep=5)
+            checkpoint_writer = CheckpointWriter(os.path.join(FLAGS.checkpoint_dir, FLAGS.model_name),
+                                                 FLAGS.checkpoint_interval, FLAGS.checkpoint_secs,
+                                                 var_list=checkpoint_vars,
+                                                 inference_signature=global_network.inference_signature())
 
         coord = tf.train.Coordinator()
         if FLAGS.resume:
-            ckpt = tf.train.get_checkpoint_state(os.path.join(FLAGS.checkpoint_dir, FLAGS.model_name))
-            print("Loading Model from {}".format(ckpt.model_checkpoint_path))
-            saver.restore(sess, ckpt.model_checkpoint_path)
+            restore_checkpoint(sess, saver, os.path.join(FLAGS.checkpoint_dir, FLAGS.model_name),
+                               [agent.update_local_vars for agent in agents])
         else:
             sess.run(tf.global_variables_initializer())
+        checkpoint_writer.start()
+        print("Started {} agents in {:.1f} seconds".format(len(agents), time.time() - start_time))
 
-        agent_threads = []
+        supervisor = TrainingSupervisor(sess, coord, checkpoint_writer, global_step,
+                                        lambda: sum(agent.total_steps for agent in agents),
+                                        render=render_envs(envs) if FLAGS.show_training else None,
+                                        render_fps=FLAGS.render_fps, report_secs=FLAGS.report_secs)
         for agent in agents:
-            thread = threading.Thread(target=(lambda: agent.play(sess, coord, saver)))
-            thread.start()
-            agent_threads.append(thread)
-
-        while True:
-            if FLAGS.show_training:
-                for env in envs:
-                    # time.sleep(1)
-                    # with main_lock:
-                    env.render()
-
-        coord.join(agent_threads)
+            supervisor.start_thread(agent.name, agent.play, sess, coord, checkpoint_writer)
+        supervisor.run(save_checkpoint=FLAGS.train)
 
 
 if __name__ == '__main__':
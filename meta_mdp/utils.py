@@ -1,7 +1,16 @@
+import json
+import os
+import queue
+import signal
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
 from math import floor
+from threading import Thread, Event, Lock
 
 import numpy as np
 import tensorflow as tf
+from tensorflow.python.client import timeline
 from PIL import Image
 from PIL import ImageDraw
 from PIL import ImageFont
@@ -23,6 +32,553 @@ def discount(x, gamma):
     return lfilter([1], [1, -gamma], x[::-1], axis=0)[::-1]
 
 
+class RolloutBuffer():
+    """Transitions of one update stored column by column in preallocated typed arrays that are reused after clear().
+    A column is allocated on its first add from the shape of the value, reading a column returns a view of the
+    filled rows."""
+
+    def __init__(self, capacity, dtypes):
+        self.capacity = capacity
+        self.dtypes = dtypes
+        self.columns = {}
+        self.size = 0
+
+    def add(self, **transition):
+        if self.size == self.capacity:
+            self.grow()
+        for name, value in transition.items():
+            if name not in self.columns:
+                self.columns[name] = np.zeros((self.capacity,) + np.shape(value), dtype=self.dtypes[name])
+            self.columns[name][self.size] = value
+        self.size += 1
+
+    def grow(self):
+        for name, column in self.columns.items():
+            self.columns[name] = np.concatenate([column, np.zeros_like(column)], axis=0)
+        self.capacity *= 2
+
+    def clear(self):
+        self.size = 0
+
+    def __getitem__(self, name):
+        return self.columns[name][:self.size]
+
+    def __len__(self):
+        return self.size
+
+
+class WindowedStat():
+    """Mean of the last window values of a stream, kept in a fixed ring buffer with a running sum so that adding a
+    value and reading the mean are O(1). The mean and variance of every value since the start are kept with Welford's
+    update, so memory stays flat however long the run."""
+
+    def __init__(self, window):
+        self.values = np.zeros(window, dtype=np.float64)
+        self.index = 0
+        self.size = 0
+        self.window_sum = 0.0
+        self.count = 0
+        self.total_mean = 0.0
+        self.total_m2 = 0.0
+
+    def add(self, value):
+        value = float(value)
+        if self.size == len(self.values):
+            self.window_sum -= self.values[self.index]
+        else:
+            self.size += 1
+        self.values[self.index] = value
+        self.window_sum += value
+        self.index = (self.index + 1) % len(self.values)
+        if self.index == 0:
+            # Resumming once per window keeps the rounding errors of the running sum from accumulating
+            self.window_sum = float(np.sum(self.values[:self.size]))
+
+        self.count += 1
+        delta = value - self.total_mean
+        self.total_mean += delta / self.count
+        self.total_m2 += delta * (value - self.total_mean)
+
+    def mean(self):
+        return self.window_sum / self.size if self.size else float('nan')
+
+    def total_variance(self):
+        return self.total_m2 / self.count if self.count else float('nan')
+
+    def __len__(self):
+        return self.count
+
+
+def start_env_creation(make_env, nb_envs, nb_threads):
+    """Starts creating nb_envs environments with make_env(i) on nb_threads threads and returns their futures, in
+    order. Loading the games is native code and disk reads, so the graph can be built meanwhile."""
+    pool = ThreadPoolExecutor(max_workers=max(nb_threads, 1))
+    futures = [pool.submit(make_env, i) for i in range(nb_envs)]
+    pool.shutdown(wait=False)
+    return futures
+
+
+def checkpoint_variables(local_scopes):
+    """The variables a checkpoint needs to resume training: the global network, the optimizer state and the counters.
+    The trainable variables of the local network copies and the local variables are left out, restore_checkpoint
+    rebuilds them from the global network."""
+    local_vars = set(tf.get_collection(tf.GraphKeys.LOCAL_VARIABLES))
+    for scope in local_scopes:
+        local_vars.update(tf.get_collection(tf.GraphKeys.TRAINABLE_VARIABLES, scope))
+    return [var for var in tf.global_variables() if var not in local_vars]
+
+
+def restore_checkpoint(sess, saver, checkpoint_dir, sync_ops):
+    """Restores the latest checkpoint of checkpoint_dir. Everything outside of the checkpoint is initialized first,
+    the local network copies are then loaded from the restored global network with sync_ops."""
+    ckpt = tf.train.get_checkpoint_state(checkpoint_dir)
+    print("Loading Model from {}".format(ckpt.model_checkpoint_path))
+    sess.run(tf.global_variables_initializer())
+    saver.restore(sess, ckpt.model_checkpoint_path)
+    sess.run(sync_ops)
+
+
+class PhaseTimer():
+    """Wall time a loop spends in each of its phases. lap(phase, start) charges the time since start to phase and
+    returns the current time, so consecutive phases are timed with a single clock read each."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.totals = OrderedDict()
+        self.nb_steps = 0
+        self.start_time = time.time()
+
+    def lap(self, phase, start):
+        now = time.time()
+        self.totals[phase] = self.totals.get(phase, 0.0) + now - start
+        return now
+
+    def move(self, from_phase, to_phase, seconds):
+        self.totals[from_phase] = self.totals.get(from_phase, 0.0) - seconds
+        self.totals[to_phase] = self.totals.get(to_phase, 0.0) + seconds
+
+    def add_steps(self, nb_steps):
+        self.nb_steps += nb_steps
+
+    def report(self):
+        """Fraction of the wall time spent in every phase, untimed code included as Other, and the steps per second
+        since the last report. A new measurement period starts."""
+        elapsed = max(time.time() - self.start_time, 1e-6)
+        fractions = OrderedDict((phase, total / elapsed) for phase, total in self.totals.items())
+        fractions['Other'] = max(1.0 - sum(fractions.values()), 0.0)
+        steps_per_second = self.nb_steps / elapsed
+        self.reset()
+        return fractions, steps_per_second
+
+    def write_summaries(self, logdir, step):
+        fractions, steps_per_second = self.report()
+        scalars = [('Timing/' + phase, fraction) for phase, fraction in fractions.items()]
+        scalars.append(('Timing/Steps per second', steps_per_second))
+        get_summary_writer().add(logdir, step, scalars)
+
+
+class StepTracer():
+    """Every trace_every updates, the next sess.run of each kind (inference, train, ...) is run once with a
+    FULL_TRACE. The run metadata is written to logdir by the SummaryWriter, TensorBoard shows it on the graph tab, and
+    the step stats are dumped as a Chrome trace to trace_dir, to be opened at chrome://tracing."""
+
+    def __init__(self, name, logdir, trace_every, trace_dir):
+        self.name = name
+        self.logdir = logdir
+        self.trace_every = trace_every
+        self.trace_dir = trace_dir
+        self.nb_updates = 0
+        # Kinds already traced in the current round, None until the first round starts
+        self.traced = None
+        if trace_every and not tf.gfile.Exists(trace_dir):
+            tf.gfile.MakeDirs(trace_dir)
+
+    def count_update(self):
+        self.nb_updates += 1
+        if self.trace_every and self.nb_updates % self.trace_every == 0:
+            self.traced = set()
+
+    def run(self, kind, sess, fetches, feed_dict=None):
+        if self.traced is None or kind in self.traced:
+            return sess.run(fetches, feed_dict=feed_dict)
+        self.traced.add(kind)
+
+        run_metadata = tf.RunMetadata()
+        result = sess.run(fetches, feed_dict=feed_dict, run_metadata=run_metadata,
+                          options=tf.RunOptions(trace_level=tf.RunOptions.FULL_TRACE))
+        tag = "{}_{}_{}".format(self.name, kind, self.nb_updates)
+        get_summary_writer().add(self.logdir, self.nb_updates, [], run_metadata=(tag, run_metadata))
+        trace = timeline.Timeline(run_metadata.step_stats).generate_chrome_trace_format()
+        with open(os.path.join(self.trace_dir, tag + '.json'), 'w') as f:
+            f.write(trace)
+        return result
+
+
+class CheckpointWriter(Thread):
+    """Writes checkpoints on a background thread. A checkpoint first copies var_list, every variable by default, into
+    an in-graph snapshot, which is all the training thread waits for, the snapshot is then saved under the original
+    variable names so the checkpoints restore with a plain tf.train.Saver. Checkpoints are due every
+    checkpoint_interval episodes and/or every checkpoint_secs seconds. With an inference_signature,
+    {'inputs': {name: tensor}, 'outputs': {name: tensor}}, every checkpoint is also exported as a frozen graph of the
+    ops between those inputs and outputs only, see InferenceGraph."""
+
+    def __init__(self, model_path, checkpoint_interval, checkpoint_secs=0, max_to_keep=5, var_list=None,
+                 inference_signature=None):
+        super(CheckpointWriter, self).__init__(name="CheckpointWriter")
+        self.setDaemon(True)
+        self.model_path = model_path
+        self.checkpoint_interval = checkpoint_interval
+        self.checkpoint_secs = checkpoint_secs
+
+        if var_list is None:
+            var_list = tf.global_variables()
+        with tf.name_scope("checkpoint_snapshot"):
+            # Kept out of the collections so the snapshot is neither saved nor initialized with the model
+            snapshots = [tf.Variable(tf.zeros(var.get_shape(), dtype=var.dtype.base_dtype), trainable=False,
+                                     collections=[]) for var in var_list]
+            self.take_snapshot = tf.group(*[snapshot.assign(var) for snapshot, var in zip(snapshots, var_list)])
+        self.saver = tf.train.Saver({var.op.name: snapshot for var, snapshot in zip(var_list, snapshots)},
+                                    max_to_keep=max_to_keep)
+
+        self.inference_signature = None
+        if inference_signature is not None:
+            self.inference_signature = {kind: {name: tensor.name for name, tensor in tensors.items()}
+                                        for kind, tensors in inference_signature.items()}
+            # The graph is cut once, only the variables it reads are frozen from the snapshot on every export
+            self.inference_graph_def = tf.graph_util.extract_sub_graph(
+                tf.get_default_graph().as_graph_def(),
+                [tensor.op.name for tensor in inference_signature['outputs'].values()])
+            snapshot_by_name = {var.op.name: snapshot for var, snapshot in zip(var_list, snapshots)}
+            self.inference_snapshots = OrderedDict()
+            for node in self.inference_graph_def.node:
+                if node.op in ('Variable', 'VariableV2'):
+                    if node.name not in snapshot_by_name:
+                        raise ValueError("Variable {} of the inference graph is not in var_list".format(node.name))
+                    self.inference_snapshots[node.name] = snapshot_by_name[node.name]
+
+        self.jobs = queue.Queue()
+        self.idle = Event()
+        self.idle.set()
+        self.last_save_time = time.time()
+        # Only the recent block times are reported, a long run would otherwise keep one per checkpoint
+        self.block_times = deque(maxlen=100)
+
+    def is_due(self, episode_count):
+        if self.checkpoint_interval and episode_count % self.checkpoint_interval == 0 and episode_count != 0:
+            return True
+        return self.checkpoint_secs > 0 and time.time() - self.last_save_time >= self.checkpoint_secs
+
+    def maybe_save(self, sess, episode_count):
+        if self.is_due(episode_count):
+            return self.save(sess, episode_count)
+        return False
+
+    def save(self, sess, episode_count):
+        # The snapshot is reused, a checkpoint that comes while the previous one is still written is skipped
+        if not self.idle.is_set():
+            return False
+        self.idle.clear()
+        start_time = time.time()
+        sess.run(self.take_snapshot)
+        block_time = time.time() - start_time
+        self.block_times.append(block_time)
+        self.last_save_time = time.time()
+        self.jobs.put((sess, episode_count, block_time))
+        return True
+
+    def wait(self):
+        self.idle.wait()
+
+    def run(self):
+        while True:
+            sess, episode_count, block_time = self.jobs.get()
+            path = self.model_path + '/model-' + str(episode_count) + '.cptk'
+            save_path = self.saver.save(sess, path, global_step=episode_count)
+            if self.inference_signature is not None:
+                self.export_inference_graph(sess, save_path, episode_count)
+            print("Saved Model at {}, training blocked for {:.1f} ms".format(path, block_time * 1000))
+            self.idle.set()
+
+    def export_inference_graph(self, sess, save_path, episode_count):
+        # The variables are frozen from the snapshot the checkpoint was saved from
+        values = sess.run(list(self.inference_snapshots.values()))
+        graph_def = freeze_graph_def(self.inference_graph_def, dict(zip(self.inference_snapshots.keys(), values)))
+        with tf.gfile.GFile(save_path + '.inference.pb', 'wb') as f:
+            f.write(graph_def.SerializeToString())
+        # The signature is written last, loaders only pick up complete exports
+        signature = dict(self.inference_signature, episode_count=episode_count)
+        with tf.gfile.GFile(save_path + '.inference.json', 'w') as f:
+            json.dump(signature, f)
+
+        # The exports are rotated with the checkpoints the saver keeps
+        for exported in tf.gfile.Glob(self.model_path + '/*.inference.pb'):
+            checkpoint_path = exported[:-len('.inference.pb')]
+            if checkpoint_path not in self.saver.last_checkpoints:
+                for extension in ('.inference.json', '.inference.pb'):
+                    if tf.gfile.Exists(checkpoint_path + extension):
+                        tf.gfile.Remove(checkpoint_path + extension)
+
+
+def freeze_graph_def(graph_def, variable_values):
+    """Copy of graph_def where the variables of variable_values, a dict from variable op names to arrays, are
+    constants."""
+    frozen = tf.GraphDef()
+    frozen.versions.CopyFrom(graph_def.versions)
+    frozen.library.CopyFrom(graph_def.library)
+    for node in graph_def.node:
+        frozen_node = frozen.node.add()
+        if node.name not in variable_values:
+            frozen_node.CopyFrom(node)
+            continue
+        frozen_node.op = 'Const'
+        frozen_node.name = node.name
+        frozen_node.device = node.device
+        frozen_node.attr['dtype'].CopyFrom(node.attr['dtype'])
+        frozen_node.attr['value'].CopyFrom(tf.AttrValue(
+            tensor=tf.make_tensor_proto(variable_values[node.name], dtype=node.attr['dtype'].type)))
+    return frozen
+
+
+class InferenceGraph():
+    """The policy exported with a checkpoint by CheckpointWriter, imported in its own graph and session without the
+    optimizer, gradients and summaries of the training graph. inputs and outputs map the names of the signature to
+    the tensors of the imported graph."""
+
+    def __init__(self, path):
+        with tf.gfile.GFile(path + '.json') as f:
+            signature = json.load(f)
+        graph_def = tf.GraphDef()
+        with tf.gfile.GFile(path + '.pb', 'rb') as f:
+            graph_def.ParseFromString(f.read())
+
+        self.path = path
+        self.episode_count = signature['episode_count']
+        self.graph = tf.Graph()
+        with self.graph.as_default():
+            tf.import_graph_def(graph_def, name='')
+        self.graph.finalize()
+        self.sess = tf.Session(graph=self.graph)
+        self.inputs = {name: self.graph.get_tensor_by_name(tensor) for name, tensor in signature['inputs'].items()}
+        self.outputs = {name: self.graph.get_tensor_by_name(tensor) for name, tensor in signature['outputs'].items()}
+
+    def zero_state(self, name):
+        return np.zeros(self.inputs[name].get_shape().as_list(), self.inputs[name].dtype.as_numpy_dtype)
+
+    def run(self, outputs, inputs):
+        return self.sess.run([self.outputs[name] for name in outputs],
+                             feed_dict={self.inputs[name]: value for name, value in inputs.items()})
+
+    def close(self):
+        self.sess.close()
+
+
+def load_inference_graph(checkpoint_dir):
+    """The InferenceGraph exported with the latest checkpoint of checkpoint_dir, None when it has none."""
+    ckpt = tf.train.get_checkpoint_state(checkpoint_dir)
+    if ckpt is None or not tf.gfile.Exists(ckpt.model_checkpoint_path + '.inference.json'):
+        return None
+    return InferenceGraph(ckpt.model_checkpoint_path + '.inference')
+
+
+def merge_summaries(summary, serialized_summaries):
+    """Adds the values of the serialized summaries to summary, the histograms that share a tag are merged into one."""
+    values_by_tag = OrderedDict()
+    for serialized in serialized_summaries:
+        for value in tf.Summary.FromString(serialized).value:
+            values_by_tag.setdefault(value.tag, []).append(value)
+
+    for tag, values in values_by_tag.items():
+        value_field = values[0].WhichOneof('value')
+        if len(values) > 1 and value_field != 'histo':
+            print('Warning: could not aggregate summary of type {}'.format(value_field))
+            continue
+        merged = summary.value.add()
+        merged.CopyFrom(values[0])
+        if len(values) == 1:
+            continue
+        histos = [value.histo for value in values]
+        merged.histo.min = min(histo.min for histo in histos)
+        merged.histo.max = max(histo.max for histo in histos)
+        merged.histo.num, merged.histo.sum, merged.histo.sum_squares = \
+            np.sum([[histo.num, histo.sum, histo.sum_squares] for histo in histos], axis=0)
+        # Histograms of the same op share their bucket limits, their counts add up bucket by bucket
+        if all(list(histo.bucket_limit) == list(histos[0].bucket_limit) for histo in histos):
+            del merged.histo.bucket[:]
+            merged.histo.bucket.extend(np.sum([list(histo.bucket) for histo in histos], axis=0).tolist())
+
+
+class SummaryWriter(Thread):
+    """Writes the summaries of all agents on a background thread. Agents hand over their scalars and the serialized
+    summaries they fetched and go on, the summaries are merged into one event per step and the event files flushed
+    here. There is one FileWriter per log directory, shared by everything that logs to it."""
+
+    def __init__(self, max_queue=100):
+        super(SummaryWriter, self).__init__(name="SummaryWriter")
+        self.setDaemon(True)
+        self.jobs = queue.Queue(max_queue)
+        self.writers = {}
+        self.lock = Lock()
+
+    def writer(self, logdir):
+        with self.lock:
+            if logdir not in self.writers:
+                self.writers[logdir] = tf.summary.FileWriter(logdir)
+            return self.writers[logdir]
+
+    def add(self, logdir, step, scalars, summaries=(), images=(), run_metadata=None):
+        """scalars is a list of (tag, value) pairs, summaries and images are serialized Summary protobufs,
+        run_metadata a (tag, RunMetadata) pair."""
+        try:
+            self.jobs.put_nowait((logdir, step, scalars, summaries, images, run_metadata))
+        except queue.Full:
+            # Summaries are dropped rather than blocking training behind a slow disk
+            print("Summary queue full, dropping the summaries of step {}".format(step))
+
+    def flush(self):
+        self.jobs.join()
+        with self.lock:
+            for writer in self.writers.values():
+                writer.flush()
+
+    def run(self):
+        while True:
+            logdir, step, scalars, summaries, images, run_metadata = self.jobs.get()
+            summary = tf.Summary()
+            for tag, value in scalars:
+                summary.value.add(tag=tag, simple_value=float(value))
+            merge_summaries(summary, summaries)
+            writer = self.writer(logdir)
+            if summary.value:
+                writer.add_summary(summary, step)
+            for image in images:
+                writer.add_summary(image, step)
+            if run_metadata is not None:
+                writer.add_run_metadata(run_metadata[1], run_metadata[0], global_step=step)
+            if self.jobs.empty():
+                writer.flush()
+            self.jobs.task_done()
+
+
+summary_writer = None
+summary_writer_lock = Lock()
+
+
+def get_summary_writer():
+    """The SummaryWriter of the process, started on first use."""
+    global summary_writer
+    with summary_writer_lock:
+        if summary_writer is None:
+            summary_writer = SummaryWriter()
+            summary_writer.start()
+        return summary_writer
+
+
+class TrainingSupervisor():
+    """Watches the worker threads from the main thread. It sleeps on the coordinator until the next render frame or
+    steps per second report is due, so it takes no core away from the workers. Training stops when a worker raises,
+    when every worker finished, after max_steps environment steps or on SIGINT/SIGTERM, a final checkpoint is then
+    written before the workers are joined."""
+
+    def __init__(self, sess, coord, checkpoint_writer, global_episodes, total_steps, render=None, render_fps=0,
+                 report_secs=0, stop_grace_secs=10, total_updates=None, max_steps=0):
+        self.sess = sess
+        self.coord = coord
+        self.checkpoint_writer = checkpoint_writer
+        self.global_episodes = global_episodes
+        self.total_steps = total_steps
+        self.total_updates = total_updates
+        self.max_steps = max_steps
+        self.render = render
+        self.render_period = 1.0 / render_fps if render is not None and render_fps > 0 else 0
+        self.report_secs = report_secs
+        self.stop_grace_secs = stop_grace_secs
+        self.threads = []
+        self.stop_signal = None
+
+    def start_thread(self, name, target, *args):
+        def run_target():
+            # An exception requests a stop on the coordinator, join re-raises it once the final checkpoint is saved
+            with self.coord.stop_on_exception():
+                target(*args)
+
+        thread = Thread(target=run_target, name=name)
+        # A worker stuck in its environment does not keep the process alive past the grace period
+        thread.daemon = True
+        thread.start()
+        self.threads.append(thread)
+        return thread
+
+    def handle_signal(self, signum, frame):
+        self.stop_signal = signum
+        self.coord.request_stop()
+
+    def run(self, save_checkpoint=True):
+        """Returns the throughput of the run, the steps and updates per second over its whole duration."""
+        signal.signal(signal.SIGINT, self.handle_signal)
+        signal.signal(signal.SIGTERM, self.handle_signal)
+
+        now = time.time()
+        next_render = now
+        next_report = now + self.report_secs
+        last_report = (now, self.total_steps())
+        start_time, start_steps, start_updates = now, last_report[1], self.count_updates()
+        finished = set()
+        while not self.coord.should_stop():
+            for thread in self.threads:
+                if not thread.is_alive() and thread.name not in finished:
+                    finished.add(thread.name)
+                    print("Worker thread {} stopped".format(thread.name))
+            if len(finished) == len(self.threads):
+                break
+            if self.max_steps and self.total_steps() >= self.max_steps:
+                print("Reached {} steps, stopping training".format(self.max_steps))
+                break
+
+            now = time.time()
+            if self.render_period and now >= next_render:
+                self.render()
+                next_render = max(next_render + self.render_period, now)
+            if self.report_secs and now >= next_report:
+                total_steps = self.total_steps()
+                print("Steps per second {:.1f}".format((total_steps - last_report[1]) / (now - last_report[0])))
+                last_report = (now, total_steps)
+                next_report += self.report_secs
+
+            deadlines = [now + (0.1 if self.max_steps else 1.0)]
+            if self.render_period:
+                deadlines.append(next_render)
+            if self.report_secs:
+                deadlines.append(next_report)
+            self.coord.wait_for_stop(max(min(deadlines) - time.time(), 0))
+
+        if self.stop_signal is not None:
+            print("Received signal {}, stopping training".format(self.stop_signal))
+        duration = time.time() - start_time
+        nb_steps, nb_updates = self.total_steps() - start_steps, self.count_updates() - start_updates
+        self.stop(save_checkpoint)
+        return {'seconds': duration, 'steps': nb_steps, 'updates': nb_updates,
+                'steps_per_second': nb_steps / duration, 'updates_per_second': nb_updates / duration}
+
+    def count_updates(self):
+        return self.total_updates() if self.total_updates is not None else 0
+
+    def stop(self, save_checkpoint=True):
+        self.coord.request_stop()
+        deadline = time.time() + self.stop_grace_secs
+        for thread in self.threads:
+            thread.join(max(deadline - time.time(), 0))
+
+        if save_checkpoint:
+            self.checkpoint_writer.wait()
+            self.checkpoint_writer.save(self.sess, self.sess.run(self.global_episodes))
+            self.checkpoint_writer.wait()
+        self.coord.join(self.threads, stop_grace_period_secs=0, ignore_live_threads=True)
+        if summary_writer is not None:
+            summary_writer.flush()
+
+
 def normalized_columns_initializer(std=1.0):
     def _initializer(shape, dtype=None, partition_info=None):
         out = np.random.randn(*shape).astype(np.float32)
@@ -90,3 +646,46 @@ def set_image_bandit_11_arms(values, target_arm, selection, trial):
     else:
         bandit_image[101:107, 10 + delta * 0:10 + delta * 0 + 85, :] = [80.0, 80.0, 225.0]
     return bandit_image
+
+
+def time_kernel(fn, number, repeats=5):
+    """Seconds per call of fn, the best of repeats means over number calls. The minimum is the estimate least
+    disturbed by the rest of the machine."""
+    fn()
+    best = float('inf')
+    for _ in range(repeats):
+        start_time = time.perf_counter()
+        for _ in range(number):
+            fn()
+        best = min(best, (time.perf_counter() - start_time) / number)
+    return best
+
+
+def run_microbenchmarks(kernels, baseline_file, save_baseline=False, compare_baseline=False, tolerance=0.1):
+    """Times the (name, fn, number) kernels. The timings can be compared to the saved baseline, kernels slower than
+    it by more than tolerance are returned as regressions, and can be saved as the new baseline."""
+    timings = OrderedDict()
+    for name, fn, number in kernels:
+        timings[name] = time_kernel(fn, number)
+        print("{:40s} {:12.2f} us".format(name, 1e6 * timings[name]))
+
+    regressions = []
+    if compare_baseline:
+        with open(baseline_file) as f:
+            baseline = json.load(f)
+        print("{:40s} {:>12s} {:>12s} {:>8s}".format("kernel", "baseline us", "current us", "ratio"))
+        for name, seconds in timings.items():
+            if name not in baseline:
+                print("{:40s} {:>12s} {:12.2f} {:>8s}".format(name, "-", 1e6 * seconds, "new"))
+                continue
+            ratio = seconds / baseline[name]
+            if ratio > 1 + tolerance:
+                regressions.append(name)
+            print("{:40s} {:12.2f} {:12.2f} {:8.2f}{}".format(name, 1e6 * baseline[name], 1e6 * seconds, ratio,
+                                                               "  REGRESSION" if ratio > 1 + tolerance else ""))
+
+    if save_baseline:
+        with open(baseline_file, 'w') as f:
+            json.dump(timings, f, indent=2)
+        print("Saved the baseline to {}".format(baseline_file))
+    return regressions